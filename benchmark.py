@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import random
+import select
+import argparse
+import tracemalloc
+import multiprocessing
+from typing import Dict, List, Callable
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "router"))
+
+from router import LSA, LSDB, PORTA, Router, Vizinho, TabelaRotas
+from fib import FIBSombra, BACKENDS, BackendMemoria
+from lote import Receptor, TransporteLote, abrir_socket
+from agendador import Temporizador
+from formato import Remontador, codificar_json, decodificar_json, codificar_binario, decodificar_binario
+from registro import Registro, registro, AVISO, DEBUG, INFO
+
+registro.nivel = AVISO
+
+
+def links_anel(n: int) -> Dict[str, List[str]]:
+    return {f"router{i}": [f"router{n if i == 1 else i - 1}", f"router{1 if i == n else i + 1}"]
+            for i in range(1, n + 1)}
+
+
+def links_linha(n: int) -> Dict[str, List[str]]:
+    links = {}
+    for i in range(1, n + 1):
+        links[f"router{i}"] = []
+        if i > 1:
+            links[f"router{i}"].append(f"router{i - 1}")
+        if i < n:
+            links[f"router{i}"].append(f"router{i + 1}")
+    return links
+
+
+def links_estrela(n: int) -> Dict[str, List[str]]:
+    links = {"router1": [f"router{i}" for i in range(2, n + 1)]}
+    for i in range(2, n + 1):
+        links[f"router{i}"] = ["router1"]
+    return links
+
+
+def links_malha(n: int) -> Dict[str, List[str]]:
+    lado = max(2, int(n ** 0.5))
+    links = {}
+    for i in range(lado * lado):
+        linha, coluna = divmod(i, lado)
+        conexoes = []
+        if linha > 0:
+            conexoes.append(f"router{i - lado + 1}")
+        if linha < lado - 1:
+            conexoes.append(f"router{i + lado + 1}")
+        if coluna > 0:
+            conexoes.append(f"router{i}")
+        if coluna < lado - 1:
+            conexoes.append(f"router{i + 2}")
+        links[f"router{i + 1}"] = conexoes
+    return links
+
+
+def links_aleatoria(n: int, grau: int = 4) -> Dict[str, List[str]]:
+    links = links_anel(n)
+    for i in range(1, n + 1):
+        for _ in range(grau - 2):
+            j = random.randint(1, n)
+            if j != i and f"router{j}" not in links[f"router{i}"]:
+                links[f"router{i}"].append(f"router{j}")
+                links[f"router{j}"].append(f"router{i}")
+    return links
+
+
+TOPOLOGIAS: Dict[str, Callable[[int], Dict[str, List[str]]]] = {
+    "linha": links_linha,
+    "anel": links_anel,
+    "estrela": links_estrela,
+    "malha": links_malha,
+    "aleatoria": links_aleatoria,
+}
+
+
+def montar_lsdb(links: Dict[str, List[str]]) -> LSDB:
+    lsdb = LSDB()
+    for i, (nome, conexoes) in enumerate(links.items(), 1):
+        vizinhos = {c: Vizinho(f"10.{i // 256}.{i % 256}.1", 1) for c in conexoes}
+        lsdb.atualizar_lsa(LSA(nome, f"10.{i // 256}.{i % 256}.3", 1, vizinhos))
+    return lsdb
+
+
+def cronometrar(funcao: Callable[[], None]) -> float:
+    inicio = time.perf_counter()
+    funcao()
+    return time.perf_counter() - inicio
+
+
+def benchmark_spf(args):
+    print(f"\nSPF completo x incremental ({args.tipo}, {args.num_roteadores} roteadores, {args.eventos} eventos)")
+    links = TOPOLOGIAS[args.tipo](args.num_roteadores)
+    lsdb = montar_lsdb(links)
+    origem = "router1"
+    lsdb.drenar_mudancas()
+    tabela = TabelaRotas(lsdb.get_topologia(), origem, args.max_caminhos)
+    # O SPF completo reaproveita os vetores da tabela, como no roteador.
+    completa = TabelaRotas(lsdb.get_topologia(), origem, args.max_caminhos)
+
+    nomes = list(links.keys())
+    total_completo = 0.0
+    total_incremental = 0.0
+    for evento in range(args.eventos):
+        nome = random.choice(nomes)
+        atual = lsdb.lsas[nome]
+        vizinhos = {k: Vizinho(v.ip, v.peso) for k, v in atual.vizinhos.items()}
+        alvo = random.choice(list(links[nome]))
+        if alvo in vizinhos and random.random() < 0.5:
+            del vizinhos[alvo]
+        else:
+            vizinhos[alvo] = Vizinho(f"10.0.0.{evento % 250 + 1}", random.randint(1, 5))
+        lsdb.atualizar_lsa(LSA(nome, atual.ip, atual.seq + 1, vizinhos))
+        grafo = lsdb.get_topologia()
+        mudancas = lsdb.drenar_mudancas()
+
+        total_completo += cronometrar(lambda: completa.recalcular(grafo))
+        total_incremental += cronometrar(lambda: tabela.atualizar(grafo, mudancas))
+        if tabela.rotas != completa.rotas:
+            print(f"ERRO: rotas divergentes no evento {evento} ({nome})")
+            return
+
+    print(f"  completo:    {total_completo / args.eventos * 1000:.3f} ms/evento")
+    print(f"  incremental: {total_incremental / args.eventos * 1000:.3f} ms/evento")
+    multicaminho = sum(1 for saltos, _ in tabela.rotas.values() if len(saltos) > 1)
+    print(f"  ganho:       {total_completo / max(total_incremental, 1e-9):.1f}x (rotas idênticas, "
+          f"{multicaminho} destinos com ECMP ao final)")
+
+
+def benchmark_dijkstra(args):
+    tamanhos = [int(t) for t in args.tamanhos.split(",")]
+    print(f"\nSPF completo por topologia e tamanho (max_caminhos {args.max_caminhos})")
+    print(f"  {'topologia':>10} | {'nós':>7} | {'ms/SPF':>10} | {'us/nó':>6} | {'execuções':>9}")
+    for tipo in ("linha", "anel", "estrela", "aleatoria"):
+        for n in tamanhos:
+            grafo = montar_lsdb(TOPOLOGIAS[tipo](n)).get_topologia()
+            tabela = TabelaRotas(grafo, "router1", args.max_caminhos)
+
+            def spf():
+                tabela.recalcular(grafo)
+
+            # Repetições até somar ~1 s de medição, no mínimo uma.
+            repeticoes = max(1, min(1000, int(1.0 / max(cronometrar(spf), 1e-6))))
+            tempo = cronometrar(lambda: [spf() for _ in range(repeticoes)]) / repeticoes
+            print(f"  {tipo:>10} | {n:>7} | {tempo * 1e3:>10.3f} | {tempo / n * 1e6:>6.2f} | {repeticoes:>9}")
+
+
+def benchmark_lsdb(args):
+    print(f"\nMemória da LSDB e SPF completo ({args.tipo}, {args.num_roteadores} roteadores)")
+    links = TOPOLOGIAS[args.tipo](args.num_roteadores)
+    tracemalloc.start()
+    lsdb = montar_lsdb(links)
+    lsdb.drenar_mudancas()
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    grafo = lsdb.get_topologia()
+    csr = grafo.csr()
+    repeticoes = max(1, args.eventos // 10)
+    tempo = cronometrar(lambda: [TabelaRotas(grafo, "router1", args.max_caminhos) for _ in range(repeticoes)]) / repeticoes
+    print(f"  LSDB: {memoria / len(lsdb.lsas):.0f} bytes/LSA ({memoria / 2 ** 20:.1f} MiB), "
+          f"{len(csr.vizinhos)} enlaces dirigidos")
+    print(f"  SPF completo: {tempo * 1e3:.2f} ms")
+
+
+def benchmark_fib(args):
+    print(f"\nInstalação de rotas por backend ({args.num_roteadores} prefixos)")
+    for nome in args.backends.split(","):
+        try:
+            backend = BACKENDS[nome]()
+            gateway = (backend.listar_rotas().get("0.0.0.0/0") or ("127.0.0.1",))[:1]
+        except Exception as e:
+            print(f"  {nome}: indisponível ({e})")
+            continue
+
+        sombra = FIBSombra()
+        desejadas = {f"10.{200 + i // 65536}.{i // 256 % 256}.{i % 256}/32": gateway
+                     for i in range(args.num_roteadores)}
+        tempos = {}
+        for etapa, alvo in (("instalar", desejadas), ("remover", {})):
+            delta = sombra.calcular_delta(alvo)
+            inicio = time.perf_counter()
+            falhas, erro = backend.aplicar(delta)
+            tempos[etapa] = (time.perf_counter() - inicio) / max(len(delta), 1)
+            sombra.confirmar(delta, falhas)
+            if erro:
+                print(f"  {nome}: erro ao {etapa} rotas: {erro.splitlines()[0]}")
+                break
+        else:
+            print(f"  {nome}: {tempos['instalar'] * 1e6:.1f} us/rota instalada, "
+                  f"{tempos['remover'] * 1e6:.1f} us/rota removida")
+
+
+def benchmark_formato(args):
+    print(f"\nFormato de LSA: JSON x binário ({args.eventos} repetições por grau)")
+    print(f"  {'grau':>6} | {'JSON bytes':>10} | {'bin bytes':>9} | {'frag':>4} | "
+          f"{'JSON cod/dec (us)':>17} | {'bin cod/dec (us)':>16}")
+    for grau in (2, 8, 64, 512, 4096):
+        vizinhos = {f"router{i}": Vizinho(f"172.20.{i % 250}.3", random.randint(1, 10)) for i in range(2, grau + 2)}
+        lsa = LSA("router1", "172.20.1.3", 1, vizinhos)
+
+        json_bytes = codificar_json(lsa)
+        fragmentos = codificar_binario(lsa)
+        remontador = Remontador()
+        origem = ("172.20.2.3", 5000)
+
+        def decodificar_fragmentos():
+            for fragmento in fragmentos:
+                decodificar_binario(fragmento, origem, remontador)
+
+        repeticoes = max(1, args.eventos)
+        json_cod = cronometrar(lambda: [codificar_json(lsa) for _ in range(repeticoes)]) / repeticoes
+        json_dec = cronometrar(lambda: [decodificar_json(json_bytes) for _ in range(repeticoes)]) / repeticoes
+        bin_cod = cronometrar(lambda: [codificar_binario(lsa) for _ in range(repeticoes)]) / repeticoes
+        bin_dec = cronometrar(lambda: [decodificar_fragmentos() for _ in range(repeticoes)]) / repeticoes
+
+        print(f"  {grau:>6} | {len(json_bytes):>10} | {sum(map(len, fragmentos)):>9} | {len(fragmentos):>4} | "
+              f"{json_cod * 1e6:>8.1f}/{json_dec * 1e6:<8.1f} | {bin_cod * 1e6:>7.1f}/{bin_dec * 1e6:<8.1f}")
+
+
+def benchmark_registro(args):
+    repeticoes = max(1, args.eventos) * 100
+    print(f"\nCusto de log por mensagem no caminho de recepção ({repeticoes} mensagens)")
+    grafo = {f"router{i}": {f"router{i + 1}": 1} for i in range(args.num_roteadores)}
+    with open(os.devnull, "w") as nulo:
+        medidas = [
+            ("print síncrono", lambda: print(f"router1 recebeu LSA de router2 (seq {1}) de {('10.0.0.2', 5000)}",
+                                             file=nulo, flush=True)),
+        ]
+        for nome, nivel, limite in (("registro, filtrado por nível", AVISO, 0),
+                                    ("registro, enfileirado", INFO, 0),
+                                    ("registro, limitado por tipo", INFO, 20)):
+            destino = Registro(nivel=nivel, limite_por_segundo=limite, saida=nulo)
+            medidas.append((nome, lambda destino=destino: destino.registrar(
+                INFO, "%s recebeu LSA de %s (seq %d) de %s", "router1", "router2", 1, ("10.0.0.2", 5000))))
+        for nome, funcao in medidas:
+            tempo = cronometrar(lambda: [funcao() for _ in range(repeticoes)]) / repeticoes
+            print(f"  {nome:<30} {tempo * 1e6:8.2f} us/mensagem")
+
+        despejo = cronometrar(lambda: print(f"topologia: { {n: dict(e) for n, e in grafo.items()} }", file=nulo))
+        destino = Registro(nivel=INFO, saida=nulo)
+        filtrado = cronometrar(lambda: destino.habilitado(DEBUG) and destino.registrar(
+            DEBUG, "topologia: %s", {n: dict(e) for n, e in grafo.items()}))
+        print(f"  despejo da topologia ({len(grafo)} nós): {despejo * 1e3:.3f} ms impresso, "
+              f"{filtrado * 1e3:.4f} ms fora do nível debug")
+
+
+def _raios_hub(ip_hub: str, ips: List[str], total: int, pronto, parar):
+    # Processo separado, para os raios não disputarem o GIL com o hub medido. Os LSAs
+    # são codificados antes da largada e alternam o custo do enlace, então cada um
+    # muda a topologia e pede SPF no hub.
+    soquetes = [abrir_socket(ip, PORTA, recepcao=4096) for ip in ips]
+    datagramas = []
+    for seq in range(1, max(1, total // len(ips)) + 1):
+        for i, ip in enumerate(ips):
+            lsa = LSA(f"router{i + 2}", ip, seq, {"router1": Vizinho(ip_hub, 1 + seq % 2)})
+            datagramas.append((soquetes[i], codificar_binario(lsa)[0]))
+    pronto.set()
+    destino = (ip_hub, PORTA)
+    for sock, dados in datagramas:
+        if parar.is_set():
+            break
+        sock.sendto(dados, destino)
+
+
+def benchmark_hub(args):
+    raios = args.num_roteadores - 1
+    print(f"\nRecepção e inundação no hub de uma estrela em loopback ({raios} raios, {args.duracao:g} s por lote)")
+    print(f"  {'lote':>5} | {'LSAs/s':>8} | {'envios/s':>9} | {'LSAs/despertar':>14} | {'pedidos SPF':>11} | {'SPFs':>5}")
+    # Sem Hellos a inundação não espera Acks: mede só recepção, LSDB e envio.
+    os.environ["hello_ms"] = "0"
+    ip_hub = "127.61.0.1"
+    ips = [f"127.61.{i // 250 + 1}.{i % 250 + 2}" for i in range(raios)]
+    for tamanho in (int(t) for t in args.lotes.split(",")):
+        hub = Router("router1", ip_hub, {f"router{i + 2}": Vizinho(ip, 1) for i, ip in enumerate(ips)},
+                     backend=BackendMemoria())
+        hub.agendar = Temporizador().agendar
+        # Não bloqueante, como no asyncio: o select espera o primeiro datagrama e drenar
+        # devolve só o que já está na fila, sem esperar o lote encher.
+        hub.socket = abrir_socket(ip_hub, PORTA, hub.buffer_recepcao, hub.buffer_envio, bloqueante=False)
+        hub.transporte = TransporteLote(hub.socket)
+        receptor = Receptor(hub.socket, tamanho)
+        pronto, parar = multiprocessing.Event(), multiprocessing.Event()
+        processo = multiprocessing.Process(target=_raios_hub, args=(ip_hub, ips, args.eventos * 1000, pronto, parar),
+                                           daemon=True)
+        processo.start()
+        pronto.wait()
+        inicio = fim = time.perf_counter()
+        # Meio segundo sem tráfego encerra a medida, que vai até o último lote processado.
+        while fim - inicio < args.duracao and select.select([hub.socket], [], [], 0.5)[0]:
+            hub.processar_lote(receptor.drenar())
+            fim = time.perf_counter()
+        tempo = max(fim - inicio, 1e-9)
+        parar.set()
+        processo.join()
+        hub.socket.close()
+
+        contadores = hub.metricas.contadores
+        recebidos = contadores["lsas_recebidos_total"]
+        print(f"  {tamanho:>5} | {contadores['lsas_aceitos_total'] / tempo:>8.0f} | "
+              f"{contadores['lsas_enviados_total'] / tempo:>9.0f} | "
+              f"{recebidos / max(contadores['lotes_recebidos_total'], 1):>14.1f} | "
+              f"{hub.agendador_spf.solicitacoes:>11} | {hub.agendador_spf.execucoes:>5}")
+
+
+CENARIOS = {
+    "spf": benchmark_spf,
+    "dijkstra": benchmark_dijkstra,
+    "lsdb": benchmark_lsdb,
+    "fib": benchmark_fib,
+    "formato": benchmark_formato,
+    "registro": benchmark_registro,
+    "hub": benchmark_hub,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks do simulador Link State')
+    parser.add_argument('cenario', choices=sorted(CENARIOS),
+                        help='Cenário a ser medido')
+    parser.add_argument('-n', '--num-roteadores', type=int, default=1000,
+                        help='Número de roteadores do grafo sintético (padrão: 1000)')
+    parser.add_argument('-t', '--tipo', type=str, choices=sorted(TOPOLOGIAS), default='anel',
+                        help='Topologia do grafo sintético (padrão: anel)')
+    parser.add_argument('-e', '--eventos', type=int, default=200,
+                        help='Número de LSAs alterados a medir (padrão: 200)')
+    parser.add_argument('-b', '--backends', type=str, default='netlink,ip,memoria',
+                        help='Backends de FIB a medir no cenário fib (padrão: netlink,ip,memoria)')
+    parser.add_argument('-c', '--max-caminhos', type=int, default=4,
+                        help='Primeiros saltos de mesmo custo por destino no cenário spf (padrão: 4)')
+    parser.add_argument('--tamanhos', type=str, default='10,100,1000,10000,100000',
+                        help='Tamanhos dos grafos no cenário dijkstra (padrão: 10,100,1000,10000,100000)')
+    parser.add_argument('--lotes', type=str, default='1,64',
+                        help='Datagramas drenados por despertar no cenário hub (padrão: 1,64)')
+    parser.add_argument('-d', '--duracao', type=float, default=3.0,
+                        help='Segundos medidos por tamanho de lote no cenário hub (padrão: 3)')
+    parser.add_argument('-s', '--semente', type=int, default=42,
+                        help='Semente do gerador aleatório (padrão: 42)')
+
+    args = parser.parse_args()
+    random.seed(args.semente)
+    CENARIOS[args.cenario](args)
+
+
+if __name__ == "__main__":
+    main()
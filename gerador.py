@@ -1,42 +1,144 @@
 #!/usr/bin/env python3
 import sys
 import argparse
-from typing import Dict, List, Set, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 
-def gerar_docker_compose(num_roteadores: int, links_roteadores: Dict[str, List[str]]):
+# Capacidade em Mbps por enlace (par de roteadores, em qualquer ordem).
+Capacidades = Dict[Tuple[str, str], float]
+
+# Mesmo valor de router/areas.py: o gerador não importa módulos do roteador.
+AREA_BACKBONE = "0"
+
+
+def prefixo_subrede(i: int) -> str:
+    # 172.20.1.0/24 a 172.20.255.0/24 e, acima disso, 172.21.0.0/24 em diante.
+    return f"172.{20 + i // 256}.{i % 256}"
+
+
+# Octetos de host livres para os vizinhos que entram numa subrede: .1 é o gateway
+# do Docker, .3 o roteador dono e .100/.110 os hosts.
+OCTETOS_VIZINHOS = [octeto for octeto in range(4, 255) if octeto not in (100, 110)]
+
+
+def gerar_links(tipo: str, num_roteadores: int) -> Dict[str, List[str]]:
+    links = {}
+
+    if tipo == 'linha':
+        for i in range(1, num_roteadores + 1):
+            router = f"router{i}"
+            links[router] = []
+            if i > 1:
+                links[router].append(f"router{i-1}")
+            if i < num_roteadores:
+                links[router].append(f"router{i+1}")
+
+    elif tipo == 'anel':
+        for i in range(1, num_roteadores + 1):
+            router = f"router{i}"
+            links[router] = []
+            prev = f"router{num_roteadores if i == 1 else i-1}"
+            links[router].append(prev)
+            next_r = f"router{1 if i == num_roteadores else i+1}"
+            links[router].append(next_r)
+
+    elif tipo == 'estrela':
+        central = "router1"
+        links[central] = [f"router{i}" for i in range(2, num_roteadores + 1)]
+        for i in range(2, num_roteadores + 1):
+            router = f"router{i}"
+            links[router] = [central]
+
+    return links
+
+
+def atribuir_areas(tipo: str, links_roteadores: Dict[str, List[str]], num_areas: int) -> Dict[str, str]:
+    # Área de cada roteador, com num_areas contando o backbone. Na estrela o central é
+    # o backbone e as folhas se dividem nas demais áreas; em linha e anel os roteadores
+    # se dividem em blocos contíguos com o backbone no meio, para que toda área encoste nele.
+    nomes = list(links_roteadores)
+    if tipo == 'estrela':
+        folhas = nomes[1:]
+        areas = {nomes[0]: AREA_BACKBONE}
+        areas.update({nome: str(1 + i * (num_areas - 1) // len(folhas)) for i, nome in enumerate(folhas)})
+    else:
+        ordem = list(range(1, num_areas))
+        ordem.insert((num_areas - 1) // 2, 0)
+        areas = {nome: str(ordem[i * num_areas // len(nomes)]) for i, nome in enumerate(nomes)}
+    for nome, conexoes in links_roteadores.items():
+        for conn in conexoes:
+            area_enlace(areas[nome], areas[conn])
+    return areas
+
+
+def area_enlace(area_a: str, area_b: str) -> str:
+    # Um enlace entre áreas diferentes fica na que não é o backbone: a ponta no
+    # backbone vira roteador de borda. Duas áreas só se ligam através do backbone.
+    if area_a == area_b or area_b == AREA_BACKBONE:
+        return area_a
+    if area_a == AREA_BACKBONE:
+        return area_b
+    raise ValueError(f"enlace entre as áreas {area_a} e {area_b} sem passar pelo backbone")
+
+
+def ambiente_roteadores(links_roteadores: Dict[str, List[str]], capacidades: Optional[Capacidades] = None,
+                        capacidade_padrao: Optional[float] = None,
+                        areas: Optional[Dict[str, str]] = None) -> Dict[str, Dict[str, str]]:
+    # Variáveis de ambiente de cada roteador, as mesmas lidas pelo router.py. As
+    # capacidades são dicas estáticas para o custo dos enlaces; sem elas o custo base é 1.
+    # Com áreas, cada roteador recebe a sua (area) e a de cada enlace (<vizinho>_area).
+    capacidades = capacidades or {}
+    router_ips = {router_name: f"{prefixo_subrede(i)}.3" for i, router_name in enumerate(links_roteadores.keys(), 1)}
+    ambientes = {}
+    for router_name, connections in links_roteadores.items():
+        ambiente = {
+            "router_links": ','.join(connections),
+            "my_ip": router_ips[router_name],
+            "my_name": router_name,
+        }
+        if areas:
+            ambiente["area"] = areas[router_name]
+        for conn in connections:
+            if conn in router_ips:
+                ambiente[f"{conn}_ip"] = router_ips[conn]
+                capacidade = capacidades.get((router_name, conn), capacidades.get((conn, router_name), capacidade_padrao))
+                if capacidade:
+                    ambiente[f"{conn}_capacidade_mbps"] = f"{capacidade:g}"
+                if areas:
+                    ambiente[f"{conn}_area"] = area_enlace(areas[router_name], areas[conn])
+        ambientes[router_name] = ambiente
+    return ambientes
+
+
+def gerar_docker_compose(num_roteadores: int, links_roteadores: Dict[str, List[str]],
+                         capacidades: Optional[Capacidades] = None, capacidade_padrao: Optional[float] = None,
+                         areas: Optional[Dict[str, str]] = None):
     router_networks = {} 
-    router_ips = {}  
     router_env_vars = {}  
     
     for i, router_name in enumerate(links_roteadores.keys(), 1):
         primary_network = f"subnet_{i}"
-        primary_ip = f"172.20.{i}.3"
-        router_ips[router_name] = primary_ip
-        
+        primary_ip = f"{prefixo_subrede(i)}.3"
         router_networks[router_name] = {primary_network: primary_ip}
-        connections = links_roteadores[router_name]
-        router_env_vars[router_name] = [
-            f"router_links={','.join(connections)}",
-            f"my_ip={primary_ip}",
-            f"my_name={router_name}"
-        ]
-    
-    for router_name, connections in links_roteadores.items():
-        for conn in connections:
-            if conn in router_ips:
-                router_env_vars[router_name].append(f"{conn}_ip={router_ips[conn]}")
-    
 
-    for i, (router_name, connections) in enumerate(links_roteadores.items(), 1):
+    for router_name, ambiente in ambiente_roteadores(links_roteadores, capacidades, capacidade_padrao, areas).items():
+        router_env_vars[router_name] = [f"{chave}={valor}" for chave, valor in ambiente.items()]
+
+
+    # Cada vizinho que entra na subrede de outro roteador recebe o octeto da sua posição
+    # entre os que já entraram nela, sempre dentro do /24.
+    indices = {router_name: i for i, router_name in enumerate(links_roteadores.keys(), 1)}
+    ocupados = {i: 0 for i in indices.values()}
+    for router_name, connections in links_roteadores.items():
         for conn_router in connections:
             if conn_router in links_roteadores:
-                conn_idx = list(links_roteadores.keys()).index(conn_router) + 1
+                conn_idx = indices[conn_router]
                 conn_network = f"subnet_{conn_idx}"
-                
-
                 if conn_network not in router_networks[router_name]:
-
-                    conn_ip = f"172.20.{conn_idx}.{i+3}"  
+                    if ocupados[conn_idx] == len(OCTETOS_VIZINHOS):
+                        raise ValueError(f"{conn_network} ({prefixo_subrede(conn_idx)}.0/24) não comporta mais de "
+                                         f"{len(OCTETOS_VIZINHOS)} vizinhos de {conn_router}")
+                    conn_ip = f"{prefixo_subrede(conn_idx)}.{OCTETOS_VIZINHOS[ocupados[conn_idx]]}"
+                    ocupados[conn_idx] += 1
                     router_networks[router_name][conn_network] = conn_ip
     
     content = "services:\n"
@@ -72,7 +174,7 @@ def gerar_docker_compose(num_roteadores: int, links_roteadores: Dict[str, List[s
             content += "      dockerfile: Dockerfile\n"
             content += "    networks:\n"
             content += f"      subnet_{i}:\n"
-            content += f"        ipv4_address: 172.20.{i}.1{ord(h) - ord('a')}0\n"
+            content += f"        ipv4_address: {prefixo_subrede(i)}.1{ord(h) - ord('a')}0\n"
             content += "    depends_on:\n"
             content += f"    - {router_name}\n"
             content += "    cap_add:\n"
@@ -84,10 +186,20 @@ def gerar_docker_compose(num_roteadores: int, links_roteadores: Dict[str, List[s
         content += "    driver: bridge\n"
         content += "    ipam:\n"
         content += "      config:\n"
-        content += f"      - subnet: 172.20.{i}.0/24\n"
+        content += f"      - subnet: {prefixo_subrede(i)}.0/24\n"
     
     return content
 
+def ler_capacidade(texto: str) -> Tuple[str, str, float]:
+    # "router1-router2=100" -> ("router1", "router2", 100.0)
+    enlace, _, valor = texto.partition("=")
+    a, _, b = enlace.partition("-")
+    try:
+        return a, b, float(valor)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"capacidade inválida: {texto}")
+
+
 def main():
     parser = argparse.ArgumentParser(description='Gerar arquivo docker-compose.yml para simulador Link State')
     parser.add_argument('-n', '--num-roteadores', type=int, default=3,
@@ -97,46 +209,43 @@ def main():
                         help='Nome do arquivo de saída (padrão: docker-compose.yml)')
     parser.add_argument('-t', '--tipo', type=str, choices=['linha', 'anel', 'estrela'], default='linha',
                         help='Tipo de topologia: linha, anel ou estrela (padrão: linha)')
+    parser.add_argument('-c', '--capacidade', type=float, default=None,
+                        help='Capacidade em Mbps de todos os enlaces, usada no custo (padrão: sem dica, custo 1)')
+    parser.add_argument('--capacidade-enlace', type=ler_capacidade, action='append', default=[],
+                        help='Capacidade de um enlace específico: routerA-routerB=MBPS')
+    parser.add_argument('-a', '--areas', type=int, default=1,
+                        help='Número de áreas, contando o backbone (padrão: 1, sem áreas). '
+                             'Linha aceita até 3, anel até 2 e estrela qualquer número.')
     
     args = parser.parse_args()
     
-    links = {}
+    links = gerar_links(args.tipo, args.num_roteadores)
+    capacidades = {(a, b): mbps for a, b, mbps in args.capacidade_enlace}
+    areas = None
+    if args.areas > 1:
+        try:
+            areas = atribuir_areas(args.tipo, links, args.areas)
+        except ValueError as e:
+            parser.error(str(e))
     
     if args.tipo == 'linha':
-        for i in range(1, args.num_roteadores + 1):
-            router = f"router{i}"
-            links[router] = []
-            if i > 1:
-                links[router].append(f"router{i-1}")
-            if i < args.num_roteadores:
-                links[router].append(f"router{i+1}")
         print("\nTopologia em Linha criada:")
         print("  " + " -- ".join([f"router{i}" for i in range(1, args.num_roteadores + 1)]))
     
     elif args.tipo == 'anel':
-        for i in range(1, args.num_roteadores + 1):
-            router = f"router{i}"
-            links[router] = []
-            prev = f"router{args.num_roteadores if i == 1 else i-1}"
-            links[router].append(prev)
-            next_r = f"router{1 if i == args.num_roteadores else i+1}"
-            links[router].append(next_r)
         print("\nTopologia em Anel criada:")
         print("  " + " -- ".join([f"router{i}" for i in range(1, args.num_roteadores + 1)]) + f" -- router1")
     
     elif args.tipo == 'estrela':
-        central = "router1"
-        links[central] = [f"router{i}" for i in range(2, args.num_roteadores + 1)]
-        for i in range(2, args.num_roteadores + 1):
-            router = f"router{i}"
-            links[router] = [central]
-        
         print("\nTopologia em Estrela criada:")
         print("  router1 (central)")
         for i in range(2, args.num_roteadores + 1):
             print(f"  |-- router{i}")
     
-    compose_content = gerar_docker_compose(args.num_roteadores, links)
+    try:
+        compose_content = gerar_docker_compose(args.num_roteadores, links, capacidades, args.capacidade, areas)
+    except ValueError as e:
+        parser.error(str(e))
     
     with open(args.output, 'w') as f:
         f.write(compose_content)
@@ -146,12 +255,23 @@ def main():
     print("\nConexões entre roteadores:")
     for router, connections in links.items():
         print(f"  {router} → {', '.join(connections)}")
+    if capacidades or args.capacidade:
+        print("\nCapacidades dos enlaces (custo base = custo_referencia_mbps / capacidade):")
+        if args.capacidade:
+            print(f"  padrão: {args.capacidade:g} Mbps")
+        for (a, b), mbps in capacidades.items():
+            print(f"  {a} -- {b}: {mbps:g} Mbps")
+    if areas:
+        print("\nÁreas (0 é o backbone; enlaces entre áreas ficam na que não é o backbone):")
+        for area in sorted(set(areas.values()), key=int):
+            membros = [nome for nome, area_roteador in areas.items() if area_roteador == area]
+            print(f"  área {area}: {membros[0]} a {membros[-1]} ({len(membros)} roteadores)")
     
     print("\nCada subrede possui um roteador principal e 2 hosts.")
     print("Configuração de subredes:")
     for i in range(1, args.num_roteadores + 1):
         if f"router{i}" in links:
-            print(f"  subnet_{i}: 172.20.{i}.0/24 (router{i}, host{i}a, host{i}b)")
+            print(f"  subnet_{i}: {prefixo_subrede(i)}.0/24 (router{i}, host{i}a, host{i}b)")
     
     print("\nPara executar a simulação:")
     print("  docker-compose -f ./docker-compose.yml up -d")
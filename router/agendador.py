@@ -0,0 +1,199 @@
+import time
+import heapq
+import itertools
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from registro import erro
+
+
+def agendar_com_thread(atraso: float, callback: Callable[[], None]) -> threading.Timer:
+    timer = threading.Timer(atraso, callback)
+    timer.daemon = True
+    timer.start()
+    return timer
+
+
+def repetir(agendar: Callable[[float, Callable[[], None]], Any], intervalo: float, funcao: Callable[[], None]):
+    def disparar():
+        try:
+            funcao()
+        finally:
+            agendar(intervalo, disparar)
+    disparar()
+
+
+class Agendamento:
+    def __init__(self, quando: float, callback: Callable[[], None]):
+        self.quando = quando
+        self.callback = callback
+        self.cancelado = False
+
+    def cancel(self):
+        self.cancelado = True
+
+
+class Temporizador:
+    # Uma única thread atende todos os timers do roteador no modo com threads,
+    # com a mesma interface (agendar/cancel) do loop asyncio.
+    def __init__(self, relogio: Callable[[], float] = time.monotonic):
+        self.relogio = relogio
+        self.condicao = threading.Condition()
+        self.heap: List[Tuple[float, int, Agendamento]] = []
+        self.contador = itertools.count()
+        threading.Thread(target=self._executar, daemon=True).start()
+
+    def agendar(self, atraso: float, callback: Callable[[], None]) -> Agendamento:
+        agendamento = Agendamento(self.relogio() + atraso, callback)
+        with self.condicao:
+            heapq.heappush(self.heap, (agendamento.quando, next(self.contador), agendamento))
+            self.condicao.notify()
+        return agendamento
+
+    def _executar(self):
+        while True:
+            with self.condicao:
+                while not self.heap or self.heap[0][0] > self.relogio():
+                    self.condicao.wait(self.heap[0][0] - self.relogio() if self.heap else None)
+                _, _, agendamento = heapq.heappop(self.heap)
+            if not agendamento.cancelado:
+                try:
+                    agendamento.callback()
+                except Exception as e:
+                    erro("erro em timer agendado: %s", e)
+
+
+class RodaTemporal:
+    # Roda de timers com hash: cada chave cai no slot do tick em que vence, e avançar
+    # a roda só visita os slots dos ticks decorridos. O custo é proporcional ao que
+    # vence, não ao número de chaves agendadas. Reagendar ou cancelar é O(1).
+    def __init__(self, granularidade: float = 1.0, tamanho: int = 256,
+                 relogio: Callable[[], float] = time.monotonic):
+        self.granularidade = granularidade
+        self.tamanho = tamanho
+        self.relogio = relogio
+        self.slots: List[Dict[Hashable, int]] = [{} for _ in range(tamanho)]
+        self.vencimentos: Dict[Hashable, int] = {}
+        # Definido no primeiro uso: o runtime pode trocar o relógio depois da construção.
+        self.tick_atual: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self.vencimentos)
+
+    def _tick(self, instante: float) -> int:
+        return int(instante // self.granularidade)
+
+    def agendar(self, chave: Hashable, atraso: float):
+        self.cancelar(chave)
+        agora = self.relogio()
+        if self.tick_atual is None:
+            self.tick_atual = self._tick(agora)
+        # Ticks já processados não seriam revisitados antes de uma volta completa.
+        tick = max(self._tick(agora + atraso), self.tick_atual + 1)
+        self.slots[tick % self.tamanho][chave] = tick
+        self.vencimentos[chave] = tick
+
+    def cancelar(self, chave: Hashable):
+        tick = self.vencimentos.pop(chave, None)
+        if tick is not None:
+            del self.slots[tick % self.tamanho][chave]
+
+    def avancar(self) -> List[Hashable]:
+        agora = self._tick(self.relogio())
+        if self.tick_atual is None:
+            self.tick_atual = agora
+        vencidos = []
+        # Basta uma volta: depois dela todos os slots já foram visitados.
+        for tick in range(max(self.tick_atual + 1, agora - self.tamanho + 1), agora + 1):
+            slot = self.slots[tick % self.tamanho]
+            if not slot:
+                continue
+            for chave, vencimento in list(slot.items()):
+                if vencimento <= agora:
+                    del slot[chave]
+                    del self.vencimentos[chave]
+                    vencidos.append(chave)
+        self.tick_atual = max(self.tick_atual, agora)
+        return vencidos
+
+
+class AgendadorSPF:
+    # Throttling no estilo spf-delay/spf-hold do OSPF: a primeira mudança após um
+    # período calmo espera só atraso_inicial; sob churn contínuo a espera entre
+    # execuções dobra a cada SPF até espera_maxima, e volta ao início quando
+    # a rede fica calma por duas esperas seguidas.
+    def __init__(self, executar: Callable[[Optional[Set[str]]], None],
+                 atraso_inicial: float = 0.05, espera_inicial: float = 0.2, espera_maxima: float = 5.0,
+                 relogio: Callable[[], float] = time.monotonic,
+                 agendar: Callable[[float, Callable[[], None]], object] = agendar_com_thread):
+        self.executar = executar
+        self.atraso_inicial = atraso_inicial
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+        self.relogio = relogio
+        self.agendar = agendar
+
+        self.lock = threading.Lock()
+        self.pendentes: Set[str] = set()
+        self.completo = False
+        self.agendado = None
+        self.executando = False
+        self.ultima_execucao = float('-inf')
+        self.espera_atual = espera_inicial
+
+        self.solicitacoes = 0
+        self.coalescidas = 0
+        self.execucoes = 0
+
+    def solicitar(self, alterados: Optional[Set[str]] = None):
+        with self.lock:
+            self.solicitacoes += 1
+            if alterados is None:
+                self.completo = True
+            else:
+                self.pendentes |= alterados
+            if self.agendado is not None or self.executando:
+                self.coalescidas += 1
+                return
+            self._agendar()
+
+    def _agendar(self):
+        ocioso = self.relogio() - self.ultima_execucao
+        if ocioso >= 2 * self.espera_atual:
+            self.espera_atual = self.espera_inicial
+            atraso = self.atraso_inicial
+        else:
+            atraso = max(self.atraso_inicial, self.espera_atual - ocioso)
+            self.espera_atual = min(self.espera_atual * 2, self.espera_maxima)
+        self.agendado = self.agendar(atraso, self._disparar)
+
+    def _disparar(self):
+        with self.lock:
+            alterados = None if self.completo else self.pendentes
+            self.pendentes = set()
+            self.completo = False
+            self.agendado = None
+            self.executando = True
+            self.ultima_execucao = self.relogio()
+        try:
+            self.executar(alterados)
+        finally:
+            with self.lock:
+                self.executando = False
+                self.execucoes += 1
+                if self.pendentes or self.completo:
+                    self._agendar()
+
+    def cancelar(self):
+        with self.lock:
+            if self.agendado is not None:
+                self.agendado.cancel()
+                self.agendado = None
+
+    def contadores(self) -> Dict[str, float]:
+        return {
+            "solicitacoes": self.solicitacoes,
+            "coalescidas": self.coalescidas,
+            "execucoes": self.execucoes,
+            "espera_atual": self.espera_atual,
+        }
@@ -0,0 +1,28 @@
+import ipaddress
+from typing import Dict, Mapping
+
+# Área de backbone: toda rota entre áreas passa por ela, como no OSPF. Sem
+# configuração de áreas, todos os roteadores ficam nela e nada muda.
+AREA_BACKBONE = "0"
+
+
+def prefixo_de(ip: str) -> str:
+    # Cada roteador anuncia a /24 do próprio endereço.
+    return '.'.join(ip.split('.')[:3]) + '.0/24'
+
+
+def resumir(prefixos: Mapping[str, int]) -> Dict[str, int]:
+    # Agrega prefixos contíguos nos menores blocos CIDR que cobrem exatamente os
+    # mesmos endereços: uma área com as sub-redes 172.20.0.0/24 a 172.20.63.0/24
+    # vira um único 172.20.0.0/18. O custo de um bloco é o do componente mais
+    # distante (RFC 2328, 12.4.3), para nunca prometer menos do que entrega.
+    redes = sorted((ipaddress.ip_network(prefixo), custo) for prefixo, custo in prefixos.items())
+    resumo = {}
+    i = 0
+    for bloco in ipaddress.collapse_addresses(rede for rede, _ in redes):
+        custo = 0
+        while i < len(redes) and redes[i][0].subnet_of(bloco):
+            custo = max(custo, redes[i][1])
+            i += 1
+        resumo[str(bloco)] = custo
+    return resumo
@@ -0,0 +1,41 @@
+import signal
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List
+
+from lote import Receptor, TransporteLote, abrir_socket
+
+
+async def iniciar_roteador(roteador: Any, porta: int):
+    loop = asyncio.get_running_loop()
+    roteador.relogio = loop.time
+    roteador.agendar = loop.call_later
+    # Um único worker: os deltas de FIB são aplicados na ordem em que o SPF os produziu.
+    roteador.executor_rotas = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"fib-{roteador.id}")
+
+    # Socket não bloqueante lido direto pelo loop: cada despertar drena a fila inteira
+    # em um lote, em vez de um callback por datagrama.
+    roteador.socket = abrir_socket(roteador.ip, porta, roteador.buffer_recepcao, roteador.buffer_envio,
+                                   bloqueante=False)
+    descritor = roteador.socket.fileno()
+    roteador.transporte = TransporteLote(roteador.socket, ao_fechar=lambda: loop.remove_reader(descritor))
+    receptor = Receptor(roteador.socket, roteador.lote_recepcao)
+    loop.add_reader(descritor, lambda: roteador.processar_lote(receptor.drenar()))
+    await loop.run_in_executor(roteador.executor_rotas, roteador._configurar_rotas_iniciais)
+    roteador.iniciar_refresh()
+    roteador.iniciar_timers()
+    roteador.iniciar_metricas()
+
+
+async def executar_roteadores(roteadores: List[Any], porta: int):
+    for roteador in roteadores:
+        await iniciar_roteador(roteador, porta)
+    # SIGTERM/SIGINT encerram no próprio loop, entre dois callbacks, nunca no meio de
+    # um que esteja com o lock do roteador.
+    loop = asyncio.get_running_loop()
+    parar = asyncio.Event()
+    for sinal in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sinal, parar.set)
+    await parar.wait()
+    for roteador in roteadores:
+        roteador.encerrar()
@@ -0,0 +1,275 @@
+import os
+import re
+import errno
+import bisect
+import ipaddress
+import subprocess
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from netlink import SocketRtnetlink
+
+# Próximos saltos de uma rota, em ordem; mais de um é uma rota multicaminho (ECMP).
+# Vazio só em rotas listadas da FIB sem gateway (redes diretamente conectadas).
+Saltos = Tuple[str, ...]
+
+
+class DeltaFIB:
+    def __init__(self, adicionar: Dict[str, Saltos], substituir: Dict[str, Saltos], remover: Dict[str, Saltos]):
+        self.adicionar = adicionar
+        self.substituir = substituir
+        self.remover = remover
+
+    def vazio(self) -> bool:
+        return not (self.adicionar or self.substituir or self.remover)
+
+    def __len__(self) -> int:
+        return len(self.adicionar) + len(self.substituir) + len(self.remover)
+
+    def __repr__(self) -> str:
+        return f"+{len(self.adicionar)} ~{len(self.substituir)} -{len(self.remover)}"
+
+
+class FIBSombra:
+    def __init__(self):
+        self.instaladas: Dict[str, Saltos] = {}
+
+    def calcular_delta(self, desejadas: Dict[str, Saltos]) -> DeltaFIB:
+        adicionar = {}
+        substituir = {}
+        for prefixo, via in desejadas.items():
+            atual = self.instaladas.get(prefixo)
+            if atual is None:
+                adicionar[prefixo] = via
+            elif atual != via:
+                substituir[prefixo] = via
+        remover = {p: via for p, via in self.instaladas.items() if p not in desejadas}
+        return DeltaFIB(adicionar, substituir, remover)
+
+    def confirmar(self, delta: DeltaFIB, falhas: List[str] = ()):
+        for prefixo in delta.remover:
+            self.instaladas.pop(prefixo, None)
+        self.instaladas.update(delta.adicionar)
+        self.instaladas.update(delta.substituir)
+        # Prefixos que falharam saem da sombra para serem reenviados no próximo cálculo.
+        for prefixo in falhas:
+            self.instaladas.pop(prefixo, None)
+
+
+@lru_cache(maxsize=65536)
+def _intervalo(prefixo: str) -> Tuple[int, int, int]:
+    rede = ipaddress.ip_network(prefixo)
+    return int(rede.network_address), int(rede.broadcast_address), rede.prefixlen
+
+
+def agregar_rotas(desejadas: Dict[str, Saltos]) -> Dict[str, Saltos]:
+    # Prefixos contíguos com os mesmos saltos viram os menores blocos CIDR que os
+    # cobrem exatamente: na ponta de uma linha de 1000 roteadores, as 998 /24 viram
+    # 14 rotas. Um bloco só substitui seus componentes se nenhuma rota com
+    # outros saltos ficar dentro dele sem ser mais específica que eles, porque aí
+    # o bloco tomaria endereços dela no casamento pelo prefixo mais longo.
+    grupos: Dict[Saltos, List[Tuple[int, int, int, str]]] = {}
+    for prefixo, saltos in desejadas.items():
+        grupos.setdefault(saltos, []).append(_intervalo(prefixo) + (prefixo,))
+    todos = sorted((inicio, fim, tamanho, saltos) for saltos, intervalos in grupos.items()
+                   for inicio, fim, tamanho, _ in intervalos)
+    inicios = [inicio for inicio, _, _, _ in todos]
+
+    def conflita(bloco: ipaddress.IPv4Network, saltos: Saltos, mais_longo: int) -> bool:
+        inicio, fim = int(bloco.network_address), int(bloco.broadcast_address)
+        for i in range(bisect.bisect_left(inicios, inicio), bisect.bisect_right(inicios, fim)):
+            _, fim_outro, tamanho, saltos_outro = todos[i]
+            if fim_outro <= fim and saltos_outro != saltos and tamanho <= mais_longo:
+                return True
+        return False
+
+    agregadas: Dict[str, Saltos] = {}
+    for saltos, intervalos in grupos.items():
+        intervalos.sort()
+        # Sequências de prefixos sobrepostos ou adjacentes: (último endereço, componentes).
+        sequencias: List[Tuple[int, List[Tuple[int, int, int, str]]]] = []
+        for intervalo in intervalos:
+            if sequencias and intervalo[0] <= sequencias[-1][0] + 1:
+                fim, componentes = sequencias[-1]
+                componentes.append(intervalo)
+                sequencias[-1] = (max(fim, intervalo[1]), componentes)
+            else:
+                sequencias.append((intervalo[1], [intervalo]))
+        for fim, componentes in sequencias:
+            if len(componentes) == 1:
+                agregadas[componentes[0][3]] = saltos
+                continue
+            # Os blocos saem em ordem, e cada componente (alinhado) cai inteiro num deles.
+            j = 0
+            for bloco in ipaddress.summarize_address_range(ipaddress.IPv4Address(componentes[0][0]),
+                                                           ipaddress.IPv4Address(fim)):
+                fim_bloco = int(bloco.broadcast_address)
+                dentro = []
+                while j < len(componentes) and componentes[j][0] <= fim_bloco:
+                    dentro.append(componentes[j])
+                    j += 1
+                if len(dentro) > 1 and conflita(bloco, saltos, max(tamanho for _, _, tamanho, _ in dentro)):
+                    agregadas.update((prefixo, saltos) for _, _, _, prefixo in dentro)
+                else:
+                    agregadas[str(bloco)] = saltos
+    return agregadas
+
+
+class BackendFIB:
+    nome = "base"
+
+    def aplicar(self, delta: DeltaFIB) -> Tuple[List[str], str]:
+        # Retorna os prefixos que falharam (exceto remoções) e a mensagem de erro.
+        raise NotImplementedError
+
+    def listar_rotas(self) -> Dict[str, Saltos]:
+        raise NotImplementedError
+
+    def listar_enderecos(self) -> List[str]:
+        raise NotImplementedError
+
+
+def operacoes_delta(delta: DeltaFIB) -> List[Tuple[str, str, Saltos]]:
+    operacoes = [("del", prefixo, saltos) for prefixo, saltos in delta.remover.items()]
+    for rotas in (delta.adicionar, delta.substituir):
+        operacoes.extend(("replace", prefixo, saltos) for prefixo, saltos in rotas.items())
+    return operacoes
+
+
+def _comando_ip(acao: str, prefixo: str, saltos: Saltos) -> str:
+    if len(saltos) == 1:
+        return f"route {acao} {prefixo} via {saltos[0]}\n"
+    if acao == "del":
+        # Uma rota multicaminho é removida pelo prefixo, com todos os saltos.
+        return f"route del {prefixo}\n"
+    return f"route {acao} {prefixo} " + " ".join(f"nexthop via {salto}" for salto in saltos) + "\n"
+
+
+def _normalizar_prefixo(prefixo: str) -> str:
+    if prefixo == "default":
+        return "0.0.0.0/0"
+    return prefixo if "/" in prefixo else f"{prefixo}/32"
+
+
+def ler_rotas_ip(saida: str) -> Dict[str, Saltos]:
+    # Saída de "ip route show"; também usada para ler tabelas coletadas de outros roteadores.
+    rotas = {}
+    prefixo = None
+    for linha in saida.splitlines():
+        campos = linha.split()
+        if not campos:
+            continue
+        if campos[0] == "nexthop":
+            # Saltos de uma rota multicaminho vêm em linhas de continuação.
+            if prefixo is not None and "via" in campos:
+                rotas[prefixo] += (campos[campos.index("via") + 1],)
+            continue
+        if campos[0] in ("unreachable", "blackhole", "prohibit", "broadcast", "local"):
+            prefixo = None
+            continue
+        prefixo = _normalizar_prefixo(campos[0])
+        rotas[prefixo] = (campos[campos.index("via") + 1],) if "via" in campos else ()
+    return rotas
+
+
+class BackendIP(BackendFIB):
+    nome = "ip"
+
+    def aplicar(self, delta: DeltaFIB) -> Tuple[List[str], str]:
+        # Um único fork/exec por delta; -force segue adiante se algum comando falhar.
+        operacoes = operacoes_delta(delta)
+        entrada = "".join(_comando_ip(acao, prefixo, saltos) for acao, prefixo, saltos in operacoes)
+        result = subprocess.run(["ip", "-force", "-batch", "-"], input=entrada,
+                                capture_output=True, text=True, check=False)
+        if result.returncode == 0:
+            return [], ""
+        falhas = []
+        for numero in re.findall(r"Command failed -:(\d+)", result.stderr):
+            acao, prefixo, _ = operacoes[int(numero) - 1]
+            if acao != "del":
+                falhas.append(prefixo)
+        return falhas, result.stderr
+
+    def listar_rotas(self) -> Dict[str, Saltos]:
+        saida = subprocess.run(["ip", "-4", "route", "show", "table", "main"],
+                               capture_output=True, text=True, check=False).stdout
+        return ler_rotas_ip(saida)
+
+    def listar_enderecos(self) -> List[str]:
+        saida = subprocess.run(["ip", "-4", "-o", "addr", "show"],
+                               capture_output=True, text=True, check=False).stdout
+        return [linha.split()[3] for linha in saida.splitlines() if len(linha.split()) > 3]
+
+
+class BackendNetlink(BackendFIB):
+    nome = "netlink"
+
+    def __init__(self):
+        self.netlink = SocketRtnetlink()
+
+    def aplicar(self, delta: DeltaFIB) -> Tuple[List[str], str]:
+        operacoes = operacoes_delta(delta)
+        erros = self.netlink.executar(operacoes)
+        falhas = []
+        mensagens = []
+        for indice, erro in sorted(erros.items()):
+            acao, prefixo, saltos = operacoes[indice]
+            if acao == "del" and erro == errno.ESRCH:
+                continue
+            if acao != "del":
+                falhas.append(prefixo)
+            mensagens.append(f"{acao} {prefixo} via {', '.join(saltos)}: {os.strerror(erro)}")
+        return falhas, "; ".join(mensagens)
+
+    def listar_rotas(self) -> Dict[str, Saltos]:
+        return self.netlink.listar_rotas()
+
+    def listar_enderecos(self) -> List[str]:
+        return self.netlink.listar_enderecos()
+
+
+class BackendMemoria(BackendFIB):
+    nome = "memoria"
+
+    def __init__(self, enderecos: Optional[List[str]] = None):
+        self.rotas: Dict[str, Saltos] = {}
+        self.enderecos = list(enderecos or [])
+
+    def aplicar(self, delta: DeltaFIB) -> Tuple[List[str], str]:
+        for prefixo in delta.remover:
+            self.rotas.pop(prefixo, None)
+        self.rotas.update(delta.adicionar)
+        self.rotas.update(delta.substituir)
+        return [], ""
+
+    def listar_rotas(self) -> Dict[str, Saltos]:
+        return dict(self.rotas)
+
+    def listar_enderecos(self) -> List[str]:
+        return list(self.enderecos)
+
+
+BACKENDS = {
+    "netlink": BackendNetlink,
+    "ip": BackendIP,
+    "memoria": BackendMemoria,
+}
+
+
+def criar_backend(nome: str = "auto") -> BackendFIB:
+    if nome != "auto":
+        return BACKENDS[nome]()
+    try:
+        return BackendNetlink()
+    except OSError:
+        return BackendIP()
+
+
+def ativar_encaminhamento() -> str:
+    try:
+        with open("/proc/sys/net/ipv4/ip_forward", "w") as f:
+            f.write("1")
+        return "/proc/sys/net/ipv4/ip_forward"
+    except OSError:
+        subprocess.run(["sysctl", "-w", "net.ipv4.ip_forward=1"], check=True, capture_output=True)
+        return "sysctl"
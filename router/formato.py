@@ -0,0 +1,389 @@
+import sys
+import json
+import time
+import zlib
+import socket
+import struct
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Union
+
+from lsa import LSA, Ack, Descricao, Hello, Pedido, Vizinho
+
+FORMATO_JSON = "json"
+FORMATO_BINARIO = "bin"
+
+MAGICO = b"LS"
+VERSAO = 1
+TIPO_LSA = 1
+TIPO_HELLO = 2
+TIPO_ACK = 3
+TIPO_DESCRICAO = 4
+TIPO_PEDIDO = 5
+
+# magico, versão, tipo, flags, id da mensagem, índice do fragmento, total de fragmentos
+CABECALHO = struct.Struct("!2sBBBHBB")
+LSA_FIXO = struct.Struct("!I4sHH")
+VIZINHO = struct.Struct("!H4sH")
+CONTAGEM = struct.Struct("!H")
+HELLO_FIXO = struct.Struct("!HH")
+ACK_ENTRADA = struct.Struct("!HIB")
+# Número da troca, índice do lote, total de lotes.
+DESCRICAO_FIXO = struct.Struct("!HHH")
+# Número da troca respondida, completo.
+PEDIDO_FIXO = struct.Struct("!HB")
+# Extensões após os vizinhos: tipo, tamanho do valor, valor. Tipos desconhecidos são ignorados.
+EXTENSAO = struct.Struct("!BH")
+EXTENSAO_IDADE = 1
+EXTENSAO_CARIMBO = 2
+EXTENSAO_ECO = 3
+EXTENSAO_RESUMOS = 4
+EXTENSAO_PREFIXOS = 5
+IDADE = struct.Struct("!H")
+CARIMBO = struct.Struct("!I")
+# Índice do vizinho na tabela de nomes, carimbo ecoado, retenção em us.
+ECO = struct.Struct("!HII")
+# Resumo de área: endereço da rede, tamanho do prefixo, custo.
+RESUMO = struct.Struct("!4sBI")
+# Rede de uma interface: endereço da rede, tamanho do prefixo.
+PREFIXO = struct.Struct("!4sB")
+
+# Cabe em um quadro Ethernet sem fragmentação IP.
+MAX_DATAGRAMA = 1400
+MAX_ACKS_DATAGRAMA = 64
+MAX_FRAGMENTOS = 255
+TAMANHO_RECEPCAO = 65535
+
+
+class ErroFormato(ValueError):
+    pass
+
+
+def eh_binario(dados: bytes) -> bool:
+    return dados[:2] == MAGICO
+
+
+def codificar_json(lsa: LSA, anunciar_binario: bool = True) -> bytes:
+    dados = lsa.to_dict()
+    if anunciar_binario:
+        # Roteadores antigos ignoram a chave; os novos passam a falar binário com quem a envia.
+        dados["formatos"] = [FORMATO_JSON, FORMATO_BINARIO]
+    return json.dumps(dados).encode()
+
+
+def codificar_sonda(roteador_id: str, ip: str, anunciar_binario: bool = True) -> bytes:
+    # Primeiro contato com um vizinho de capacidade desconhecida: um LSA JSON do próprio
+    # roteador com seq 0 e sem enlaces, que a versão original aceita e qualquer instância
+    # real supera. Os novos reconhecem a marca, passam a mandar Hellos e não o guardam.
+    dados = LSA(roteador_id, ip, 0, {}).to_dict()
+    dados["sonda"] = True
+    if anunciar_binario:
+        dados["formatos"] = [FORMATO_JSON, FORMATO_BINARIO]
+    return json.dumps(dados).encode()
+
+
+def decodificar_json(dados: bytes) -> Tuple[Optional[LSA], bool]:
+    # None no lugar do LSA: era uma sonda.
+    lsa_dict = json.loads(dados.decode())
+    fala_binario = FORMATO_BINARIO in lsa_dict.get("formatos", ())
+    if lsa_dict.get("sonda"):
+        return None, fala_binario
+    return LSA.from_dict(lsa_dict), fala_binario
+
+
+def _tabela_nomes(nomes: List[str]) -> List[bytes]:
+    partes = [CONTAGEM.pack(len(nomes))]
+    for nome in nomes:
+        codificado = nome.encode()
+        partes.append(bytes((len(codificado),)) + codificado)
+    return partes
+
+
+def _ler_tabela_nomes(corpo: memoryview, posicao: int) -> Tuple[List[str], int]:
+    (quantidade,) = CONTAGEM.unpack_from(corpo, posicao)
+    posicao += CONTAGEM.size
+    nomes = []
+    for _ in range(quantidade):
+        tamanho = corpo[posicao]
+        nomes.append(sys.intern(str(corpo[posicao + 1:posicao + 1 + tamanho], "utf-8")))
+        posicao += 1 + tamanho
+    return nomes, posicao
+
+
+def corpo_lsa(lsa: LSA) -> bytes:
+    # Nomes entram uma única vez numa tabela de strings e são referenciados por índice.
+    nomes = [lsa.id]
+    indices = {lsa.id: 0}
+    for nome in lsa.vizinhos:
+        if nome not in indices:
+            indices[nome] = len(nomes)
+            nomes.append(nome)
+
+    try:
+        partes = _tabela_nomes(nomes)
+        partes.append(LSA_FIXO.pack(lsa.seq, socket.inet_aton(lsa.ip), indices[lsa.id], len(lsa.vizinhos)))
+        for nome, vizinho in lsa.vizinhos.items():
+            partes.append(VIZINHO.pack(indices[nome], socket.inet_aton(vizinho.ip), vizinho.peso))
+        if lsa.idade:
+            partes.append(EXTENSAO.pack(EXTENSAO_IDADE, IDADE.size) + IDADE.pack(min(lsa.idade, 0xFFFF)))
+        if lsa.prefixos:
+            partes.append(EXTENSAO.pack(EXTENSAO_PREFIXOS, PREFIXO.size * len(lsa.prefixos)))
+            for prefixo in lsa.prefixos:
+                rede, _, tamanho = prefixo.partition("/")
+                partes.append(PREFIXO.pack(socket.inet_aton(rede), int(tamanho)))
+        if lsa.resumos:
+            partes.append(EXTENSAO.pack(EXTENSAO_RESUMOS, RESUMO.size * len(lsa.resumos)))
+            for prefixo, custo in lsa.resumos.items():
+                rede, _, tamanho = prefixo.partition("/")
+                partes.append(RESUMO.pack(socket.inet_aton(rede), int(tamanho), custo))
+    except (struct.error, ValueError, OSError) as e:
+        raise ErroFormato(f"LSA de {lsa.id} não representável em binário: {e}") from e
+    return b"".join(partes)
+
+
+def id_mensagem_lsa(lsa: LSA) -> int:
+    # Derivado de (origem, seq) e não de quem envia: os fragmentos podem ser
+    # repassados byte a byte por qualquer roteador sem colidir na remontagem.
+    return zlib.crc32(f"{lsa.id}:{lsa.seq}".encode()) & 0xFFFF
+
+
+def codificar_binario(lsa: LSA) -> List[bytes]:
+    corpo = memoryview(corpo_lsa(lsa))
+    tamanho_fragmento = MAX_DATAGRAMA - CABECALHO.size
+    total = max(1, -(-len(corpo) // tamanho_fragmento))
+    if total > MAX_FRAGMENTOS:
+        raise ErroFormato(f"LSA de {lsa.id} grande demais ({len(corpo)} bytes)")
+    id_mensagem = id_mensagem_lsa(lsa)
+    return [CABECALHO.pack(MAGICO, VERSAO, TIPO_LSA, 0, id_mensagem, i, total)
+            + corpo[i * tamanho_fragmento:(i + 1) * tamanho_fragmento]
+            for i in range(total)]
+
+
+def decodificar_corpo_lsa(corpo: memoryview) -> LSA:
+    try:
+        nomes, posicao = _ler_tabela_nomes(corpo, 0)
+        seq, ip, indice_origem, quantidade = LSA_FIXO.unpack_from(corpo, posicao)
+        posicao += LSA_FIXO.size
+        fim = posicao + quantidade * VIZINHO.size
+        if len(corpo) < fim:
+            raise ErroFormato("LSA truncado")
+        vizinhos = {}
+        for indice, ip_vizinho, peso in VIZINHO.iter_unpack(corpo[posicao:fim]):
+            vizinhos[nomes[indice]] = Vizinho(socket.inet_ntoa(ip_vizinho), peso)
+        lsa = LSA(nomes[indice_origem], socket.inet_ntoa(ip), seq, vizinhos)
+        for tipo, valor in _extensoes(corpo, fim):
+            if tipo == EXTENSAO_IDADE:
+                (lsa.idade,) = IDADE.unpack(valor)
+            elif tipo == EXTENSAO_PREFIXOS:
+                lsa.prefixos = tuple(sys.intern(f"{socket.inet_ntoa(rede)}/{tamanho}")
+                                     for rede, tamanho in PREFIXO.iter_unpack(valor))
+            elif tipo == EXTENSAO_RESUMOS:
+                lsa.resumos = {f"{socket.inet_ntoa(rede)}/{tamanho}": custo
+                               for rede, tamanho, custo in RESUMO.iter_unpack(valor)}
+        return lsa
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise ErroFormato(f"LSA binário inválido: {e}") from e
+
+
+# Uma mesma instância de LSA chega de vários vizinhos e, na simulação em processo, a
+# todos os roteadores: um corpo já visto é só uma consulta ao cache. Os LSAs recebidos
+# não são alterados depois de decodificados, então a mesma instância pode ser
+# compartilhada; o instantâneo, que ajusta a idade dos seus, decodifica por fora.
+@lru_cache(maxsize=4096)
+def _decodificar_lsa_recebido(corpo: bytes) -> LSA:
+    return decodificar_corpo_lsa(memoryview(corpo))
+
+
+def codificar_hello(hello: Hello) -> bytes:
+    # Sempre binário e num único datagrama: Hellos são pequenos e frequentes.
+    try:
+        partes = [CABECALHO.pack(MAGICO, VERSAO, TIPO_HELLO, 0, 0, 0, 1),
+                  HELLO_FIXO.pack(hello.intervalo_ms, hello.morto_ms)]
+        partes.extend(_tabela_nomes([hello.id] + hello.vistos))
+        if hello.carimbo is not None:
+            partes.append(EXTENSAO.pack(EXTENSAO_CARIMBO, CARIMBO.size) + CARIMBO.pack(hello.carimbo))
+        ecos = [ECO.pack(indice, *hello.ecos[nome])
+                for indice, nome in enumerate(hello.vistos, 1) if nome in hello.ecos]
+        if ecos:
+            partes.append(EXTENSAO.pack(EXTENSAO_ECO, ECO.size * len(ecos)))
+            partes.extend(ecos)
+    except (struct.error, ValueError) as e:
+        raise ErroFormato(f"Hello de {hello.id} não representável: {e}") from e
+    return b"".join(partes)
+
+
+def decodificar_corpo_hello(corpo: memoryview) -> Hello:
+    try:
+        intervalo_ms, morto_ms = HELLO_FIXO.unpack_from(corpo, 0)
+        nomes, posicao = _ler_tabela_nomes(corpo, HELLO_FIXO.size)
+        hello = Hello(nomes[0], intervalo_ms, morto_ms, nomes[1:])
+        for tipo, valor in _extensoes(corpo, posicao):
+            if tipo == EXTENSAO_CARIMBO:
+                (hello.carimbo,) = CARIMBO.unpack(valor)
+            elif tipo == EXTENSAO_ECO:
+                for indice, carimbo, retencao in ECO.iter_unpack(valor):
+                    hello.ecos[nomes[indice]] = (carimbo, retencao)
+        return hello
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise ErroFormato(f"Hello inválido: {e}") from e
+
+
+def _lotes_instancias(instancias: List[Tuple[str, int, bool]]) -> List[List[Tuple[str, int, bool]]]:
+    # Pelo menos um lote, mesmo vazio: descrições e pedidos vazios também dizem algo.
+    return [instancias[inicio:inicio + MAX_ACKS_DATAGRAMA]
+            for inicio in range(0, max(len(instancias), 1), MAX_ACKS_DATAGRAMA)]
+
+
+def _corpo_instancias(id: str, lote: List[Tuple[str, int, bool]]) -> List[bytes]:
+    # Tabela de nomes (o remetente primeiro) e as instâncias (origem, seq, expurgo) por índice.
+    nomes = [id]
+    indices = {id: 0}
+    for origem, _, _ in lote:
+        if origem not in indices:
+            indices[origem] = len(nomes)
+            nomes.append(origem)
+    partes = _tabela_nomes(nomes)
+    partes.append(CONTAGEM.pack(len(lote)))
+    partes.extend(ACK_ENTRADA.pack(indices[origem], seq, expurgo) for origem, seq, expurgo in lote)
+    return partes
+
+
+def _ler_instancias(corpo: memoryview, posicao: int) -> Tuple[str, List[Tuple[str, int, bool]]]:
+    nomes, posicao = _ler_tabela_nomes(corpo, posicao)
+    (quantidade,) = CONTAGEM.unpack_from(corpo, posicao)
+    posicao += CONTAGEM.size
+    fim = posicao + quantidade * ACK_ENTRADA.size
+    if len(corpo) < fim:
+        raise ErroFormato("lista de instâncias truncada")
+    return nomes[0], [(nomes[indice], seq, bool(expurgo))
+                      for indice, seq, expurgo in ACK_ENTRADA.iter_unpack(corpo[posicao:fim])]
+
+
+def codificar_ack(ack: Ack) -> List[bytes]:
+    datagramas = []
+    for inicio in range(0, len(ack.instancias), MAX_ACKS_DATAGRAMA):
+        lote = ack.instancias[inicio:inicio + MAX_ACKS_DATAGRAMA]
+        try:
+            partes = [CABECALHO.pack(MAGICO, VERSAO, TIPO_ACK, 0, 0, 0, 1)]
+            partes.extend(_corpo_instancias(ack.id, lote))
+        except (struct.error, ValueError) as e:
+            raise ErroFormato(f"Ack de {ack.id} não representável: {e}") from e
+        datagramas.append(b"".join(partes))
+    return datagramas
+
+
+def decodificar_corpo_ack(corpo: memoryview) -> Ack:
+    try:
+        return Ack(*_ler_instancias(corpo, 0))
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise ErroFormato(f"Ack inválido: {e}") from e
+
+
+def codificar_descricao(descricao: Descricao) -> List[bytes]:
+    # Cada lote é um datagrama independente (não um fragmento): quem recebe compara e
+    # pede o que falta lote a lote, sem esperar a descrição inteira.
+    lotes = _lotes_instancias(descricao.instancias)
+    datagramas = []
+    for indice, lote in enumerate(lotes):
+        try:
+            partes = [CABECALHO.pack(MAGICO, VERSAO, TIPO_DESCRICAO, 0, 0, 0, 1),
+                      DESCRICAO_FIXO.pack(descricao.troca, indice, len(lotes))]
+            partes.extend(_corpo_instancias(descricao.id, lote))
+        except (struct.error, ValueError) as e:
+            raise ErroFormato(f"descrição da LSDB de {descricao.id} não representável: {e}") from e
+        datagramas.append(b"".join(partes))
+    return datagramas
+
+
+def decodificar_corpo_descricao(corpo: memoryview) -> Descricao:
+    try:
+        troca, lote, total = DESCRICAO_FIXO.unpack_from(corpo, 0)
+        id, instancias = _ler_instancias(corpo, DESCRICAO_FIXO.size)
+        return Descricao(id, troca, instancias, lote, total)
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise ErroFormato(f"descrição da LSDB inválida: {e}") from e
+
+
+def codificar_pedido(pedido: Pedido) -> List[bytes]:
+    lotes = _lotes_instancias(pedido.instancias)
+    datagramas = []
+    for indice, lote in enumerate(lotes):
+        try:
+            partes = [CABECALHO.pack(MAGICO, VERSAO, TIPO_PEDIDO, 0, 0, 0, 1),
+                      PEDIDO_FIXO.pack(pedido.troca, pedido.completo and indice == len(lotes) - 1)]
+            partes.extend(_corpo_instancias(pedido.id, lote))
+        except (struct.error, ValueError) as e:
+            raise ErroFormato(f"pedido de LSAs de {pedido.id} não representável: {e}") from e
+        datagramas.append(b"".join(partes))
+    return datagramas
+
+
+def decodificar_corpo_pedido(corpo: memoryview) -> Pedido:
+    try:
+        troca, completo = PEDIDO_FIXO.unpack_from(corpo, 0)
+        id, instancias = _ler_instancias(corpo, PEDIDO_FIXO.size)
+        return Pedido(id, troca, instancias, bool(completo))
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise ErroFormato(f"pedido de LSAs inválido: {e}") from e
+
+
+def _extensoes(corpo: memoryview, posicao: int):
+    while posicao + EXTENSAO.size <= len(corpo):
+        tipo, tamanho = EXTENSAO.unpack_from(corpo, posicao)
+        posicao += EXTENSAO.size
+        if posicao + tamanho > len(corpo):
+            raise ErroFormato("extensão truncada")
+        yield tipo, corpo[posicao:posicao + tamanho]
+        posicao += tamanho
+
+
+class Remontador:
+    def __init__(self, validade: float = 5.0):
+        self.validade = validade
+        self.parciais: Dict[Tuple[object, int], Tuple[float, Dict[int, bytes]]] = {}
+
+    def receber(self, dados: bytes, origem: object) -> Optional[Tuple[int, memoryview, List[bytes]]]:
+        # Retorna (tipo, corpo, datagramas originais) quando a mensagem está completa,
+        # ou None enquanto faltam fragmentos.
+        if len(dados) < CABECALHO.size:
+            raise ErroFormato("datagrama menor que o cabeçalho")
+        magico, versao, tipo, _, id_mensagem, indice, total = CABECALHO.unpack_from(dados)
+        if magico != MAGICO or versao != VERSAO:
+            raise ErroFormato(f"versão {versao} não suportada")
+        if total <= 1:
+            return tipo, memoryview(dados)[CABECALHO.size:], [dados]
+        if indice >= total:
+            raise ErroFormato(f"fragmento {indice} fora do total {total}")
+
+        agora = time.monotonic()
+        if len(self.parciais) > 64:
+            for chave in [c for c, (inicio, _) in self.parciais.items() if agora - inicio > self.validade]:
+                del self.parciais[chave]
+
+        chave = (origem, id_mensagem)
+        inicio, partes = self.parciais.setdefault(chave, (agora, {}))
+        partes[indice] = dados
+        if len(partes) < total:
+            return None
+        del self.parciais[chave]
+        datagramas = [partes[i] for i in range(total)]
+        corpo = b"".join(memoryview(d)[CABECALHO.size:] for d in datagramas)
+        return tipo, memoryview(corpo), datagramas
+
+
+def decodificar_binario(dados: bytes, origem: object,
+                        remontador: Remontador) -> Optional[Tuple[Union[LSA, Hello, Ack, Descricao, Pedido], List[bytes]]]:
+    mensagem = remontador.receber(dados, origem)
+    if mensagem is None:
+        return None
+    tipo, corpo, datagramas = mensagem
+    if tipo == TIPO_LSA:
+        return _decodificar_lsa_recebido(corpo.tobytes()), datagramas
+    if tipo == TIPO_HELLO:
+        return decodificar_corpo_hello(corpo), datagramas
+    if tipo == TIPO_ACK:
+        return decodificar_corpo_ack(corpo), datagramas
+    if tipo == TIPO_DESCRICAO:
+        return decodificar_corpo_descricao(corpo), datagramas
+    if tipo == TIPO_PEDIDO:
+        return decodificar_corpo_pedido(corpo), datagramas
+    raise ErroFormato(f"tipo de mensagem desconhecido: {tipo}")
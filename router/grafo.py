@@ -0,0 +1,111 @@
+import sys
+from array import array
+from typing import Dict, Iterator, List, Mapping, Optional
+
+
+class GrafoCSR:
+    # Arestas em Compressed Sparse Row: os vizinhos do nó u ficam em
+    # vizinhos[inicio[u]:inicio[u + 1]], com os pesos nas mesmas posições.
+    __slots__ = ("inicio", "vizinhos", "pesos")
+
+    def __init__(self, inicio: array, vizinhos: array, pesos: array):
+        self.inicio = inicio
+        self.vizinhos = vizinhos
+        self.pesos = pesos
+
+    def __len__(self) -> int:
+        return len(self.inicio) - 1
+
+
+class Grafo(Mapping):
+    # Grafo dirigido com os nomes dos roteadores internados em inteiros densos.
+    # As arestas de cada nó ficam num dict id -> peso, atualizado em O(grau) a
+    # cada LSA; o SPF completo percorre a cópia CSR, refeita só quando o grafo
+    # mudou. Ids não são reaproveitados: um nó que sai fica com arestas None.
+    # Como Mapping, o grafo continua legível por nome (logs, verificar_rotas).
+    def __init__(self):
+        self.nomes: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self.arestas: List[Optional[Dict[int, int]]] = []
+        self._presentes = 0
+        self._csr: Optional[GrafoCSR] = None
+
+    @classmethod
+    def de_mapa(cls, mapa: Mapping[str, Mapping[str, int]]) -> 'Grafo':
+        grafo = cls()
+        for nome in mapa:
+            grafo.adicionar_no(grafo.internar(nome))
+        for nome, enlaces in mapa.items():
+            u = grafo.ids[nome]
+            for vizinho, peso in enlaces.items():
+                if vizinho in grafo.ids:
+                    grafo.definir(u, grafo.ids[vizinho], peso)
+        return grafo
+
+    def internar(self, nome: str) -> int:
+        id = self.ids.get(nome)
+        if id is None:
+            id = self.ids[nome] = len(self.nomes)
+            self.nomes.append(sys.intern(nome))
+            self.arestas.append(None)
+        return id
+
+    def presente(self, id: int) -> bool:
+        return id < len(self.arestas) and self.arestas[id] is not None
+
+    def adicionar_no(self, id: int):
+        if self.arestas[id] is None:
+            self.arestas[id] = {}
+            self._presentes += 1
+            self._csr = None
+
+    def remover_no(self, id: int):
+        if self.arestas[id] is not None:
+            self.arestas[id] = None
+            self._presentes -= 1
+            self._csr = None
+
+    def definir(self, u: int, v: int, peso: int):
+        self.arestas[u][v] = peso
+        self._csr = None
+
+    def remover(self, u: int, v: int) -> Optional[int]:
+        arestas = self.arestas[u]
+        if arestas is None or v not in arestas:
+            return None
+        self._csr = None
+        return arestas.pop(v)
+
+    def peso(self, u: int, v: int) -> Optional[int]:
+        arestas = self.arestas[u]
+        return arestas.get(v) if arestas is not None else None
+
+    def csr(self) -> GrafoCSR:
+        if self._csr is None:
+            inicio = array("l", [0])
+            vizinhos = array("l")
+            pesos = array("l")
+            for arestas in self.arestas:
+                if arestas:
+                    vizinhos.extend(arestas.keys())
+                    pesos.extend(arestas.values())
+                inicio.append(len(vizinhos))
+            self._csr = GrafoCSR(inicio, vizinhos, pesos)
+        return self._csr
+
+    def __getitem__(self, nome: str) -> Dict[str, int]:
+        id = self.ids.get(nome)
+        arestas = self.arestas[id] if id is not None else None
+        if arestas is None:
+            raise KeyError(nome)
+        return {self.nomes[v]: peso for v, peso in arestas.items()}
+
+    def __contains__(self, nome: object) -> bool:
+        id = self.ids.get(nome)
+        return id is not None and self.arestas[id] is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return (self.nomes[id] for id, arestas in enumerate(self.arestas) if arestas is not None)
+
+    def __len__(self) -> int:
+        return self._presentes
@@ -0,0 +1,115 @@
+import os
+import mmap
+import socket
+import struct
+from typing import Dict, List, Tuple
+
+from fib import Saltos
+from formato import ErroFormato, corpo_lsa, decodificar_corpo_lsa
+from lsa import LSA
+
+# Estado do roteador em disco para o reinício a quente: a LSDB de cada área, com a
+# idade de cada LSA, e as rotas instaladas. Os LSAs vão no corpo do formato binário.
+MAGICO = b"LSIN"
+VERSAO = 1
+# mágico, versão, seq própria, instante da gravação (time.time), áreas, rotas
+CABECALHO = struct.Struct("!4sBIdHI")
+# tamanho do nome da área, quantidade de LSAs
+AREA = struct.Struct("!BI")
+# idade em segundos, tamanho do corpo
+ENTRADA_LSA = struct.Struct("!HI")
+# rede, tamanho do prefixo, quantidade de saltos (cada um em 4 bytes em seguida)
+ROTA = struct.Struct("!4sBB")
+SALTO = struct.Struct("!4s")
+
+
+class Instantaneo:
+    __slots__ = ("seq", "gravado_em", "lsas", "rotas")
+
+    def __init__(self, seq: int, gravado_em: float, lsas: Dict[str, List[Tuple[LSA, int]]],
+                 rotas: Dict[str, Saltos]):
+        self.seq = seq
+        self.gravado_em = gravado_em
+        # Área -> (LSA, idade em segundos na gravação).
+        self.lsas = lsas
+        self.rotas = rotas
+
+
+def codificar_instantaneo(instantaneo: Instantaneo) -> bytes:
+    partes = [CABECALHO.pack(MAGICO, VERSAO, instantaneo.seq, instantaneo.gravado_em,
+                             len(instantaneo.lsas), len(instantaneo.rotas))]
+    try:
+        for area, lsas in instantaneo.lsas.items():
+            nome = area.encode()
+            partes.append(AREA.pack(len(nome), len(lsas)) + nome)
+            for lsa, idade in lsas:
+                corpo = corpo_lsa(lsa)
+                partes.append(ENTRADA_LSA.pack(min(idade, 0xFFFF), len(corpo)))
+                partes.append(corpo)
+        for prefixo, saltos in instantaneo.rotas.items():
+            rede, _, tamanho = prefixo.partition("/")
+            partes.append(ROTA.pack(socket.inet_aton(rede), int(tamanho), len(saltos)))
+            partes.extend(SALTO.pack(socket.inet_aton(salto)) for salto in saltos)
+    except (struct.error, ValueError, OSError) as e:
+        raise ErroFormato(f"instantâneo não representável: {e}") from e
+    return b"".join(partes)
+
+
+def decodificar_instantaneo(dados: memoryview) -> Instantaneo:
+    try:
+        magico, versao, seq, gravado_em, areas, rotas = CABECALHO.unpack_from(dados, 0)
+        if magico != MAGICO or versao != VERSAO:
+            raise ErroFormato(f"instantâneo com cabeçalho desconhecido ({bytes(magico)!r}, versão {versao})")
+        posicao = CABECALHO.size
+        lsas: Dict[str, List[Tuple[LSA, int]]] = {}
+        for _ in range(areas):
+            tamanho, quantidade = AREA.unpack_from(dados, posicao)
+            posicao += AREA.size
+            area = str(dados[posicao:posicao + tamanho], "utf-8")
+            posicao += tamanho
+            lsas_area = lsas[area] = []
+            for _ in range(quantidade):
+                idade, tamanho = ENTRADA_LSA.unpack_from(dados, posicao)
+                posicao += ENTRADA_LSA.size
+                if posicao + tamanho > len(dados):
+                    raise ErroFormato("instantâneo truncado")
+                lsas_area.append((decodificar_corpo_lsa(dados[posicao:posicao + tamanho]), idade))
+                posicao += tamanho
+        instaladas: Dict[str, Saltos] = {}
+        for _ in range(rotas):
+            rede, tamanho, quantidade = ROTA.unpack_from(dados, posicao)
+            posicao += ROTA.size
+            saltos = tuple(socket.inet_ntoa(salto) for (salto,) in SALTO.iter_unpack(
+                dados[posicao:posicao + quantidade * SALTO.size]))
+            if len(saltos) != quantidade:
+                raise ErroFormato("instantâneo truncado")
+            posicao += quantidade * SALTO.size
+            instaladas[f"{socket.inet_ntoa(rede)}/{tamanho}"] = saltos
+        return Instantaneo(seq, gravado_em, lsas, instaladas)
+    except (struct.error, UnicodeDecodeError) as e:
+        raise ErroFormato(f"instantâneo inválido: {e}") from e
+
+
+def gravar_instantaneo(caminho: str, instantaneo: Instantaneo) -> int:
+    # Escrita atômica: quem lê vê o instantâneo anterior inteiro ou o novo inteiro,
+    # nunca um arquivo pela metade, mesmo com o processo morto no meio da gravação.
+    dados = codificar_instantaneo(instantaneo)
+    temporario = f"{caminho}.tmp"
+    with open(temporario, "wb") as arquivo:
+        arquivo.write(dados)
+        arquivo.flush()
+        os.fsync(arquivo.fileno())
+    os.replace(temporario, caminho)
+    return len(dados)
+
+
+def ler_instantaneo(caminho: str) -> Tuple[Instantaneo, int]:
+    # Lido por mmap: os LSAs são decodificados direto das páginas do arquivo, sem
+    # copiá-lo antes para a memória do processo.
+    with open(caminho, "rb") as arquivo:
+        tamanho = os.fstat(arquivo.fileno()).st_size
+        if tamanho < CABECALHO.size:
+            raise ErroFormato("instantâneo truncado")
+        with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            with memoryview(mapa) as dados:
+                return decodificar_instantaneo(dados), tamanho
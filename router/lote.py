@@ -0,0 +1,89 @@
+import socket
+import threading
+from contextlib import contextmanager
+from typing import Callable, List, Optional, Tuple
+
+from formato import TAMANHO_RECEPCAO
+from registro import aviso
+
+
+def abrir_socket(ip: str, porta: int, recepcao: int = 0, envio: int = 0, bloqueante: bool = True) -> socket.socket:
+    # recepcao/envio: SO_RCVBUF/SO_SNDBUF em bytes, 0 mantém o padrão do kernel. O
+    # kernel limita o pedido a net.core.rmem_max/wmem_max sem reclamar.
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    if recepcao:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, recepcao)
+    if envio:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, envio)
+    sock.setblocking(bloqueante)
+    sock.bind((ip, porta))
+    return sock
+
+
+class Receptor:
+    # Drena o socket a cada despertar: depois do primeiro datagrama, lê sem bloquear
+    # tudo o que já está na fila, até o tamanho do lote. A leitura vai para um buffer
+    # alocado uma vez, e só o datagrama lido é copiado (a LSDB guarda os bytes).
+    def __init__(self, sock: socket.socket, tamanho_lote: int):
+        self.socket = sock
+        self.tamanho_lote = max(1, tamanho_lote)
+        self.buffer = bytearray(TAMANHO_RECEPCAO)
+        self.visao = memoryview(self.buffer)
+
+    def drenar(self) -> List[Tuple[bytes, Tuple[str, int]]]:
+        lote = []
+        flags = 0
+        while len(lote) < self.tamanho_lote:
+            try:
+                tamanho, addr = self.socket.recvfrom_into(self.buffer, 0, flags)
+            except (BlockingIOError, InterruptedError):
+                break
+            lote.append((bytes(self.visao[:tamanho]), addr))
+            flags = socket.MSG_DONTWAIT
+        return lote
+
+
+class TransporteLote:
+    # Fora de um lote, cada datagrama sai na hora. Dentro dele, os envios da thread que
+    # o abriu (a recepção) ficam numa fila e saem juntos no fim, depois de processado o
+    # lote inteiro; timers de outras threads continuam enviando direto.
+    def __init__(self, sock: socket.socket, ao_fechar: Optional[Callable[[], None]] = None):
+        self.socket = sock
+        self.local = threading.local()
+        # No asyncio, tira o socket do loop antes de fechá-lo: um socket novo pode
+        # reaproveitar o mesmo descritor.
+        self.ao_fechar = ao_fechar
+
+    def sendto(self, dados: bytes, destino: Tuple[str, int]):
+        fila: Optional[list] = getattr(self.local, "fila", None)
+        if fila is not None:
+            fila.append((dados, destino))
+            return
+        self._enviar(dados, destino)
+
+    def _enviar(self, dados: bytes, destino: Tuple[str, int]):
+        try:
+            self.socket.sendmsg((dados,), (), 0, destino)
+        except BlockingIOError:
+            # Buffer de envio cheio num socket não bloqueante: o datagrama se perde como
+            # na rede, e a retransmissão ou o próximo Hello cobrem.
+            pass
+        except OSError as e:
+            # Destino inalcançável, interface fora do ar: também não derruba o chamador
+            # (timer, recepção ou worker), só fica registrado.
+            aviso("falha ao enviar datagrama para %s: %s", destino[0], e)
+
+    @contextmanager
+    def lote(self):
+        fila = self.local.fila = []
+        try:
+            yield
+        finally:
+            self.local.fila = None
+            for dados, destino in fila:
+                self._enviar(dados, destino)
+
+    def close(self):
+        if self.ao_fechar is not None:
+            self.ao_fechar()
+        self.socket.close()
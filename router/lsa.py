@@ -0,0 +1,130 @@
+import sys
+from typing import Dict, Any, List, Optional, Tuple
+
+# Idade anunciada nos expurgos (MaxAge): qualquer roteador a reconhece como expurgo,
+# independentemente da idade máxima configurada localmente.
+IDADE_EXPURGO = 0xFFFF
+
+class Vizinho:
+    # __slots__: a LSDB guarda um Vizinho por enlace de cada LSA, milhares por roteador.
+    # Nomes e IPs são internados: o mesmo roteador aparece nos LSAs de todos os vizinhos
+    # e, sem isso, cada LSA decodificado traria cópias próprias das mesmas strings.
+    __slots__ = ("ip", "peso")
+
+    def __init__(self, ip: str, peso: int):
+        self.ip = sys.intern(ip)
+        self.peso = peso
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ip": self.ip,
+            "peso": self.peso
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Vizinho':
+        return cls(
+            ip=data["ip"],
+            peso=data["peso"]
+        )
+
+class LSA:
+    __slots__ = ("id", "ip", "seq", "vizinhos", "idade", "prefixos", "resumos")
+
+    def __init__(self, id: str, ip: str, seq: int, vizinhos: Dict[str, Vizinho], idade: int = 0,
+                 prefixos: Tuple[str, ...] = (), resumos: Optional[Dict[str, int]] = None):
+        self.id = sys.intern(id)
+        self.ip = sys.intern(ip)
+        self.seq = seq
+        self.vizinhos = vizinhos
+        self.idade = idade
+        # Redes (CIDR) das interfaces do roteador; vazio em LSAs de versões que só
+        # anunciavam o endereço, cuja rede é deduzida do ip.
+        self.prefixos = tuple(sys.intern(prefixo) for prefixo in prefixos)
+        # Resumos de um roteador de borda de área: prefixo (CIDR) -> custo a partir dele.
+        self.resumos = resumos or {}
+
+    @property
+    def expurgo(self) -> bool:
+        return self.idade >= IDADE_EXPURGO
+
+    def mesmo_conteudo(self, outro: 'LSA') -> bool:
+        # Refresh: mesma origem, endereço, enlaces, prefixos e resumos; só seq/idade mudam.
+        if (self.ip != outro.ip or self.vizinhos.keys() != outro.vizinhos.keys()
+                or self.prefixos != outro.prefixos or self.resumos != outro.resumos):
+            return False
+        return all(v.ip == outro.vizinhos[k].ip and v.peso == outro.vizinhos[k].peso
+                   for k, v in self.vizinhos.items())
+
+    @property
+    def instancia(self) -> Tuple[int, bool]:
+        # Ordem das instâncias de um mesmo LSA: seq maior vence; com a mesma seq, o expurgo vence.
+        return self.seq, self.expurgo
+    
+    def to_dict(self) -> Dict[str, Any]:
+        dados = {
+            "id": self.id,
+            "ip": self.ip,
+            "seq": self.seq,
+            "vizinhos": {k: v.to_dict() for k, v in self.vizinhos.items()}
+        }
+        if self.idade:
+            dados["idade"] = self.idade
+        if self.prefixos:
+            dados["prefixos"] = list(self.prefixos)
+        if self.resumos:
+            dados["resumos"] = dict(self.resumos)
+        return dados
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'LSA':
+        vizinhos = {sys.intern(k): Vizinho.from_dict(v) for k, v in data["vizinhos"].items()}
+        return cls(
+            id=data["id"],
+            ip=data["ip"],
+            seq=data["seq"],
+            vizinhos=vizinhos,
+            idade=data.get("idade", 0),
+            prefixos=data.get("prefixos", ()),
+            resumos=data.get("resumos")
+        )
+
+class Hello:
+    def __init__(self, id: str, intervalo_ms: int, morto_ms: int, vistos: List[str],
+                 carimbo: Optional[int] = None, ecos: Optional[Dict[str, Tuple[int, int]]] = None):
+        self.id = id
+        self.intervalo_ms = intervalo_ms
+        self.morto_ms = morto_ms
+        # Vizinhos dos quais o remetente ouviu Hellos recentemente (verificação bidirecional).
+        self.vistos = vistos
+        # Medição de RTT: instante de envio em us (módulo 2^32) e, por vizinho, o último
+        # carimbo recebido dele e há quantos us ele chegou.
+        self.carimbo = carimbo
+        self.ecos = ecos or {}
+
+class Ack:
+    def __init__(self, id: str, instancias: List[Tuple[str, int, bool]]):
+        self.id = id
+        # (origem, seq, expurgo) de cada LSA confirmado.
+        self.instancias = instancias
+
+class Descricao:
+    # Descrição da LSDB (database description do OSPF): as instâncias que o remetente
+    # tem, trocadas quando uma adjacência sobe. Vai em lotes independentes, cada um
+    # com o número da troca, o índice do lote e o total de lotes.
+    def __init__(self, id: str, troca: int, instancias: List[Tuple[str, int, bool]], lote: int = 0, total: int = 1):
+        self.id = id
+        self.troca = troca
+        # (origem, seq, expurgo) de cada LSA guardado.
+        self.instancias = instancias
+        self.lote = lote
+        self.total = total
+
+class Pedido:
+    # LSAs que faltam ou estão velhos em quem pede, em resposta a uma descrição. O último
+    # pedido de uma troca vai com completo: a descrição inteira chegou e foi comparada.
+    def __init__(self, id: str, troca: int, instancias: List[Tuple[str, int, bool]], completo: bool = False):
+        self.id = id
+        self.troca = troca
+        self.instancias = instancias
+        self.completo = completo
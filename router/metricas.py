@@ -0,0 +1,131 @@
+import bisect
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+PREFIXO = "linkstate"
+
+# Limites dos baldes em segundos, de 50 us a 10 s.
+BALDES_PADRAO = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histograma:
+    def __init__(self, baldes: Tuple[float, ...] = BALDES_PADRAO):
+        self.baldes = baldes
+        # Um contador por balde mais o +Inf; acumulados só na exposição.
+        self.contagens: List[int] = [0] * (len(baldes) + 1)
+        self.soma = 0.0
+
+    def observar(self, valor: float):
+        self.contagens[bisect.bisect_left(self.baldes, valor)] += 1
+        self.soma += valor
+
+
+class Metricas:
+    # Um contador pode ter vários escritores (lsas_enviados_total sai da recepção,
+    # dos timers de Hello e retransmissão e do worker de rotas), e "+=" num dict não
+    # é atômico: incrementos e observações passam por um lock próprio, curto e quase
+    # sempre livre, e a coleta copia os valores sob o mesmo lock. Valores já mantidos
+    # em outros objetos (LSDB, agendador de SPF) entram como funções lidas só na
+    # coleta, sem custo no caminho quente.
+    def __init__(self, rotulos: Dict[str, str]):
+        self.rotulos = rotulos
+        self.lock = threading.Lock()
+        self.contadores: Dict[str, int] = {}
+        self.descricoes: Dict[str, str] = {}
+        self.coletados: Dict[str, Tuple[str, Callable[[], float]]] = {}
+        self.histogramas: Dict[str, Histograma] = {}
+
+    def contador(self, nome: str, descricao: str):
+        self.contadores[nome] = 0
+        self.descricoes[nome] = descricao
+
+    def incrementar(self, nome: str, valor: int = 1):
+        with self.lock:
+            self.contadores[nome] += valor
+
+    def coletar(self, nome: str, tipo: str, descricao: str, funcao: Callable[[], float]):
+        self.coletados[nome] = (tipo, funcao)
+        self.descricoes[nome] = descricao
+
+    def histograma(self, nome: str, descricao: str) -> Histograma:
+        self.histogramas[nome] = Histograma()
+        self.descricoes[nome] = descricao
+        return self.histogramas[nome]
+
+    def observar(self, nome: str, valor: float):
+        histograma = self.histogramas[nome]
+        with self.lock:
+            histograma.observar(valor)
+
+    def _rotulos(self, extras: str = "") -> str:
+        pares = [f'{chave}="{valor}"' for chave, valor in self.rotulos.items()]
+        if extras:
+            pares.append(extras)
+        return "{" + ",".join(pares) + "}" if pares else ""
+
+    def exposicao(self) -> str:
+        # Formato texto do Prometheus.
+        linhas = []
+
+        def cabecalho(nome: str, tipo: str):
+            linhas.append(f"# HELP {PREFIXO}_{nome} {self.descricoes[nome]}")
+            linhas.append(f"# TYPE {PREFIXO}_{nome} {tipo}")
+
+        with self.lock:
+            contadores = list(self.contadores.items())
+            histogramas = [(nome, histograma.baldes, list(histograma.contagens), histograma.soma)
+                           for nome, histograma in self.histogramas.items()]
+        for nome, valor in contadores:
+            cabecalho(nome, "counter")
+            linhas.append(f"{PREFIXO}_{nome}{self._rotulos()} {valor}")
+        for nome, (tipo, funcao) in list(self.coletados.items()):
+            cabecalho(nome, tipo)
+            linhas.append(f"{PREFIXO}_{nome}{self._rotulos()} {funcao()}")
+        for nome, baldes, contagens, soma in histogramas:
+            cabecalho(nome, "histogram")
+            acumulado = 0
+            for limite, contagem in zip(baldes, contagens):
+                acumulado += contagem
+                rotulos = self._rotulos('le="%s"' % limite)
+                linhas.append(f"{PREFIXO}_{nome}_bucket{rotulos} {acumulado}")
+            acumulado += contagens[-1]
+            rotulos = self._rotulos('le="+Inf"')
+            linhas.append(f"{PREFIXO}_{nome}_bucket{rotulos} {acumulado}")
+            linhas.append(f"{PREFIXO}_{nome}_sum{self._rotulos()} {soma}")
+            linhas.append(f"{PREFIXO}_{nome}_count{self._rotulos()} {acumulado}")
+        return "\n".join(linhas) + "\n"
+
+
+def servir_metricas(metricas: Metricas, endereco: str, porta: int,
+                    documentos: Optional[Dict[str, Callable[[], Any]]] = None) -> ThreadingHTTPServer:
+    # documentos: caminhos extras servidos em JSON (estado do roteador para ferramentas externas).
+    documentos = documentos or {}
+
+    class Manipulador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            caminho = self.path.rstrip("/")
+            if caminho in documentos:
+                corpo = json.dumps(documentos[caminho]()).encode()
+                tipo = "application/json"
+            elif caminho in ("", "/metrics", "/metricas"):
+                corpo = metricas.exposicao().encode()
+                tipo = "text/plain; version=0.0.4; charset=utf-8"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", tipo)
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, formato, *args):
+            pass
+
+    servidor = ThreadingHTTPServer((endereco, porta), Manipulador)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True, name="metricas").start()
+    return servidor
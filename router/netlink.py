@@ -0,0 +1,207 @@
+import os
+import socket
+import struct
+from typing import Dict, List, Tuple
+
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+
+RTM_NEWADDR = 20
+RTM_GETADDR = 22
+RTM_NEWROUTE = 24
+RTM_DELROUTE = 25
+RTM_GETROUTE = 26
+
+NLM_F_REQUEST = 0x01
+NLM_F_MULTI = 0x02
+NLM_F_ACK = 0x04
+NLM_F_DUMP = 0x300
+NLM_F_REPLACE = 0x100
+NLM_F_CREATE = 0x400
+
+RTA_DST = 1
+RTA_OIF = 4
+RTA_GATEWAY = 5
+RTA_MULTIPATH = 9
+RTA_TABLE = 15
+
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+
+RT_TABLE_MAIN = 254
+RTPROT_BOOT = 3
+RT_SCOPE_UNIVERSE = 0
+RT_SCOPE_NOWHERE = 255
+RTN_UNICAST = 1
+
+NLMSGHDR = struct.Struct("=IHHII")
+RTMSG = struct.Struct("=BBBBBBBBI")
+IFADDRMSG = struct.Struct("=BBBBI")
+RTATTR = struct.Struct("=HH")
+NLMSGERR = struct.Struct("=i")
+# struct rtnexthop: tamanho, flags, hops, índice da interface; seguido dos atributos do salto.
+RTNEXTHOP = struct.Struct("=HBBi")
+
+# Mensagens por sendto; mantém as confirmações dentro do buffer de recepção padrão.
+TAMANHO_LOTE = 256
+
+
+def _alinhar(tamanho: int) -> int:
+    return (tamanho + 3) & ~3
+
+
+def _atributo(tipo: int, valor: bytes) -> bytes:
+    tamanho = RTATTR.size + len(valor)
+    return RTATTR.pack(tamanho, tipo) + valor + b"\0" * (_alinhar(tamanho) - tamanho)
+
+
+def _atributos(dados: bytes, inicio: int, fim: int) -> Dict[int, bytes]:
+    atributos = {}
+    while inicio + RTATTR.size <= fim:
+        tamanho, tipo = RTATTR.unpack_from(dados, inicio)
+        if tamanho < RTATTR.size:
+            break
+        atributos[tipo] = dados[inicio + RTATTR.size:inicio + tamanho]
+        inicio += _alinhar(tamanho)
+    return atributos
+
+
+def _separar_prefixo(prefixo: str) -> Tuple[bytes, int]:
+    rede, _, tamanho = prefixo.partition("/")
+    return socket.inet_aton(rede), int(tamanho or 32)
+
+
+def _saltos_multicaminho(dados: bytes) -> Tuple[str, ...]:
+    saltos = []
+    inicio = 0
+    while inicio + RTNEXTHOP.size <= len(dados):
+        (tamanho, _, _, _) = RTNEXTHOP.unpack_from(dados, inicio)
+        if tamanho < RTNEXTHOP.size:
+            break
+        via = _atributos(dados, inicio + RTNEXTHOP.size, inicio + tamanho).get(RTA_GATEWAY)
+        if via:
+            saltos.append(socket.inet_ntoa(via))
+        inicio += _alinhar(tamanho)
+    return tuple(saltos)
+
+
+class ErroNetlink(OSError):
+    pass
+
+
+class SocketRtnetlink:
+    def __init__(self):
+        self.socket = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+        self.socket.bind((0, 0))
+        self.seq = 0
+
+    def fechar(self):
+        self.socket.close()
+
+    def _mensagem(self, tipo: int, flags: int, corpo: bytes) -> Tuple[int, bytes]:
+        self.seq += 1
+        return self.seq, NLMSGHDR.pack(NLMSGHDR.size + len(corpo), tipo, flags, self.seq, 0) + corpo
+
+    def _mensagem_rota(self, tipo: int, flags: int, prefixo: str, saltos: Tuple[str, ...]) -> Tuple[int, bytes]:
+        rede, tamanho = _separar_prefixo(prefixo)
+        if tipo == RTM_DELROUTE:
+            # Como o "ip route del": casa com qualquer protocolo, escopo e tipo.
+            corpo = RTMSG.pack(socket.AF_INET, tamanho, 0, 0, RT_TABLE_MAIN, 0, RT_SCOPE_NOWHERE, 0, 0)
+        else:
+            corpo = RTMSG.pack(socket.AF_INET, tamanho, 0, 0, RT_TABLE_MAIN, RTPROT_BOOT,
+                               RT_SCOPE_UNIVERSE, RTN_UNICAST, 0)
+        corpo += _atributo(RTA_DST, rede)
+        if len(saltos) == 1:
+            corpo += _atributo(RTA_GATEWAY, socket.inet_aton(saltos[0]))
+        elif saltos and tipo != RTM_DELROUTE:
+            # ECMP: um rtnexthop por salto, cada um com o próprio RTA_GATEWAY.
+            proximos = b""
+            for salto in saltos:
+                gateway = _atributo(RTA_GATEWAY, socket.inet_aton(salto))
+                proximos += RTNEXTHOP.pack(RTNEXTHOP.size + len(gateway), 0, 0, 0) + gateway
+            corpo += _atributo(RTA_MULTIPATH, proximos)
+        return self._mensagem(tipo, flags, corpo)
+
+    def _mensagens(self):
+        while True:
+            dados = self.socket.recv(65536)
+            inicio = 0
+            while inicio + NLMSGHDR.size <= len(dados):
+                tamanho, tipo, flags, seq, _ = NLMSGHDR.unpack_from(dados, inicio)
+                if tamanho < NLMSGHDR.size:
+                    return
+                yield tipo, seq, dados, inicio + NLMSGHDR.size, inicio + tamanho
+                inicio += _alinhar(tamanho)
+
+    def executar(self, operacoes: List[Tuple[str, str, Tuple[str, ...]]]) -> Dict[int, int]:
+        # operacoes: (acao, prefixo, saltos) com acao em "replace" ou "del".
+        # Retorna {índice da operação: errno} para as que falharam.
+        erros = {}
+        for lote_inicio in range(0, len(operacoes), TAMANHO_LOTE):
+            lote = operacoes[lote_inicio:lote_inicio + TAMANHO_LOTE]
+            pendentes = {}
+            buffer = bytearray()
+            for indice, (acao, prefixo, saltos) in enumerate(lote, lote_inicio):
+                if acao == "del":
+                    seq, mensagem = self._mensagem_rota(RTM_DELROUTE, NLM_F_REQUEST | NLM_F_ACK, prefixo, saltos)
+                else:
+                    flags = NLM_F_REQUEST | NLM_F_ACK | NLM_F_CREATE | NLM_F_REPLACE
+                    seq, mensagem = self._mensagem_rota(RTM_NEWROUTE, flags, prefixo, saltos)
+                pendentes[seq] = indice
+                buffer += mensagem
+            self.socket.send(buffer)
+
+            for tipo, seq, dados, inicio, _ in self._mensagens():
+                if tipo == NLMSG_ERROR and seq in pendentes:
+                    (erro,) = NLMSGERR.unpack_from(dados, inicio)
+                    indice = pendentes.pop(seq)
+                    if erro:
+                        erros[indice] = -erro
+                if not pendentes:
+                    break
+        return erros
+
+    def _dump(self, tipo: int, corpo: bytes):
+        _, mensagem = self._mensagem(tipo, NLM_F_REQUEST | NLM_F_DUMP, corpo)
+        self.socket.send(mensagem)
+        for tipo_resposta, _, dados, inicio, fim in self._mensagens():
+            if tipo_resposta == NLMSG_DONE:
+                return
+            if tipo_resposta == NLMSG_ERROR:
+                (erro,) = NLMSGERR.unpack_from(dados, inicio)
+                raise ErroNetlink(-erro, os.strerror(-erro))
+            yield tipo_resposta, dados, inicio, fim
+
+    def listar_rotas(self) -> Dict[str, Tuple[str, ...]]:
+        rotas = {}
+        corpo = RTMSG.pack(socket.AF_INET, 0, 0, 0, 0, 0, 0, 0, 0)
+        for tipo, dados, inicio, fim in self._dump(RTM_GETROUTE, corpo):
+            if tipo != RTM_NEWROUTE:
+                continue
+            _, tamanho, _, _, tabela, _, _, tipo_rota, _ = RTMSG.unpack_from(dados, inicio)
+            atributos = _atributos(dados, inicio + RTMSG.size, fim)
+            if RTA_TABLE in atributos:
+                (tabela,) = struct.unpack("=I", atributos[RTA_TABLE])
+            if tabela != RT_TABLE_MAIN or tipo_rota != RTN_UNICAST:
+                continue
+            rede = socket.inet_ntoa(atributos.get(RTA_DST, b"\0\0\0\0"))
+            via = atributos.get(RTA_GATEWAY)
+            if via:
+                saltos = (socket.inet_ntoa(via),)
+            else:
+                saltos = _saltos_multicaminho(atributos.get(RTA_MULTIPATH, b""))
+            rotas[f"{rede}/{tamanho}"] = saltos
+        return rotas
+
+    def listar_enderecos(self) -> List[str]:
+        enderecos = []
+        corpo = IFADDRMSG.pack(socket.AF_INET, 0, 0, 0, 0)
+        for tipo, dados, inicio, fim in self._dump(RTM_GETADDR, corpo):
+            if tipo != RTM_NEWADDR:
+                continue
+            _, tamanho, _, _, _ = IFADDRMSG.unpack_from(dados, inicio)
+            atributos = _atributos(dados, inicio + IFADDRMSG.size, fim)
+            endereco = atributos.get(IFA_LOCAL, atributos.get(IFA_ADDRESS))
+            if endereco:
+                enderecos.append(f"{socket.inet_ntoa(endereco)}/{tamanho}")
+        return enderecos
@@ -0,0 +1,119 @@
+import os
+import sys
+import time
+import atexit
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, TextIO
+
+DEBUG = 10
+INFO = 20
+AVISO = 30
+ERRO = 40
+
+NIVEIS = {"debug": DEBUG, "info": INFO, "aviso": AVISO, "erro": ERRO}
+NOMES = {valor: nome.upper() for nome, valor in NIVEIS.items()}
+
+
+class Registro:
+    # Quem chama só filtra, formata e enfileira; a escrita fica com uma thread
+    # própria. O buffer é um anel limitado: se a saída não acompanhar, as
+    # mensagens mais antigas são descartadas (e contadas) em vez de bloquear
+    # o caminho de recepção.
+    def __init__(self, nivel: int = INFO, capacidade: int = 10000, limite_por_segundo: float = 20,
+                 saida: TextIO = sys.stdout):
+        self.nivel = nivel
+        self.limite_por_segundo = limite_por_segundo
+        self.saida = saida
+        self.buffer: Deque[str] = deque(maxlen=capacidade)
+        # Por modelo de mensagem: [início da janela de 1 s, emitidas na janela, suprimidas].
+        self.janelas: Dict[str, List[float]] = {}
+        self.enfileiradas = 0
+        self.escritas = 0
+        self.evento = threading.Event()
+        threading.Thread(target=self._escrever, daemon=True, name="registro").start()
+        atexit.register(self.esvaziar)
+
+    @classmethod
+    def do_ambiente(cls) -> 'Registro':
+        return cls(
+            nivel=NIVEIS.get(os.environ.get("log_nivel", "info").lower(), INFO),
+            capacidade=int(os.environ.get("log_buffer", 10000)),
+            limite_por_segundo=float(os.environ.get("log_limite", 20)),
+        )
+
+    def habilitado(self, nivel: int) -> bool:
+        return nivel >= self.nivel
+
+    def registrar(self, nivel: int, modelo: str, *args: Any):
+        # modelo é a string de formato constante do ponto de chamada; os
+        # argumentos só são formatados se a mensagem passar pelos filtros.
+        if nivel < self.nivel:
+            return
+        suprimidas = 0
+        if self.limite_por_segundo and nivel < ERRO:
+            agora = time.monotonic()
+            janela = self.janelas.get(modelo)
+            if janela is None or agora - janela[0] >= 1.0:
+                suprimidas = int(janela[2]) if janela else 0
+                janela = self.janelas[modelo] = [agora, 0, 0]
+            if janela[1] >= self.limite_por_segundo:
+                janela[2] += 1
+                return
+            janela[1] += 1
+        try:
+            mensagem = modelo % args if args else modelo
+        except (TypeError, ValueError) as e:
+            mensagem = f"{modelo} {args!r} (erro de formatação: {e})"
+        if suprimidas:
+            mensagem += f" (+{suprimidas} semelhantes suprimidas)"
+        if nivel != INFO:
+            mensagem = f"[{NOMES[nivel]}] {mensagem}"
+        self.buffer.append(mensagem)
+        self.enfileiradas += 1
+        if not self.evento.is_set():
+            self.evento.set()
+
+    def descartadas(self) -> int:
+        return self.enfileiradas - self.escritas - len(self.buffer)
+
+    def _escrever(self):
+        while True:
+            self.evento.wait()
+            self.evento.clear()
+            self.esvaziar()
+
+    def esvaziar(self):
+        linhas = []
+        while True:
+            try:
+                linhas.append(self.buffer.popleft())
+            except IndexError:
+                break
+        if linhas:
+            self.escritas += len(linhas)
+            try:
+                self.saida.write("\n".join(linhas) + "\n")
+                self.saida.flush()
+            except (OSError, ValueError):
+                # Saída fechada (pipe quebrado, processo encerrando): o log não derruba o roteador.
+                pass
+
+
+registro = Registro.do_ambiente()
+
+
+def debug(modelo: str, *args: Any):
+    registro.registrar(DEBUG, modelo, *args)
+
+
+def info(modelo: str, *args: Any):
+    registro.registrar(INFO, modelo, *args)
+
+
+def aviso(modelo: str, *args: Any):
+    registro.registrar(AVISO, modelo, *args)
+
+
+def erro(modelo: str, *args: Any):
+    registro.registrar(ERRO, modelo, *args)
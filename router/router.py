@@ -1,282 +1,1659 @@
-import socket
+import signal
+import sys
 import time
-import json
 import os 
 import threading
-import subprocess
-from typing import Dict, Any, Set, Tuple, List, Optional
+import asyncio
+import ipaddress
+from typing import Deque, Dict, Any, Set, Tuple, List, Optional, Mapping, Callable, Union
+from concurrent.futures import Executor
 import heapq
+from collections import deque
+
+from grafo import Grafo, GrafoCSR
+from areas import AREA_BACKBONE, prefixo_de, resumir
+from fib import FIBSombra, BackendFIB, Saltos, agregar_rotas, criar_backend, ativar_encaminhamento
+from instantaneo import Instantaneo, gravar_instantaneo, ler_instantaneo
+from lote import Receptor, TransporteLote, abrir_socket
+from agendador import AgendadorSPF, RodaTemporal, Temporizador, agendar_com_thread, repetir
+from lsa import LSA, Ack, Descricao, Hello, Pedido, Vizinho, IDADE_EXPURGO
+from formato import (FORMATO_JSON, FORMATO_BINARIO, ErroFormato, Remontador,
+                     eh_binario, codificar_json, decodificar_json, codificar_sonda, codificar_binario, decodificar_binario,
+                     codificar_hello, codificar_ack, codificar_descricao, codificar_pedido)
+from assincrono import executar_roteadores
+from registro import registro, debug, info, aviso, erro, DEBUG
+from metricas import Metricas, servir_metricas
 
 PORTA = 5000
 
-def log(msg: str):
-    print(msg, flush=True)
 
-class Vizinho:
-    def __init__(self, ip: str, peso: int):
-        self.ip = ip
-        self.peso = peso
+# (u, v, peso anterior, peso atual) de um enlace, com u e v como ids do Grafo da LSDB.
+Mudanca = Tuple[int, int, Optional[int], Optional[int]]
 
-    def to_dict(self) -> Dict[str, Any]:
-        return {
-            "ip": self.ip,
-            "peso": self.peso
-        }
+# Custo máximo de um enlace no formato binário (campo de 16 bits).
+CUSTO_MAXIMO = 0xFFFF
 
-    @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> 'Vizinho':
-        return cls(
-            ip=data["ip"],
-            peso=data["peso"]
-        )
+# Reenvios da descrição da LSDB sem resposta antes de supor um vizinho que não a
+# entende e mandar a LSDB inteira, como antes da troca de descrições.
+TENTATIVAS_TROCA = 3
+
+
+def carimbo_us(instante: float) -> int:
+    return int(instante * 1_000_000) & 0xFFFFFFFF
+
+
+def vizinhos_do_ambiente(ambiente: Mapping[str, str]) -> Dict[str, Vizinho]:
+    # As variáveis que o gerador.py escreve: router_links, <vizinho>_ip e, opcionalmente,
+    # <vizinho>_capacidade_mbps. Como no OSPF, o custo base de um enlace com capacidade
+    # conhecida é a largura de banda de referência dividida pela do enlace.
+    referencia = float(ambiente.get("custo_referencia_mbps", 10000))
+    vizinhos = {}
+    for nome in ambiente["router_links"].split(","):
+        ip_env = ambiente.get(f"{nome}_ip")
+        if not ip_env:
+            aviso("IP para %s não encontrado nas variáveis de ambiente", nome)
+            continue
+        peso = 1
+        capacidade = ambiente.get(f"{nome}_capacidade_mbps")
+        if capacidade:
+            peso = min(CUSTO_MAXIMO, max(1, round(referencia / float(capacidade))))
+        vizinhos[nome] = Vizinho(ip_env, peso)
+        info("Adicionado vizinho %s com IP %s e custo base %d", nome, ip_env, peso)
+    return vizinhos
+
+
+def areas_do_ambiente(ambiente: Mapping[str, str]) -> Tuple[str, Dict[str, str]]:
+    # area é a área do próprio roteador e <vizinho>_area a de cada enlace, ambas
+    # escritas pelo gerador.py --areas; sem elas tudo fica no backbone.
+    area = ambiente.get("area", AREA_BACKBONE)
+    enlaces = {nome: ambiente.get(f"{nome}_area", area) for nome in ambiente["router_links"].split(",") if nome}
+    return area, enlaces
+
+
+# Resultado de LSDB.atualizar_lsa; verdadeiro quando o LSA foi aceito.
+REJEITADO = 0
+ALTERADO = 1
+RENOVADO = 2
 
-class LSA:
-    def __init__(self, id: str, ip: str, seq: int, vizinhos: Dict[str, Vizinho]):
-        self.id = id
-        self.ip = ip
-        self.seq = seq
-        self.vizinhos = vizinhos
-    
-    def to_dict(self) -> Dict[str, Any]:
-        return {
-            "id": self.id,
-            "ip": self.ip,
-            "seq": self.seq,
-            "vizinhos": {k: v.to_dict() for k, v in self.vizinhos.items()}
-        }
-    
-    @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> 'LSA':
-        vizinhos = {k: Vizinho.from_dict(v) for k, v in data["vizinhos"].items()}
-        return cls(
-            id=data["id"],
-            ip=data["ip"],
-            seq=data["seq"],
-            vizinhos=vizinhos
-        )
-    
 
 class LSDB:
-    def __init__(self):
+    def __init__(self, origem: Optional[str] = None, idade_maxima: float = 60.0,
+                 relogio: Callable[[], float] = time.monotonic):
         self.lsas: Dict[str, LSA] = {}
+        # Datagramas já codificados de cada LSA, por formato, para repasse sem reserialização.
+        self.datagramas: Dict[str, Dict[str, List[bytes]]] = {}
+        # Só entram enlaces anunciados pelos dois lados (verificação bidirecional);
+        # o peso de u->v é o anunciado por u. Os nós são os ids internados do grafo.
+        self.grafo = Grafo()
+        # Peso de cada enlace antes da primeira mudança desde a última drenagem.
+        self._mudancas: Dict[Tuple[int, int], Optional[int]] = {}
 
-    def atualizar_lsa(self, lsa: LSA) -> bool:
-        if (lsa.id not in self.lsas) or (self.lsas[lsa.id].seq < lsa.seq):
-            self.lsas[lsa.id] = lsa
-            log(f"LSA atualizado de {lsa.id} com seq {lsa.seq}")
-            return True
-        return False
+        # Envelhecimento: LSAs de terceiros que não forem renovados em idade_maxima
+        # segundos são expurgados. O LSA próprio (origem) é renovado pelo roteador.
+        self.origem = origem
+        self.idade_maxima = idade_maxima
+        self.relogio = relogio
+        self.chegada: Dict[str, float] = {}
+        self.roda = RodaTemporal(relogio=relogio)
+        # Expurgos recentes ficam guardados por idade_maxima para que cópias
+        # atrasadas do LSA expurgado não o ressuscitem.
+        self.expurgados: Dict[str, LSA] = {}
 
-    def get_topologia(self) -> Dict[str, Dict[str, int]]:
-        grafo = {}
-        
-        for lsa in self.lsas.values():
-            grafo[lsa.id] = {}
-            for vizinho_id in lsa.vizinhos:
-                if vizinho_id not in grafo:
-                    grafo[vizinho_id] = {}
-        
+        self.alterados = 0
+        self.renovados = 0
+        self.rejeitados = 0
+
+    def _instancia(self, id: str) -> Optional[LSA]:
+        return self.lsas.get(id) or self.expurgados.get(id)
+
+    def guardado(self, id: str) -> Optional[LSA]:
+        # Instância guardada de um LSA, viva ou expurgada.
+        return self._instancia(id)
 
-        for lsa in self.lsas.values():
-            for vizinho_id, vizinho in lsa.vizinhos.items():
-                grafo[lsa.id][vizinho_id] = vizinho.peso
-                if vizinho_id in grafo and lsa.id not in grafo[vizinho_id]:
-                    grafo[vizinho_id][lsa.id] = vizinho.peso
-                    
-        return grafo
+    def descricao(self) -> List[Tuple[str, int, bool]]:
+        # (origem, seq, expurgo) de cada instância guardada, para a descrição enviada a um
+        # vizinho novo; o LSA próprio fica de fora porque é inundado logo em seguida.
+        return [(lsa.id,) + lsa.instancia for lsa in list(self.lsas.values()) + list(self.expurgados.values())
+                if lsa.id != self.origem]
+
+    def mais_novas(self, instancias: List[Tuple[str, int, bool]]) -> List[Tuple[str, int, bool]]:
+        # Das instâncias descritas por um vizinho, as que faltam aqui ou são mais novas que
+        # a guardada; o expurgo de um LSA que nunca esteve aqui não interessa.
+        novas = []
+        for origem, seq, expurgo in instancias:
+            guardado = self._instancia(origem)
+            if guardado is None:
+                if not expurgo:
+                    novas.append((origem, seq, expurgo))
+            elif guardado.instancia < (seq, expurgo):
+                novas.append((origem, seq, expurgo))
+        return novas
+
+    @staticmethod
+    def _mais_recente(lsa: LSA, outro: Optional[LSA]) -> bool:
+        return outro is None or lsa.instancia > outro.instancia
+
+    def atualizar_lsa(self, lsa: LSA, datagramas: Optional[Dict[str, List[bytes]]] = None) -> int:
+        # ALTERADO exige SPF; RENOVADO (mesmo conteúdo, seq maior) só renova a
+        # idade e é repassado, sem mexer no grafo nem nas rotas.
+        antigo = self._instancia(lsa.id)
+        if not self._mais_recente(lsa, antigo):
+            self.rejeitados += 1
+            return REJEITADO
+        if lsa.expurgo:
+            if antigo is None:
+                # Nada a expurgar: não há o que repassar.
+                self.rejeitados += 1
+                return REJEITADO
+            self._expurgar(lsa, datagramas)
+            self.alterados += 1
+            debug("LSA de %s expurgado (seq %d)", lsa.id, lsa.seq)
+            return ALTERADO
+        if self.expurgados.pop(lsa.id, None) is not None:
+            self.roda.cancelar((lsa.id, "expurgo"))
+            antigo = None
+        self.lsas[lsa.id] = lsa
+        self.datagramas[lsa.id] = dict(datagramas or {})
+        self.chegada[lsa.id] = self.relogio()
+        if lsa.id != self.origem:
+            self.roda.agendar(lsa.id, self.idade_maxima - lsa.idade)
+        if antigo is not None and lsa.mesmo_conteudo(antigo):
+            self.renovados += 1
+            debug("LSA renovado de %s com seq %d (sem mudanças)", lsa.id, lsa.seq)
+            return RENOVADO
+        self._aplicar_enlaces(lsa.id, antigo.vizinhos if antigo else {}, lsa.vizinhos)
+        self.alterados += 1
+        debug("LSA atualizado de %s com seq %d", lsa.id, lsa.seq)
+        return ALTERADO
+
+    def contadores(self) -> Dict[str, int]:
+        return {
+            "alterados": self.alterados,
+            "renovados": self.renovados,
+            "rejeitados": self.rejeitados,
+        }
+
+    def _expurgar(self, expurgo: LSA, datagramas: Optional[Dict[str, List[bytes]]] = None):
+        antigo = self.lsas.pop(expurgo.id, None)
+        if antigo is not None:
+            self._aplicar_enlaces(expurgo.id, antigo.vizinhos, {})
+            self.grafo.remover_no(self.grafo.ids[expurgo.id])
+        self.chegada.pop(expurgo.id, None)
+        self.roda.cancelar(expurgo.id)
+        self.expurgados[expurgo.id] = expurgo
+        self.datagramas[expurgo.id] = dict(datagramas or {})
+        self.roda.agendar((expurgo.id, "expurgo"), self.idade_maxima)
+
+    def idade(self, id: str) -> Optional[float]:
+        lsa = self.lsas.get(id)
+        if lsa is None:
+            return None
+        return lsa.idade + self.relogio() - self.chegada[id]
+
+    def envelhecer(self) -> List[LSA]:
+        # Retorna os expurgos gerados, que devem ser inundados para os vizinhos.
+        expurgos = []
+        for chave in self.roda.avancar():
+            if isinstance(chave, tuple):
+                id, _ = chave
+                self.expurgados.pop(id, None)
+                self.datagramas.pop(id, None)
+                continue
+            lsa = self.lsas.get(chave)
+            if lsa is None:
+                continue
+            expurgo = LSA(lsa.id, lsa.ip, lsa.seq, {}, idade=IDADE_EXPURGO)
+            self._expurgar(expurgo)
+            info("LSA de %s atingiu a idade máxima (seq %d)", lsa.id, lsa.seq)
+            expurgos.append(expurgo)
+        return expurgos
+
+    def copia_mais_recente(self, lsa: LSA) -> Optional[LSA]:
+        # Instância guardada mais nova que a recebida, para devolver a quem enviou a cópia velha.
+        guardado = self._instancia(lsa.id)
+        if guardado is not None and guardado is not lsa and self._mais_recente(guardado, lsa):
+            return guardado
+        return None
+
+    def datagramas_de(self, lsa: LSA) -> Dict[str, List[bytes]]:
+        if self._instancia(lsa.id) is lsa:
+            return self.datagramas.setdefault(lsa.id, {})
+        return {}
+
+    def _aplicar_enlaces(self, origem: str, antigos: Dict[str, Vizinho], novos: Dict[str, Vizinho]):
+        grafo = self.grafo
+        u = grafo.internar(origem)
+        grafo.adicionar_no(u)
+        for vizinho_id in antigos:
+            if vizinho_id not in novos and vizinho_id in grafo.ids:
+                v = grafo.ids[vizinho_id]
+                self._remover_enlace(u, v)
+                self._remover_enlace(v, u)
+        for vizinho_id, vizinho in novos.items():
+            outro = self.lsas.get(vizinho_id)
+            if vizinho_id == origem or outro is None or origem not in outro.vizinhos:
+                continue
+            v = grafo.internar(vizinho_id)
+            self._definir_enlace(u, v, vizinho.peso)
+            self._definir_enlace(v, u, outro.vizinhos[origem].peso)
+
+    def _definir_enlace(self, u: int, v: int, peso: int):
+        anterior = self.grafo.peso(u, v)
+        if anterior != peso:
+            self._mudancas.setdefault((u, v), anterior)
+            self.grafo.definir(u, v, peso)
+
+    def _remover_enlace(self, u: int, v: int):
+        anterior = self.grafo.remover(u, v)
+        if anterior is not None:
+            self._mudancas.setdefault((u, v), anterior)
+
+    def drenar_mudancas(self) -> List[Mudanca]:
+        mudancas = []
+        for (u, v), anterior in self._mudancas.items():
+            atual = self.grafo.peso(u, v)
+            if atual != anterior:
+                mudancas.append((u, v, anterior, atual))
+        self._mudancas.clear()
+        return mudancas
+
+    def get_topologia(self) -> Grafo:
+        return self.grafo
 
 
 class TabelaRotas:
-    def __init__(self, grafo: Dict[str, Dict[str, int]], origem: str):
-        self.rotas: Dict[str, Tuple[str, int]] = {} 
-        if origem in grafo:
-            self._dijkstra(grafo, origem)
+    # rotas: destino -> (primeiros saltos de mesmo custo, custo). Os saltos ficam em
+    # ordem de nome e limitados a max_caminhos; com 1 não há ECMP. Internamente os
+    # nós são os ids do Grafo, e distâncias, predecessores e saltos ficam em listas
+    # indexadas por id.
+    def __init__(self, grafo: Mapping[str, Mapping[str, int]], origem: str, max_caminhos: int = 1):
+        self.origem = origem
+        self.max_caminhos = max(1, max_caminhos)
+        self._dist: List[float] = []
+        self._prev: List[int] = []
+        self._saltos: List[Optional[Tuple[str, ...]]] = []
+        # Vetores do SPF no estado inicial, do tamanho do último CSR: um SPF completo
+        # recomeça copiando-os sobre as mesmas listas, sem alocar novas.
+        self._modelos: Tuple[List[float], List[int], List[None]] = ([], [], [])
+        self._calcular(grafo)
+
+    def recalcular(self, grafo: Mapping[str, Mapping[str, int]]):
+        # SPF completo reaproveitando os vetores da execução anterior.
+        self._calcular(grafo)
+
+    def _calcular(self, grafo: Mapping[str, Mapping[str, int]]):
+        if not isinstance(grafo, Grafo):
+            grafo = Grafo.de_mapa(grafo)
+        self.grafo = grafo
+        self.rotas: Dict[str, Tuple[Tuple[str, ...], int]] = {}
+        # Grafo reverso e filhos na árvore só servem ao SPF incremental; são montados
+        # na primeira atualização, e um SPF completo não paga por eles.
+        self._reverso: Optional[List[Dict[int, int]]] = None
+        self._filhos: Optional[List[Set[int]]] = None
+        self._origem = grafo.ids.get(self.origem)
+        if self._origem is not None and grafo.presente(self._origem):
+            self._dijkstra(grafo.csr(), self._origem)
         else:
-            log(f"ERRO: Origem {origem} não existe no grafo")
+            self._origem = None
+            self._reiniciar_vetores(0)
+            erro("Origem %s não existe no grafo", self.origem)
 
-    def _dijkstra(self, grafo: Dict[str, Dict[str, int]], origem: str):
-        dist = {n: float('inf') for n in grafo}
-        prev = {n: None for n in grafo}
+    def _reiniciar_vetores(self, n: int):
+        # Os ids do Grafo não são reaproveitados, então o CSR só cresce: os vetores e os
+        # modelos são realocados nesse caso e, fora dele, recomeçam no lugar.
+        dist, prev, saltos = self._dist, self._prev, self._saltos
+        modelo_dist, modelo_prev, modelo_saltos = self._modelos
+        if not len(dist) == len(modelo_dist) == n:
+            modelo_dist, modelo_prev, modelo_saltos = self._modelos = ([float('inf')] * n, [-1] * n, [None] * n)
+        dist[:] = modelo_dist
+        prev[:] = modelo_prev
+        saltos[:] = modelo_saltos
+
+    def _dijkstra(self, csr: GrafoCSR, origem: int):
+        # O primeiro salto é levado adiante em cada relaxamento, sem reconstruir
+        # caminhos depois. O heap aceita várias entradas por nó (decrease-key
+        # preguiçoso): uma entrada com distância maior que a atual está vencida e
+        # é descartada, o que dispensa um conjunto de visitados.
+        nomes = self.grafo.nomes
+        inicio, vizinhos, pesos = csr.inicio, csr.vizinhos, csr.pesos
+        self._reiniciar_vetores(len(csr))
+        dist, prev, saltos = self._dist, self._prev, self._saltos
+        unir = self._unir
+        heappush = heapq.heappush
+        heappop = heapq.heappop
         dist[origem] = 0
-        heap = [(0, origem)]
-        visitados = set()
+        heap = []
+        for k in range(inicio[origem], inicio[origem + 1]):
+            v = vizinhos[k]
+            dist[v] = pesos[k]
+            prev[v] = origem
+            saltos[v] = (nomes[v],)
+            heap.append((pesos[k], v))
+        heapq.heapify(heap)
 
         while heap:
-            d, atual = heapq.heappop(heap)
-            if atual in visitados:
+            d, atual = heappop(heap)
+            if d > dist[atual]:
                 continue
-                
-            visitados.add(atual)
-            
-            if atual not in grafo:
+            # Retirado do heap, atual já recebeu os saltos de todos os predecessores de mesmo custo.
+            saltos_atual = saltos[atual]
+            for k in range(inicio[atual], inicio[atual + 1]):
+                vizinho = vizinhos[k]
+                alt = d + pesos[k]
+                atual_vizinho = dist[vizinho]
+                if alt < atual_vizinho:
+                    dist[vizinho] = alt
+                    prev[vizinho] = atual
+                    saltos[vizinho] = saltos_atual
+                    heappush(heap, (alt, vizinho))
+                elif alt == atual_vizinho and vizinho != origem:
+                    # Com pesos positivos o vizinho ainda não saiu do heap.
+                    saltos[vizinho] = unir(saltos[vizinho], saltos_atual)
+
+        self.rotas = {nome: (vias, custo) for nome, vias, custo in zip(nomes, saltos, dist) if vias is not None}
+
+    def _crescer(self):
+        # Nós internados depois do último SPF completo entram inalcançáveis.
+        falta = len(self.grafo.nomes) - len(self._dist)
+        if falta <= 0:
+            return
+        self._dist.extend([float('inf')] * falta)
+        self._prev.extend([-1] * falta)
+        self._saltos.extend([None] * falta)
+        if self._reverso is not None:
+            self._reverso.extend({} for _ in range(falta))
+            self._filhos.extend(set() for _ in range(falta))
+
+    def _preparar_incremental(self):
+        if self._reverso is not None:
+            return
+        reverso: List[Dict[int, int]] = [{} for _ in self._dist]
+        for u, arestas in enumerate(self.grafo.arestas):
+            if arestas:
+                for v, peso in arestas.items():
+                    reverso[v][u] = peso
+        filhos: List[Set[int]] = [set() for _ in self._dist]
+        for n, pai in enumerate(self._prev):
+            if pai >= 0:
+                filhos[pai].add(n)
+        self._reverso = reverso
+        self._filhos = filhos
+
+    def atualizar(self, grafo: Mapping[str, Mapping[str, int]], mudancas: List[Mudanca]):
+        # SPF incremental: só a subárvore afetada pelos enlaces alterados é relaxada de novo.
+        # As mudanças vêm de LSDB.drenar_mudancas, com ids do mesmo Grafo.
+        if grafo is not self.grafo or self._origem is None or not grafo.presente(self._origem):
+            self._calcular(grafo)
+            return
+        if not mudancas:
+            return
+
+        self._crescer()
+        self._preparar_incremental()
+        self._aplicar_mudancas(mudancas)
+
+        for u, v, _, _ in mudancas:
+            for n in (u, v):
+                if not grafo.presente(n):
+                    self._remover_no(n)
+
+    def _aplicar_mudancas(self, mudancas: List[Mudanca]):
+        inf = float('inf')
+        dist = self._dist
+        prev = self._prev
+        reverso = self._reverso
+        filhos = self._filhos
+        arestas = self.grafo.arestas
+        nomes = self.grafo.nomes
+        dist_antiga: Dict[int, float] = {}
+
+        for u, v, _, peso in mudancas:
+            if peso is None:
+                reverso[v].pop(u, None)
+            else:
+                reverso[v][u] = peso
+
+        afetados: Set[int] = set()
+        for u, v, antigo, peso in mudancas:
+            if prev[v] == u and (peso is None or antigo is None or peso > antigo) and v not in afetados:
+                pilha = [v]
+                while pilha:
+                    n = pilha.pop()
+                    if n in afetados:
+                        continue
+                    afetados.add(n)
+                    pilha.extend(filhos[n])
+
+        heap = []
+        for n in afetados:
+            dist_antiga[n] = dist[n]
+            melhor = inf
+            for p, peso in reverso[n].items():
+                if p not in afetados and dist[p] + peso < melhor:
+                    melhor = dist[p] + peso
+            dist[n] = melhor
+            if melhor < inf:
+                heapq.heappush(heap, (melhor, n))
+
+        for u, v, _, peso in mudancas:
+            if peso is not None and dist[u] + peso < dist[v]:
+                dist_antiga.setdefault(v, dist[v])
+                dist[v] = dist[u] + peso
+                heapq.heappush(heap, (dist[v], v))
+
+        while heap:
+            d, atual = heapq.heappop(heap)
+            if d > dist[atual]:
                 continue
-                
-            for vizinho, peso in grafo[atual].items():
-                if vizinho not in grafo:
-                    continue
-                    
-                alt = dist[atual] + peso
-                if vizinho not in dist:
-                    dist[vizinho] = float('inf')
-                    prev[vizinho] = None
-                    
+            for vizinho, peso in (arestas[atual] or {}).items():
+                alt = d + peso
                 if alt < dist[vizinho]:
+                    dist_antiga.setdefault(vizinho, dist[vizinho])
                     dist[vizinho] = alt
-                    prev[vizinho] = atual
                     heapq.heappush(heap, (alt, vizinho))
 
-        for destino in grafo:
-            if destino != origem and prev[destino] is not None:
-                via = destino
-                while prev[via] != origem and prev[via] is not None:
-                    via = prev[via]
-                if prev[via] == origem: 
-                    self.rotas[destino] = (via, dist[destino])
+        mudaram = {n for n, d in dist_antiga.items() if d != dist[n]}
+        revisar = set(afetados) | mudaram
+        for u, v, _, _ in mudancas:
+            revisar.add(v)
+        for n in mudaram:
+            revisar.update(arestas[n] or ())
+        revisar.discard(self._origem)
+
+        fila = []
+        for n in revisar:
+            novo_pai = self._escolher_pai(n)
+            if novo_pai != prev[n]:
+                if prev[n] >= 0:
+                    filhos[prev[n]].discard(n)
+                if novo_pai >= 0:
+                    filhos[novo_pai].add(n)
+                prev[n] = novo_pai
+            heapq.heappush(fila, (dist[n], n))
+
+        # Primeiros saltos em ordem de distância: todos os predecessores de mesmo
+        # custo são resolvidos antes, e só quem herda de um nó que mudou é revisto.
+        vistos = set()
+        while fila:
+            _, n = heapq.heappop(fila)
+            if n in vistos:
+                continue
+            vistos.add(n)
+            saltos = self._primeiros_saltos(n)
+            anterior = self._saltos[n]
+            self._saltos[n] = saltos
+            if saltos is None:
+                # Inalcançável: sucessores ainda alcançáveis mudaram de distância e já estão em revisar.
+                self.rotas.pop(nomes[n], None)
+                continue
+            self.rotas[nomes[n]] = (saltos, dist[n])
+            if anterior != saltos:
+                for sucessor, peso in (arestas[n] or {}).items():
+                    if dist[n] + peso == dist[sucessor]:
+                        heapq.heappush(fila, (dist[sucessor], sucessor))
+
+    def _unir(self, a: Tuple[str, ...], b: Tuple[str, ...]) -> Tuple[str, ...]:
+        # Os max_caminhos menores nomes da união: o mesmo resultado em qualquer
+        # ordem de união, então o SPF completo e o incremental concordam.
+        if a == b:
+            return a
+        return tuple(sorted(set(a) | set(b))[:self.max_caminhos])
+
+    def _primeiros_saltos(self, n: int) -> Optional[Tuple[str, ...]]:
+        dist = self._dist
+        if dist[n] == float('inf'):
+            return None
+        saltos: Tuple[str, ...] = ()
+        for p, peso in self._reverso[n].items():
+            if dist[p] + peso != dist[n]:
+                continue
+            via = (self.grafo.nomes[n],) if p == self._origem else self._saltos[p]
+            if via is not None:
+                saltos = self._unir(saltos, via) if saltos else via
+        return saltos or None
+
+    def _escolher_pai(self, n: int) -> int:
+        # Mesmo desempate do Dijkstra completo: vence o predecessor retirado
+        # primeiro do heap, isto é, o menor (distância, id).
+        dist = self._dist
+        if dist[n] == float('inf'):
+            return -1
+        melhor = -1
+        for p, peso in self._reverso[n].items():
+            if dist[p] + peso == dist[n]:
+                if melhor < 0 or (dist[p], p) < (dist[melhor], melhor):
+                    melhor = p
+        return melhor
+
+    def _remover_no(self, n: int):
+        # O id continua reservado no Grafo; o nó só fica inalcançável e sem arestas.
+        if n == self._origem:
+            return
+        self._reverso[n] = {}
+        pai = self._prev[n]
+        if pai >= 0:
+            self._filhos[pai].discard(n)
+        self._prev[n] = -1
+        self._filhos[n] = set()
+        self._dist[n] = float('inf')
+        self._saltos[n] = None
+        self.rotas.pop(self.grafo.nomes[n], None)
+
+
+class Troca:
+    # Troca de descrições da LSDB com um vizinho, de quando a adjacência sobe até as duas
+    # pontas terem o que faltava: a nossa descrição é reenviada até o vizinho confirmá-la
+    # com um pedido completo, e os LSAs pedidos a ele até chegarem.
+    __slots__ = ("numero", "datagramas", "confirmada", "recebida", "lotes", "pedidos", "tentativas", "agendada")
+
+    def __init__(self):
+        self.numero: Optional[int] = None
+        self.datagramas: List[bytes] = []
+        self.confirmada = False
+        # Descrição do vizinho: número da troca dele e lotes já comparados.
+        self.recebida: Optional[int] = None
+        self.lotes: Set[int] = set()
+        # Instâncias pedidas ao vizinho que ainda não chegaram.
+        self.pedidos: Dict[str, Tuple[int, bool]] = {}
+        self.tentativas = 0
+        self.agendada = False
 
 
 class Router:
-    def __init__(self, id: str, ip: str, vizinhos: Dict[str, Vizinho]):
+    def __init__(self, id: str, ip: str, vizinhos: Dict[str, Vizinho], backend: Optional[BackendFIB] = None,
+                 area: str = AREA_BACKBONE, areas_enlaces: Optional[Dict[str, str]] = None,
+                 instantaneo: Optional[str] = None):
         self.id = id
         self.ip = ip
         self.vizinhos = vizinhos
         self.seq = 0
-        self.lsdb = LSDB()
-        
-        self.lsdb.atualizar_lsa(self.criar_lsa())
+        self.relogio: Callable[[], float] = time.monotonic
+        # Áreas: cada enlace pertence a uma área, com LSDB e SPF próprios, e os LSAs
+        # só circulam dentro dela. Um roteador em mais de uma área, incluindo o
+        # backbone, é de borda (ABR): resume no seu LSA de cada área os prefixos que
+        # alcança pelas outras, e quem está dentro da área só vê esses resumos.
+        self.area = area
+        areas_enlaces = areas_enlaces or {}
+        self.area_vizinho = {viz_id: areas_enlaces.get(viz_id, area) for viz_id in vizinhos}
+        self.vizinhos_area: Dict[str, List[str]] = {area: []}
+        for viz_id, area_enlace in self.area_vizinho.items():
+            self.vizinhos_area.setdefault(area_enlace, []).append(viz_id)
+        self.borda = len(self.vizinhos_area) > 1 and AREA_BACKBONE in self.vizinhos_area
+        # Prefixos que este roteador anuncia em cada área quando é de borda.
+        self.resumos: Dict[str, Dict[str, int]] = {}
+        self.tabelas: Dict[str, TabelaRotas] = {}
+        # ECMP: até quantos primeiros saltos de mesmo custo cada rota instala.
+        self.max_caminhos = int(os.environ.get("ecmp_max_caminhos", 4))
+        self.fib = FIBSombra()
+        self.backend = backend or criar_backend(os.environ.get("fib_backend", "auto"))
+        # Contíguos com os mesmos saltos viram uma rota só antes de ir para a FIB.
+        self.agregar_fib = os.environ.get("fib_agregar", "1") != "0"
+        self.rotas_calculadas = 0
+        self.prefixos_locais, self.enlaces_prefixo, self.conectados = self._descobrir_prefixos()
+        self.lock = threading.Lock()
+        self.modo_formato = os.environ.get("formato_lsa", "auto")
+        self.formatos_vizinhos: Dict[str, str] = {}
+        self.remontador = Remontador()
+        # Hello/dead-interval: só vizinhos com adjacência bidirecional entram no LSA.
+        # hello_ms=0 desliga o protocolo e considera todos os vizinhos configurados ativos.
+        self.hello_ms = int(os.environ.get("hello_ms", 200))
+        self.hello_morto_ms = int(os.environ.get("hello_morto_ms", 4 * self.hello_ms))
+        self.ultimo_hello: Dict[str, float] = {}
+        self.morto_vizinho: Dict[str, float] = {}
+        # Só quem fala Hello (mandou binário, JSON com a marca de formatos ou uma sonda)
+        # recebe Hellos. Quem manda JSON sem a marca é da versão original: fica adjacente
+        # sem o protocolo, como com hello_ms=0. Os ainda desconhecidos recebem sondas.
+        self.falam_hello: Set[str] = set()
+        self.sem_hello: Set[str] = set()
+        # Custos dinâmicos: o RTT de cada vizinho é medido pelos Hellos (carimbo e eco) e
+        # filtrado pelo mínimo das últimas rtt_janela amostras, que descarta as de fila; o
+        # custo anunciado é o base (capacidade) mais um por custo_rtt_ms de RTT, e só é
+        # reanunciado depois de custo_persistencia Hellos seguidos fora da faixa de histerese.
+        self.custo_base = {viz_id: viz.peso for viz_id, viz in vizinhos.items()}
+        self.rtt: Dict[str, Deque[float]] = {}
+        self.custo_fora_faixa: Dict[str, Tuple[int, int]] = {}
+        self.carimbos_recebidos: Dict[str, Tuple[int, float]] = {}
+        self.rtt_janela = max(1, int(os.environ.get("rtt_janela", 10)))
+        self.custo_rtt = float(os.environ.get("custo_rtt_ms", 10)) / 1000
+        self.custo_histerese = float(os.environ.get("custo_histerese", 0.2))
+        self.custo_persistencia = max(1, int(os.environ.get("custo_persistencia", 3)))
+        self.adjacentes: Set[str] = set() if self.hello_ms else set(vizinhos)
+        # Com inundação confiável (exige Hellos) o refresh só protege contra estado
+        # esquecido, e pode ser de minutos; sem ela, ele é a única recuperação de perdas.
+        self.intervalo_lsa = float(os.environ.get("intervalo_lsa", 300 if self.hello_ms else 10))
+        idade_maxima = float(os.environ.get("idade_maxima", 6 * self.intervalo_lsa))
+        self.lsdbs = {area_lsdb: LSDB(self.id, idade_maxima, lambda: self.relogio()) for area_lsdb in self.vizinhos_area}
+        self.lsdb = self.lsdbs[area]
+        # Inundação confiável: cada vizinho adjacente tem uma lista de LSAs enviados
+        # e ainda não confirmados, retransmitidos com espera exponencial.
+        self.vizinho_por_ip = {viz.ip: viz_id for viz_id, viz in vizinhos.items()}
+        self.retransmissao_inicial = float(os.environ.get("retransmissao_ms", 500)) / 1000
+        self.retransmissao_maxima = float(os.environ.get("retransmissao_max_ms", 8000)) / 1000
+        self.ack_atraso = float(os.environ.get("ack_atraso_ms", 20)) / 1000
+        self.pendentes: Dict[str, Dict[str, Tuple[LSA, int]]] = {viz_id: {} for viz_id in vizinhos}
+        self.roda_retransmissao = RodaTemporal(granularidade=0.1, relogio=lambda: self.relogio())
+        self.acks: Dict[str, List[Tuple[str, int, bool]]] = {}
+        self.retransmissoes = 0
+        # Sincronização na subida da adjacência, por troca de descrições da LSDB.
+        self.trocas: Dict[str, Troca] = {}
+        self.numero_troca = 0
+        self.porta_metricas = int(os.environ.get("metricas_porta", 9100))
+        # Recepção em lote: até recepcao_lote datagramas drenados por despertar, com um
+        # único pedido de SPF no fim; os buffers do socket são ajustáveis para um hub
+        # que recebe rajadas de muitos vizinhos (0 mantém o padrão do kernel).
+        self.lote_recepcao = int(os.environ.get("recepcao_lote", 64))
+        self.buffer_recepcao = int(os.environ.get("socket_recepcao_bytes", 1 << 20))
+        self.buffer_envio = int(os.environ.get("socket_envio_bytes", 0))
+        # Estado do lote em processamento, por thread: timers de outras threads
+        # (envelhecimento, encerramento) continuam inundando e pedindo SPF direto.
+        self.lote = threading.local()
+        # Recepção do LSA mais antigo cuja mudança ainda não chegou à FIB.
+        self.mudanca_pendente_desde: Optional[float] = None
+        # Preenchidos pelo runtime (threads ou asyncio) ao iniciar.
+        self.transporte = None
+        self.agendar: Callable[[float, Callable[[], None]], Any] = agendar_com_thread
+        self.executor_rotas: Optional[Executor] = None
+        self.agendador_spf = AgendadorSPF(
+            self.recalcular_rotas,
+            atraso_inicial=float(os.environ.get("spf_atraso_ms", 50)) / 1000,
+            espera_inicial=float(os.environ.get("spf_espera_ms", 200)) / 1000,
+            espera_maxima=float(os.environ.get("spf_espera_max_ms", 5000)) / 1000,
+            relogio=lambda: self.relogio(),
+            agendar=lambda atraso, callback: self.agendar(atraso, callback),
+        )
+        # Originação por mudança de adjacência ou de custo, com o mesmo throttling do SPF
+        # (como o lsa-throttle do OSPF): enlaces que sobem juntos, como na partida, saem
+        # num único LSA em vez de uma instância por enlace inundada pela rede inteira.
+        self.agendador_lsa = AgendadorSPF(
+            self.originar_lsa,
+            atraso_inicial=float(os.environ.get("lsa_atraso_ms", 20)) / 1000,
+            espera_inicial=float(os.environ.get("lsa_espera_ms", 200)) / 1000,
+            espera_maxima=float(os.environ.get("lsa_espera_max_ms", 5000)) / 1000,
+            relogio=lambda: self.relogio(),
+            agendar=lambda atraso, callback: self.agendar(atraso, callback),
+        )
         
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.socket.bind((self.ip, PORTA))
-        log(f"{self.id} ouvindo na porta {PORTA} ({self.ip})")
+        # Reinício a quente: com um arquivo de instantâneo, LSDB, seq e rotas instaladas
+        # são gravados periodicamente (só quando mudaram) e restaurados na partida.
+        self.arquivo_instantaneo = instantaneo
+        self.intervalo_instantaneo = float(os.environ.get("instantaneo_intervalo_ms", 1000)) / 1000
+        self.carencia = float(os.environ.get("reinicio_carencia_ms", 3000)) / 1000
+        self.em_carencia = False
+        self.lsas_restaurados: Dict[str, LSA] = {}
+        self.marca_instantaneo: Optional[Tuple] = None
+
+        self.metricas = self._criar_metricas()
+        self._restaurar_instantaneo()
+        for area_lsdb, lsdb in self.lsdbs.items():
+            if self.id not in lsdb.lsas:
+                lsdb.atualizar_lsa(self.criar_lsa(area_lsdb))
+
+    def _descobrir_prefixos(self) -> Tuple[Dict[str, Tuple[str, ...]], Dict[str, Set[str]], Set[str]]:
+        # Redes das interfaces, por área: a que contém vizinhos é uma rede de enlace, fica
+        # na área do enlace com eles e só é anunciada enquanto algum deles está adjacente,
+        # como uma rede de trânsito no OSPF; as demais ficam na área do roteador. Sem
+        # interfaces visíveis (backend em memória) vale a /24 do próprio endereço, com as
+        # dos vizinhos como conectadas, que é como o gerador.py liga os contêineres.
+        try:
+            enderecos = self.backend.listar_enderecos()
+        except Exception as e:
+            aviso("%s não foi possível listar as interfaces: %s", self.id, e)
+            enderecos = []
+        redes = sorted({interface.network for interface in map(ipaddress.ip_interface, enderecos)
+                        if interface.version == 4 and not interface.is_loopback
+                        and not interface.is_link_local and interface.network.prefixlen < 32})
+        if not redes:
+            return ({self.area: (prefixo_de(self.ip),)}, {},
+                    {prefixo_de(self.ip)} | {prefixo_de(viz.ip) for viz in self.vizinhos.values()})
+        prefixos: Dict[str, List[str]] = {}
+        enlaces: Dict[str, Set[str]] = {}
+        for rede in redes:
+            prefixo = sys.intern(str(rede))
+            no_enlace = {viz_id for viz_id, viz in self.vizinhos.items() if ipaddress.ip_address(viz.ip) in rede}
+            area = self.area_vizinho[min(no_enlace)] if no_enlace else self.area
+            prefixos.setdefault(area, []).append(prefixo)
+            if no_enlace:
+                enlaces[prefixo] = no_enlace
+        info("%s redes das interfaces: %s", self.id,
+             "; ".join(f"área {area}: {', '.join(redes_area)}" for area, redes_area in prefixos.items()))
+        return ({area: tuple(redes_area) for area, redes_area in prefixos.items()}, enlaces,
+                {prefixo for redes_area in prefixos.values() for prefixo in redes_area})
+
+    def prefixos_anunciados(self, area: str) -> Tuple[str, ...]:
+        return tuple(prefixo for prefixo in self.prefixos_locais.get(area, ())
+                     if prefixo not in self.enlaces_prefixo or self.enlaces_prefixo[prefixo] & self.adjacentes)
+
+    def _restaurar_instantaneo(self):
+        # A LSDB volta com as idades avançadas pelo tempo parado e a seq continua de onde
+        # estava. A FIB sombra assume as rotas do instantâneo que ainda estão no kernel,
+        # então o primeiro SPF não reinstala nada. Como no graceful restart do OSPF, o
+        # LSA próprio restaurado vale até as adjacências subirem, e durante a carência
+        # nenhuma rota é removida por um SPF sobre uma LSDB ainda incompleta.
+        if not self.arquivo_instantaneo:
+            return
+        inicio = time.perf_counter()
+        try:
+            instantaneo, tamanho = ler_instantaneo(self.arquivo_instantaneo)
+        except FileNotFoundError:
+            return
+        except (OSError, ErroFormato) as e:
+            aviso("%s instantâneo %s ignorado: %s", self.id, self.arquivo_instantaneo, e)
+            return
+        self.seq = max(self.seq, instantaneo.seq)
+        parado = max(0.0, time.time() - instantaneo.gravado_em)
+        restaurados = 0
+        for area, lsas in instantaneo.lsas.items():
+            lsdb = self.lsdbs.get(area)
+            if lsdb is None or parado >= lsdb.idade_maxima:
+                continue
+            for lsa, idade in lsas:
+                lsa.idade = 0 if lsa.id == self.id else int(idade + parado)
+                if lsa.idade >= lsdb.idade_maxima or lsa.expurgo:
+                    continue
+                lsdb.atualizar_lsa(lsa)
+                restaurados += 1
+                if lsa.id == self.id:
+                    self.lsas_restaurados[area] = lsa
+        try:
+            no_kernel = self.backend.listar_rotas()
+        except Exception as e:
+            aviso("%s não foi possível listar as rotas do kernel; assumindo as do instantâneo: %s", self.id, e)
+            no_kernel = instantaneo.rotas
+        self.fib.instaladas = {prefixo: saltos for prefixo, saltos in instantaneo.rotas.items()
+                               if sorted(no_kernel.get(prefixo, ())) == sorted(saltos)}
+        self.em_carencia = bool(restaurados or self.fib.instaladas)
+        info("%s reinício a quente: instantâneo de %.1fs atrás (%d bytes, lido em %.1f ms) com %d LSAs; "
+             "%d de %d rotas ainda no kernel; carência de %.1fs", self.id, parado, tamanho,
+             (time.perf_counter() - inicio) * 1000, restaurados, len(self.fib.instaladas),
+             len(instantaneo.rotas), self.carencia)
+
+    def gravar_instantaneo(self):
+        # Só grava quando a LSDB, a seq ou a FIB mudaram desde a última gravação: as
+        # idades de um instantâneo parado continuam certas somando o tempo desde ele.
+        contadores = self.metricas.contadores
+        marca = (self.seq, tuple((lsdb.alterados, lsdb.renovados) for lsdb in self.lsdbs.values()),
+                 contadores["rotas_instaladas_total"], contadores["rotas_falhas_total"])
+        if marca == self.marca_instantaneo:
+            return
+        with self.lock:
+            lsas = {area: [(lsa, max(0, int(lsdb.idade(lsa.id)))) for lsa in lsdb.lsas.values()]
+                    for area, lsdb in self.lsdbs.items()}
+            instantaneo = Instantaneo(self.seq, time.time(), lsas, dict(self.fib.instaladas))
+        try:
+            tamanho = gravar_instantaneo(self.arquivo_instantaneo, instantaneo)
+        except (OSError, ErroFormato) as e:
+            aviso("%s erro ao gravar o instantâneo em %s: %s", self.id, self.arquivo_instantaneo, e)
+            return
+        self.marca_instantaneo = marca
+        self.metricas.incrementar("instantaneos_gravados_total")
+        debug("%s instantâneo gravado (%d bytes, seq %d)", self.id, tamanho, instantaneo.seq)
+
+    def encerrar_carencia(self):
+        # O LSA próprio restaurado que ainda não foi substituído dá lugar a um com as
+        # adjacências atuais, e um SPF completo tira da FIB o que não vale mais.
+        with self.lock:
+            if not self.em_carencia:
+                return
+            self.em_carencia = False
+            areas = {area for area, lsa in self.lsas_restaurados.items() if self.lsdbs[area].lsas.get(self.id) is lsa}
+            self.lsas_restaurados = {}
+        info("%s fim da carência do reinício a quente; reconciliando a FIB", self.id)
+        if areas:
+            self.enviar_lsa(areas)
+        self.agendador_spf.solicitar()
+
+    def _criar_metricas(self) -> Metricas:
+        m = Metricas({"roteador": self.id})
+        m.contador("lsas_recebidos_total", "LSAs recebidos de vizinhos")
+        m.contador("lsas_aceitos_total", "LSAs recebidos que mudaram a LSDB")
+        m.contador("lsas_renovados_total", "LSAs recebidos que só renovaram um LSA sem mudanças")
+        m.contador("lsas_duplicados_total", "LSAs recebidos iguais ou mais velhos que o guardado")
+        m.contador("lsas_enviados_total", "LSAs enviados a vizinhos, incluindo retransmissões")
+        m.contador("inundacoes_total", "LSAs inundados para os vizinhos")
+        m.contador("custos_reanunciados_total", "LSAs próprios originados por mudança de custo de enlace")
+        m.contador("inundacoes_coalescidas_total", "LSAs superados no mesmo lote de recepção antes de serem inundados")
+        m.contador("lotes_recebidos_total", "Despertares da recepção, cada um drenando os datagramas já na fila do socket")
+        m.contador("lsas_pedidos_total", "LSAs pedidos a vizinhos na troca de descrições da LSDB")
+        m.contador("trocas_confirmadas_total", "Descrições da LSDB confirmadas por vizinhos")
+        m.contador("rotas_instaladas_total", "Rotas adicionadas, substituídas ou removidas na FIB")
+        m.contador("rotas_falhas_total", "Operações de rota recusadas pela FIB")
+        m.contador("instantaneos_gravados_total", "Instantâneos da LSDB e da FIB gravados para o reinício a quente")
+        m.coletar("retransmissoes_total", "counter", "Retransmissões de LSAs sem confirmação",
+                  lambda: self.retransmissoes)
+        m.coletar("spf_execucoes_total", "counter", "Execuções do SPF", lambda: self.agendador_spf.execucoes)
+        m.coletar("spf_coalescidas_total", "counter", "Pedidos de SPF agrupados em uma execução já agendada",
+                  lambda: self.agendador_spf.coalescidas)
+        m.coletar("originacoes_coalescidas_total", "counter",
+                  "Mudanças de adjacência ou custo agrupadas num LSA próprio já agendado",
+                  lambda: self.agendador_lsa.coalescidas)
+        m.coletar("lsdb_lsas", "gauge", "LSAs na LSDB, somando todas as áreas",
+                  lambda: sum(len(lsdb.lsas) for lsdb in self.lsdbs.values()))
+        m.coletar("resumos_anunciados", "gauge", "Prefixos resumidos anunciados nas áreas (só roteadores de borda)",
+                  lambda: sum(len(prefixos) for prefixos in self.resumos.values()))
+        m.coletar("adjacencias", "gauge", "Vizinhos com adjacência ativa", lambda: len(self.adjacentes))
+        m.coletar("reinicio_carencia", "gauge", "1 durante a carência do reinício a quente",
+                  lambda: int(self.em_carencia))
+        m.coletar("fib_rotas", "gauge", "Rotas instaladas pelo roteador", lambda: len(self.fib.instaladas))
+        m.coletar("rotas_calculadas", "gauge", "Prefixos com rota calculada pelo SPF, antes da agregação na FIB",
+                  lambda: self.rotas_calculadas)
+        m.coletar("fib_rotas_multicaminho", "gauge", "Rotas instaladas com mais de um próximo salto (ECMP)",
+                  lambda: sum(1 for saltos in list(self.fib.instaladas.values()) if len(saltos) > 1))
+        m.coletar("log_descartadas_total", "counter", "Mensagens de log descartadas pelo buffer cheio",
+                  registro.descartadas)
+        m.histograma("spf_duracao_segundos", "Duração de cada SPF, incluindo o cálculo das rotas desejadas")
+        m.histograma("instalacao_rotas_duracao_segundos", "Duração da aplicação de cada delta na FIB")
+        m.histograma("recepcao_ate_instalacao_segundos",
+                     "Tempo entre a recepção de um LSA que muda a topologia e a instalação do delta resultante")
+        return m
+
+    def iniciar_metricas(self):
+        if not self.porta_metricas:
+            return
+        try:
+            servir_metricas(self.metricas, self.ip, self.porta_metricas, {"/lsdb": self.exportar_lsdb})
+            info("%s métricas em http://%s:%d/metrics", self.id, self.ip, self.porta_metricas)
+        except OSError as e:
+            aviso("%s não foi possível abrir a porta de métricas %d: %s", self.id, self.porta_metricas, e)
+
+    def exportar_lsdb(self) -> List[Dict[str, Any]]:
+        # LSAs no formato JSON do protocolo, para o verificar_rotas.py comparar as rotas com um oráculo.
+        if len(self.lsdbs) == 1:
+            return [lsa.to_dict() for lsa in list(self.lsdb.lsas.values())]
+        return [dict(lsa.to_dict(), area=area) for area, lsdb in self.lsdbs.items() for lsa in list(lsdb.lsas.values())]
+
+    def iniciar(self):
+        self.socket = abrir_socket(self.ip, PORTA, self.buffer_recepcao, self.buffer_envio)
+        self.transporte = TransporteLote(self.socket)
+        self.agendar = Temporizador().agendar
+        info("%s ouvindo na porta %d (%s)", self.id, PORTA, self.ip)
         
         self._configurar_rotas_iniciais()
         
         threading.Thread(target=self.escutar_lsa, daemon=True).start()
-        threading.Thread(target=self.enviar_periodicamente, daemon=True).start()
+        self.iniciar_refresh()
+        self.iniciar_timers()
+        self.iniciar_metricas()
+
+    def iniciar_timers(self):
+        repetir(self.agendar, self.lsdb.roda.granularidade, self.envelhecer_lsdb)
+        if self.arquivo_instantaneo:
+            repetir(self.agendar, self.intervalo_instantaneo, self.gravar_instantaneo)
+        if self.em_carencia:
+            # Rotas e resumos já a partir da LSDB restaurada, antes de qualquer adjacência.
+            self.agendador_spf.solicitar()
+            self.agendar(self.carencia, self.encerrar_carencia)
+        if self.hello_ms:
+            repetir(self.agendar, self.hello_ms / 1000, self.enviar_hello)
+            repetir(self.agendar, self.roda_retransmissao.granularidade, self.retransmitir)
+
+    def iniciar_refresh(self):
+        # Com Hellos o primeiro LSA sai quando as adjacências sobem; originá-lo já na
+        # partida, sem vizinhos, só inundaria a rede com uma instância descartável.
+        if self.hello_ms:
+            self.agendar(self.intervalo_lsa, lambda: repetir(self.agendar, self.intervalo_lsa, self.enviar_lsa))
+        else:
+            repetir(self.agendar, self.intervalo_lsa, self.enviar_lsa)
     
     def _configurar_rotas_iniciais(self):
-        log(f"{self.id} configurando rotas iniciais...")
+        info("%s configurando rotas iniciais (backend %s)...", self.id, self.backend.nome)
         
         try:
-            subprocess.run(["sysctl", "-w", "net.ipv4.ip_forward=1"], check=False)
-            log(f"{self.id} IP Forwarding ativado via sysctl")
-        except FileNotFoundError:
-            try:
-                with open("/proc/sys/net/ipv4/ip_forward", "w") as f:
-                    f.write("1")
-                log(f"{self.id} IP Forwarding ativado via /proc/sys/net/ipv4/ip_forward")
-            except Exception as e:
-                log(f"{self.id} Não foi possível ativar IP Forwarding: {e}. O encaminhamento de pacotes pode não funcionar.")
-        
-        interfaces = subprocess.run(["ip", "addr"], capture_output=True, text=True, check=False).stdout
-        log(f"{self.id} interfaces: {interfaces}")
+            metodo = ativar_encaminhamento()
+            info("%s IP Forwarding ativado via %s", self.id, metodo)
+        except Exception as e:
+            aviso("%s Não foi possível ativar IP Forwarding: %s. O encaminhamento de pacotes pode não funcionar.", self.id, e)
         
-        rotas = subprocess.run(["ip", "route"], capture_output=True, text=True, check=False).stdout
-        log(f"{self.id} rotas iniciais: {rotas}")
+        try:
+            info("%s interfaces: %s", self.id, self.backend.listar_enderecos())
+            if registro.habilitado(DEBUG):
+                debug("%s rotas iniciais: %s", self.id, self.backend.listar_rotas())
+        except Exception as e:
+            erro("%s erro ao consultar a FIB: %s", self.id, e)
 
-    def criar_lsa(self) -> LSA:
+    def criar_lsa(self, area: str) -> LSA:
         self.seq += 1
-        return LSA(self.id, self.ip, self.seq, self.vizinhos)
+        # Cópia: a LSDB compara o LSA novo com o anterior para derivar as mudanças de enlace.
+        return LSA(self.id, self.ip, self.seq,
+                   {k: Vizinho(self.vizinhos[k].ip, self.vizinhos[k].peso)
+                    for k in self.vizinhos_area[area] if k in self.adjacentes},
+                   prefixos=self.prefixos_anunciados(area), resumos=self.resumos.get(area))
+
+    def area_de(self, ip: str) -> str:
+        # Área do enlace com o vizinho; quem não é vizinho configurado cai na área do roteador.
+        viz_id = self.vizinho_por_ip.get(ip)
+        return self.area if viz_id is None else self.area_vizinho[viz_id]
+
+    def formato_para(self, ip: str) -> str:
+        if self.modo_formato == "auto":
+            return self.formatos_vizinhos.get(ip, FORMATO_JSON)
+        return self.modo_formato
+
+    def codificar(self, lsa: LSA, formato: str, area: str) -> List[bytes]:
+        # Cada LSA é codificado no máximo uma vez por formato; o cache vive na LSDB
+        # junto do LSA e já vem preenchido com os datagramas recebidos.
+        cache = self.lsdbs[area].datagramas_de(lsa)
+        if formato not in cache:
+            if formato == FORMATO_BINARIO:
+                try:
+                    cache[formato] = codificar_binario(lsa)
+                except ErroFormato as e:
+                    aviso("%s usando JSON para LSA de %s: %s", self.id, lsa.id, e)
+                    cache[formato] = self.codificar(lsa, FORMATO_JSON, area)
+            else:
+                cache[formato] = [codificar_json(lsa, self.modo_formato != FORMATO_JSON)]
+        return cache[formato]
+
+    def decodificar(self, data: bytes, addr: Tuple[str, int]) -> Optional[Tuple[Union[LSA, Hello], Dict[str, List[bytes]]]]:
+        if eh_binario(data):
+            self.formatos_vizinhos[addr[0]] = FORMATO_BINARIO
+            self.classificar_vizinho(addr[0], True)
+            mensagem = decodificar_binario(data, addr, self.remontador)
+            if mensagem is None:
+                return None
+            conteudo, datagramas = mensagem
+            return conteudo, {FORMATO_BINARIO: datagramas}
+        lsa, fala_binario = decodificar_json(data)
+        if fala_binario and addr[0] not in self.formatos_vizinhos:
+            info("%s vizinho %s suporta LSA binário", self.id, addr[0])
+            self.formatos_vizinhos[addr[0]] = FORMATO_BINARIO
+        self.classificar_vizinho(addr[0], fala_binario or lsa is None)
+        if lsa is None:
+            return None
+        return lsa, {FORMATO_JSON: [data]}
 
-    def enviar_lsa(self):
+    def classificar_vizinho(self, ip: str, fala_hello: bool):
+        viz_id = self.vizinho_por_ip.get(ip)
+        if not self.hello_ms or viz_id is None or viz_id in self.falam_hello:
+            return
+        if fala_hello:
+            with self.lock:
+                self.falam_hello.add(viz_id)
+                # Um vizinho tido como da versão original passa a seguir os Hellos.
+                legado = viz_id in self.sem_hello
+                self.sem_hello.discard(viz_id)
+                if legado:
+                    self.adjacentes.discard(viz_id)
+                hello = codificar_hello(self._criar_hello(self.relogio()))
+            info("%s vizinho %s fala Hello", self.id, viz_id)
+            self.transporte.sendto(hello, (ip, PORTA))
+            if legado:
+                self.adjacencias_mudaram([(viz_id, False)])
+        elif viz_id not in self.sem_hello:
+            with self.lock:
+                self.sem_hello.add(viz_id)
+                self.adjacentes.add(viz_id)
+            info("%s vizinho %s não fala Hello; adjacência sem o protocolo", self.id, viz_id)
+            self.adjacencias_mudaram([(viz_id, True)])
+
+    def enviar_datagramas(self, lsa: LSA, ip: str):
+        for datagrama in self.codificar(lsa, self.formato_para(ip), self.area_de(ip)):
+            self.transporte.sendto(memoryview(datagrama), (ip, PORTA))
+        self.metricas.incrementar("lsas_enviados_total")
+
+    def enviar_lsa(self, areas: Optional[Set[str]] = None):
+        # areas: só as áreas cujo LSA mudou; o refresh periódico reorigina todas.
         if not self.vizinhos:
-            log(f"{self.id} não tem vizinhos para enviar LSA")
+            aviso("%s não tem vizinhos para enviar LSA", self.id)
             return
             
-        lsa = self.criar_lsa()
-        lsa_json = json.dumps(lsa.to_dict()).encode()
-        
-        enviados = []
-        for viz_id, viz in self.vizinhos.items():
-            try:
-                self.socket.sendto(lsa_json, (viz.ip, PORTA))
-                enviados.append(f"{viz_id}({viz.ip})")
-            except Exception as e:
-                log(f"{self.id} erro ao enviar LSA para {viz_id}: {e}")
-        
-        if enviados:
-            log(f"{self.id} enviou LSA (seq {lsa.seq}) para: {', '.join(enviados)}")
-        else:
-            log(f"{self.id} falhou ao enviar LSA para qualquer vizinho")
+        for area, lsdb in self.lsdbs.items():
+            if areas is not None and area not in areas:
+                continue
+            with self.lock:
+                lsa = self.criar_lsa(area)
+                lsdb.atualizar_lsa(lsa)
+            if not self.vizinhos_area[area]:
+                continue
+
+            enviados = []
+            for viz_id in self.vizinhos_area[area]:
+                try:
+                    self.inundar(lsa, viz_id)
+                    enviados.append(f"{viz_id}({self.vizinhos[viz_id].ip})")
+                except Exception as e:
+                    erro("%s erro ao enviar LSA para %s: %s", self.id, viz_id, e)
+
+            if enviados:
+                info("%s enviou LSA (seq %d, área %s) para: %s", self.id, lsa.seq, area, ", ".join(enviados))
+            else:
+                erro("%s falhou ao enviar LSA para qualquer vizinho da área %s", self.id, area)
 
     def escutar_lsa(self):
+        receptor = Receptor(self.socket, self.lote_recepcao)
         while True:
-            data, addr = self.socket.recvfrom(4096)
-            lsa_dict = json.loads(data.decode())
-            lsa = LSA.from_dict(lsa_dict)
-            log(f"{self.id} recebeu LSA de {lsa.id} (seq {lsa.seq}) de {addr}")
-            if self.lsdb.atualizar_lsa(lsa):
-                log(f"{self.id} propagando LSA de {lsa.id} para vizinhos")
-                self.propagar_lsa(lsa, addr)
-                self.recalcular_rotas()
-
-    def propagar_lsa(self, lsa: LSA, origem: Tuple[str, int]):
-        for viz in self.vizinhos.values():
-            if (viz.ip, PORTA) != origem:
-                self.socket.sendto(json.dumps(lsa.to_dict()).encode(), (viz.ip, PORTA))
-                log(f"{self.id} propagou LSA de {lsa.id} para {viz.ip}")
-
-    def enviar_periodicamente(self):
-        while True:
+            self.processar_lote(receptor.drenar())
+
+    def processar_lote(self, lote: List[Tuple[bytes, Tuple[str, int]]]):
+        # Os datagramas de um despertar são processados em sequência; as inundações e
+        # respostas saem juntas no fim, só a instância mais nova de cada origem é
+        # inundada, e as mudanças de topologia do lote inteiro viram um único pedido de SPF.
+        if not lote:
+            return
+        self.metricas.incrementar("lotes_recebidos_total")
+        alterados = self.lote.alterados = set()
+        inundacoes = self.lote.inundacoes = {}
+        try:
+            with self.transporte.lote():
+                try:
+                    for data, addr in lote:
+                        self.processar_datagrama(data, addr)
+                finally:
+                    self.lote.inundacoes = None
+                    for (area, _), (lsa, origem) in inundacoes.items():
+                        self.propagar_lsa(lsa, area, origem)
+        finally:
+            self.lote.alterados = None
+            if alterados:
+                self.agendador_spf.solicitar(alterados)
+
+    def processar_datagrama(self, data: bytes, addr: Tuple[str, int]):
+        try:
+            mensagem = self.decodificar(data, addr)
+        except Exception as e:
+            aviso("%s descartou datagrama inválido de %s: %s", self.id, addr, e)
+            return
+        if mensagem is None:
+            return
+        lsa, datagramas = mensagem
+        if isinstance(lsa, Hello):
+            self.receber_hello(lsa, addr)
+            return
+        if isinstance(lsa, Ack):
+            self.receber_ack(lsa, addr)
+            return
+        if isinstance(lsa, Descricao):
+            self.receber_descricao(lsa, addr)
+            return
+        if isinstance(lsa, Pedido):
+            self.receber_pedido(lsa, addr)
+            return
+        debug("%s recebeu LSA de %s (seq %d) de %s", self.id, lsa.id, lsa.seq, addr)
+        self.metricas.incrementar("lsas_recebidos_total")
+        self.reconhecer(lsa, addr)
+        if lsa.id == self.id:
+            self.receber_lsa_proprio(lsa)
+            return
+        recebido_em = self.relogio()
+        area = self.area_de(addr[0])
+        lsdb = self.lsdbs[area]
+        with self.lock:
+            resultado = lsdb.atualizar_lsa(lsa, datagramas)
+            mais_recente = None if resultado else lsdb.copia_mais_recente(lsa)
+            if resultado == ALTERADO and self.mudanca_pendente_desde is None:
+                self.mudanca_pendente_desde = recebido_em
+        self.metricas.incrementar(("lsas_duplicados_total", "lsas_aceitos_total", "lsas_renovados_total")[resultado])
+        if resultado:
+            debug("%s propagando LSA de %s para vizinhos", self.id, lsa.id)
+            self.propagar_lsa(lsa, area, addr)
+            if resultado == ALTERADO:
+                alterados = getattr(self.lote, "alterados", None)
+                if alterados is not None:
+                    alterados.add(lsa.id)
+                else:
+                    self.agendador_spf.solicitar({lsa.id})
+            else:
+                debug("%s refresh de %s sem mudanças; SPF evitado (%d refreshes, %d mudanças até agora)",
+                      self.id, lsa.id, lsdb.renovados, lsdb.alterados)
+        elif mais_recente is not None:
+            # Quem enviou tem uma cópia velha (por exemplo, acabou de reiniciar).
+            debug("%s devolvendo LSA de %s (seq %d) para %s", self.id, lsa.id, mais_recente.seq, addr[0])
+            self.enviar_datagramas(mais_recente, addr[0])
+
+    def receber_lsa_proprio(self, lsa: LSA):
+        # Uma instância própria mais nova circulando na rede (de antes de um reinício,
+        # ou um expurgo) é superada com uma seq maior, como no OSPF.
+        if lsa.seq > self.seq or (lsa.seq == self.seq and lsa.expurgo):
+            info("%s recebeu instância própria mais recente (seq %d); reoriginando LSA", self.id, lsa.seq)
+            with self.lock:
+                self.seq = max(self.seq, lsa.seq)
             self.enviar_lsa()
-            time.sleep(10)
 
-    def recalcular_rotas(self):
-        grafo = self.lsdb.get_topologia()
-        log(f"{self.id} recalculando rotas com topologia: {grafo}")
-        tabela = TabelaRotas(grafo, self.id)
-        log(f"{self.id} tabela de rotas calculada: {tabela.rotas}")
-        self.aplicar_rotas(tabela)
+    def propagar_lsa(self, lsa: LSA, area: str, origem: Optional[Tuple[str, int]]):
+        inundacoes = getattr(self.lote, "inundacoes", None)
+        if inundacoes is not None:
+            # Dentro de um lote só a instância mais nova de cada origem é inundada, no fim.
+            if inundacoes.pop((area, lsa.id), None) is not None:
+                self.metricas.incrementar("inundacoes_coalescidas_total")
+            inundacoes[(area, lsa.id)] = (lsa, origem)
+            return
+        self.metricas.incrementar("inundacoes_total")
+        destinos = [viz_id for viz_id in self.vizinhos_area[area] if (self.vizinhos[viz_id].ip, PORTA) != origem]
+        self.inundar_lote(lsa, area, destinos)
+        debug("%s propagou LSA de %s para %d vizinhos", self.id, lsa.id, len(destinos))
+
+    def inundar_lote(self, lsa: LSA, area: str, destinos: List[str]):
+        # Como inundar, vizinho a vizinho, mas com a lista de retransmissão de todos
+        # atualizada sob um único lock e a codificação resolvida uma vez por formato:
+        # num hub, o laço por vizinho fica só com os envios.
+        with self.lock:
+            for viz_id in destinos:
+                if self._confiavel(viz_id):
+                    self.pendentes[viz_id][lsa.id] = (lsa, 0)
+                    self.roda_retransmissao.agendar((viz_id, lsa.id), self.retransmissao_inicial)
+        por_formato: Dict[str, List[memoryview]] = {}
+        sendto = self.transporte.sendto
+        for viz_id in destinos:
+            ip = self.vizinhos[viz_id].ip
+            formato = self.formato_para(ip)
+            datagramas = por_formato.get(formato)
+            if datagramas is None:
+                datagramas = por_formato[formato] = [memoryview(d) for d in self.codificar(lsa, formato, area)]
+            for datagrama in datagramas:
+                sendto(datagrama, (ip, PORTA))
+        self.metricas.incrementar("lsas_enviados_total", len(destinos))
+
+    def _confiavel(self, viz_id: str) -> bool:
+        # Só vizinhos que falam Hello entendem Acks.
+        return viz_id in self.falam_hello and viz_id in self.adjacentes
+
+    def inundar(self, lsa: LSA, viz_id: str):
+        with self.lock:
+            if self._confiavel(viz_id):
+                # Uma instância mais nova substitui a anterior na lista de retransmissão.
+                self.pendentes[viz_id][lsa.id] = (lsa, 0)
+                self.roda_retransmissao.agendar((viz_id, lsa.id), self.retransmissao_inicial)
+        self.enviar_datagramas(lsa, self.vizinhos[viz_id].ip)
 
-    def aplicar_rotas(self, tabela: TabelaRotas):
+    def retransmitir(self):
+        reenviar = []
+        with self.lock:
+            for viz_id, lsa_id in self.roda_retransmissao.avancar():
+                pendente = self.pendentes[viz_id].get(lsa_id)
+                if pendente is None:
+                    continue
+                lsa, tentativas = pendente
+                tentativas += 1
+                self.pendentes[viz_id][lsa_id] = (lsa, tentativas)
+                espera = min(self.retransmissao_inicial * 2 ** tentativas, self.retransmissao_maxima)
+                self.roda_retransmissao.agendar((viz_id, lsa_id), espera)
+                reenviar.append((viz_id, lsa, tentativas))
+            self.retransmissoes += len(reenviar)
+        for viz_id, lsa, tentativas in reenviar:
+            debug("%s retransmitindo LSA de %s (seq %d) para %s (tentativa %d)", self.id, lsa.id, lsa.seq, viz_id, tentativas)
+            try:
+                self.enviar_datagramas(lsa, self.vizinhos[viz_id].ip)
+            except OSError as e:
+                erro("%s erro ao retransmitir para %s: %s", self.id, viz_id, e)
+
+    def _confirmar(self, viz_id: str, lsa_id: str, instancia: Tuple[int, bool]):
+        pendente = self.pendentes[viz_id].get(lsa_id)
+        if pendente is not None and pendente[0].instancia <= instancia:
+            del self.pendentes[viz_id][lsa_id]
+            self.roda_retransmissao.cancelar((viz_id, lsa_id))
+
+    def reconhecer(self, lsa: LSA, addr: Tuple[str, int]):
+        viz_id = self.vizinho_por_ip.get(addr[0])
+        if viz_id is None:
+            return
+        with self.lock:
+            if not self._confiavel(viz_id):
+                return
+            # Receber do vizinho a mesma instância (ou uma mais nova) vale como confirmação implícita.
+            self._confirmar(viz_id, lsa.id, lsa.instancia)
+            agendar = viz_id not in self.acks
+            self.acks.setdefault(viz_id, []).append((lsa.id, lsa.seq, lsa.expurgo))
+        if agendar:
+            # Acks acumulados por ack_atraso vão juntos em um único datagrama.
+            self.agendar(self.ack_atraso, lambda: self.enviar_acks(viz_id))
+
+    def enviar_acks(self, viz_id: str):
+        with self.lock:
+            instancias = self.acks.pop(viz_id, [])
+        if not instancias:
+            return
+        for datagrama in codificar_ack(Ack(self.id, instancias)):
+            try:
+                self.transporte.sendto(datagrama, (self.vizinhos[viz_id].ip, PORTA))
+            except OSError as e:
+                erro("%s erro ao enviar acks para %s: %s", self.id, viz_id, e)
+
+    def receber_ack(self, ack: Ack, addr: Tuple[str, int]):
+        viz_id = self.vizinho_por_ip.get(addr[0])
+        if viz_id is None:
+            return
+        with self.lock:
+            for lsa_id, seq, expurgo in ack.instancias:
+                self._confirmar(viz_id, lsa_id, (seq, expurgo))
+
+    def _criar_hello(self, agora: float) -> Hello:
+        ecos = {viz_id: (carimbo, int((agora - instante) * 1_000_000))
+                for viz_id, (carimbo, instante) in self.carimbos_recebidos.items()}
+        return Hello(self.id, self.hello_ms, self.hello_morto_ms, list(self.ultimo_hello), carimbo_us(agora), ecos)
+
+    def enviar_hello(self):
+        agora = self.relogio()
+        with self.lock:
+            mortos = [v for v, instante in self.ultimo_hello.items() if agora - instante > self.morto_vizinho[v]]
+            perdidos = []
+            for viz_id in mortos:
+                del self.ultimo_hello[viz_id]
+                self._descartar_pendentes(viz_id)
+                # A próxima adjacência recomeça a medição do zero.
+                self.rtt.pop(viz_id, None)
+                self.custo_fora_faixa.pop(viz_id, None)
+                self.carimbos_recebidos.pop(viz_id, None)
+                self.vizinhos[viz_id].peso = self.custo_base[viz_id]
+                if viz_id in self.adjacentes:
+                    self.adjacentes.discard(viz_id)
+                    perdidos.append(viz_id)
+            hello = self._criar_hello(agora)
+        datagrama = codificar_hello(hello)
+        sonda = None
+        for viz_id, viz in self.vizinhos.items():
+            if viz_id in self.falam_hello:
+                enviar = datagrama
+            elif viz_id in self.sem_hello:
+                continue
+            else:
+                # Um roteador da versão original só entende LSAs JSON.
+                if sonda is None:
+                    sonda = codificar_sonda(self.id, self.ip, self.modo_formato != FORMATO_JSON)
+                enviar = sonda
+            try:
+                self.transporte.sendto(enviar, (viz.ip, PORTA))
+            except OSError:
+                pass
+        if perdidos:
+            self.adjacencias_mudaram([(viz_id, False) for viz_id in perdidos])
+
+    def receber_hello(self, hello: Hello, addr: Tuple[str, int]):
+        if hello.id not in self.vizinhos:
+            return
+        agora = self.relogio()
+        with self.lock:
+            novo = hello.id not in self.ultimo_hello
+            self.ultimo_hello[hello.id] = agora
+            self.morto_vizinho[hello.id] = hello.morto_ms / 1000
+            if hello.carimbo is not None:
+                self.carimbos_recebidos[hello.id] = (hello.carimbo, agora)
+            eco = hello.ecos.get(self.id)
+            custo_mudou = eco is not None and self._medir_rtt(hello.id, agora, *eco)
+            bidirecional = self.id in hello.vistos
+            mudou = bidirecional != (hello.id in self.adjacentes)
+            if bidirecional:
+                self.adjacentes.add(hello.id)
+            else:
+                self.adjacentes.discard(hello.id)
+                self._descartar_pendentes(hello.id)
+            if novo:
+                # Resposta imediata: o vizinho vê a adjacência bidirecional sem esperar o próximo Hello.
+                resposta = codificar_hello(self._criar_hello(agora))
+        if novo:
+            self.transporte.sendto(resposta, addr)
+        if mudou:
+            self.adjacencias_mudaram([(hello.id, bidirecional)])
+        elif custo_mudou and bidirecional:
+            self.metricas.incrementar("custos_reanunciados_total")
+            self.agendador_lsa.solicitar({self.area_vizinho[hello.id]})
+
+    def _medir_rtt(self, viz_id: str, agora: float, carimbo: int, retencao_us: int) -> bool:
+        # RTT = agora - carimbo ecoado - tempo que o eco esperou no vizinho. Retorna
+        # verdadeiro quando o custo anunciado do enlace mudou.
+        amostra = (((carimbo_us(agora) - carimbo) & 0xFFFFFFFF) - retencao_us) / 1_000_000
+        if not 0 <= amostra < self.hello_morto_ms / 1000:
+            return False
+        janela = self.rtt.get(viz_id)
+        if janela is None:
+            janela = self.rtt[viz_id] = deque(maxlen=self.rtt_janela)
+        janela.append(amostra)
+        rtt = min(janela)
+        if not self.custo_rtt:
+            return False
+        continuo = self.custo_base[viz_id] + rtt / self.custo_rtt
+        anunciado = self.vizinhos[viz_id].peso
+        if abs(continuo - anunciado) <= max(1.0, self.custo_histerese * anunciado):
+            self.custo_fora_faixa.pop(viz_id, None)
+            return False
+        # Só uma mudança que persiste (no mesmo sentido) é reanunciada; um pico isolado não.
+        sentido = 1 if continuo > anunciado else -1
+        anterior, vezes = self.custo_fora_faixa.get(viz_id, (sentido, 0))
+        vezes = vezes + 1 if anterior == sentido else 1
+        if vezes < self.custo_persistencia:
+            self.custo_fora_faixa[viz_id] = (sentido, vezes)
+            return False
+        self.custo_fora_faixa.pop(viz_id, None)
+        self.vizinhos[viz_id].peso = min(CUSTO_MAXIMO, max(1, round(continuo)))
+        info("%s custo do enlace com %s: %d -> %d (RTT %.2f ms)",
+             self.id, viz_id, anunciado, self.vizinhos[viz_id].peso, rtt * 1000)
+        return True
+
+    def _descartar_pendentes(self, viz_id: str):
+        for lsa_id in self.pendentes[viz_id]:
+            self.roda_retransmissao.cancelar((viz_id, lsa_id))
+        self.pendentes[viz_id].clear()
+        self.acks.pop(viz_id, None)
+        self.trocas.pop(viz_id, None)
+
+    def adjacencias_mudaram(self, eventos: List[Tuple[str, bool]]):
+        # Mudança de adjacência: LSA novo e SPF logo após lsa_atraso_ms, sem esperar o refresh periódico.
+        for viz_id, ativa in eventos:
+            info("%s adjacência com %s %s", self.id, viz_id, "estabelecida" if ativa else "perdida")
+            if ativa and viz_id in self.sem_hello:
+                # Sem Hellos não há descrição da LSDB: o vizinho recebe a LSDB inteira em JSON.
+                self.sincronizar(viz_id)
+            elif ativa:
+                self.iniciar_troca(viz_id)
+        if self.em_carencia and len(self.adjacentes) == len(self.vizinhos):
+            # Todos os vizinhos de volta: a carência só espera a troca das LSDBs, com
+            # folga para uma retransmissão.
+            self.agendar(self.retransmissao_inicial, self.encerrar_carencia)
+        self.agendador_lsa.solicitar({self.area_vizinho[viz_id] for viz_id, _ in eventos})
+
+    def originar_lsa(self, areas: Optional[Set[str]]):
+        self.enviar_lsa(areas)
+        self.agendador_spf.solicitar({self.id})
+
+    def iniciar_troca(self, viz_id: str):
+        # Como a troca de database descriptions do OSPF: cada ponta descreve a LSDB da
+        # área do enlace (origem e seq de cada LSA) e a outra pede só o que lhe falta ou
+        # está velho. A descrição vai em lotes, e os pedidos saem a cada lote recebido.
+        lsdb = self.lsdbs[self.area_vizinho[viz_id]]
+        with self.lock:
+            self.numero_troca = (self.numero_troca + 1) & 0xFFFF
+            troca = self.trocas.setdefault(viz_id, Troca())
+            troca.numero = self.numero_troca
+            troca.datagramas = codificar_descricao(Descricao(self.id, troca.numero, lsdb.descricao()))
+            troca.confirmada = False
+            troca.tentativas = 0
+            self._agendar_troca(viz_id, troca)
+        debug("%s descrevendo a LSDB para %s em %d lote(s)", self.id, viz_id, len(troca.datagramas))
+        for datagrama in troca.datagramas:
+            self.transporte.sendto(datagrama, (self.vizinhos[viz_id].ip, PORTA))
+
+    def _agendar_troca(self, viz_id: str, troca: Troca):
+        if not troca.agendada:
+            troca.agendada = True
+            espera = min(self.retransmissao_inicial * 2 ** troca.tentativas, self.retransmissao_maxima)
+            self.agendar(espera, lambda: self._verificar_troca(viz_id, troca))
+
+    def _verificar_troca(self, viz_id: str, troca: Troca):
+        # Reenvia a descrição ainda não confirmada e os pedidos ainda não atendidos.
+        lsdb = self.lsdbs[self.area_vizinho[viz_id]]
+        with self.lock:
+            troca.agendada = False
+            if self.trocas.get(viz_id) is not troca or viz_id not in self.adjacentes:
+                return
+            troca.pedidos = {origem: (seq, expurgo) for origem, seq, expurgo in
+                             lsdb.mais_novas([(origem,) + instancia for origem, instancia in troca.pedidos.items()])}
+            troca.tentativas += 1
+            descricao = [] if troca.confirmada else troca.datagramas
+            sem_resposta = bool(descricao) and troca.tentativas > TENTATIVAS_TROCA
+            if sem_resposta:
+                troca.confirmada = True
+                descricao = []
+            pedidos = [(origem,) + instancia for origem, instancia in troca.pedidos.items()]
+            if descricao or pedidos:
+                self._agendar_troca(viz_id, troca)
+        if sem_resposta:
+            aviso("%s %s não respondeu à descrição da LSDB; enviando a LSDB inteira", self.id, viz_id)
+            self.sincronizar(viz_id)
+        destino = (self.vizinhos[viz_id].ip, PORTA)
+        for datagrama in descricao:
+            self.transporte.sendto(datagrama, destino)
+        if pedidos:
+            debug("%s repetindo o pedido de %d LSAs a %s", self.id, len(pedidos), viz_id)
+            for datagrama in codificar_pedido(Pedido(self.id, troca.recebida or 0, pedidos)):
+                self.transporte.sendto(datagrama, destino)
+
+    def receber_descricao(self, descricao: Descricao, addr: Tuple[str, int]):
+        viz_id = self.vizinho_por_ip.get(addr[0])
+        if viz_id is None or viz_id != descricao.id:
+            return
+        lsdb = self.lsdbs[self.area_vizinho[viz_id]]
+        with self.lock:
+            # A descrição do vizinho pode chegar antes de a adjacência subir deste lado.
+            troca = self.trocas.setdefault(viz_id, Troca())
+            if troca.recebida != descricao.troca:
+                troca.recebida = descricao.troca
+                troca.lotes = set()
+            troca.lotes.add(descricao.lote)
+            completa = len(troca.lotes) >= descricao.total
+            faltando = lsdb.mais_novas(descricao.instancias)
+            troca.pedidos.update((origem, (seq, expurgo)) for origem, seq, expurgo in faltando)
+            if troca.pedidos:
+                self._agendar_troca(viz_id, troca)
+        if faltando:
+            self.metricas.incrementar("lsas_pedidos_total", len(faltando))
+            debug("%s pedindo %d LSAs a %s", self.id, len(faltando), viz_id)
+        if faltando or completa:
+            for datagrama in codificar_pedido(Pedido(self.id, descricao.troca, faltando, completa)):
+                self.transporte.sendto(datagrama, addr)
+
+    def receber_pedido(self, pedido: Pedido, addr: Tuple[str, int]):
+        viz_id = self.vizinho_por_ip.get(addr[0])
+        if viz_id is None or viz_id != pedido.id:
+            return
+        lsdb = self.lsdbs[self.area_vizinho[viz_id]]
+        with self.lock:
+            instancias = [lsdb.guardado(origem) for origem, _, _ in pedido.instancias]
+            troca = self.trocas.get(viz_id)
+            confirmou = (pedido.completo and troca is not None and troca.numero == pedido.troca
+                         and not troca.confirmada)
+            if confirmou:
+                troca.confirmada = True
+        if confirmou:
+            self.metricas.incrementar("trocas_confirmadas_total")
+            debug("%s descrição da LSDB confirmada por %s", self.id, viz_id)
+        # A instância atual, mesmo que mais nova que a descrita, vai com retransmissão.
+        for lsa in instancias:
+            if lsa is not None:
+                self.inundar(lsa, viz_id)
+
+    def sincronizar(self, viz_id: str):
+        # Sem resposta à descrição (um vizinho de versão anterior), o vizinho recebe a
+        # LSDB inteira, com retransmissão se ele fala Hello.
+        lsdb = self.lsdbs[self.area_vizinho[viz_id]]
+        with self.lock:
+            instancias = [lsa for lsa in lsdb.lsas.values() if lsa.id != self.id]
+            instancias += lsdb.expurgados.values()
+        for lsa in instancias:
+            self.inundar(lsa, viz_id)
+
+    def envelhecer_lsdb(self):
+        for area, lsdb in self.lsdbs.items():
+            with self.lock:
+                expurgos = lsdb.envelhecer()
+            for expurgo in expurgos:
+                self.propagar_lsa(expurgo, area, None)
+            if expurgos:
+                self.agendador_spf.solicitar({lsa.id for lsa in expurgos})
+
+    def encerrar(self):
+        # Envelhecimento prematuro: os vizinhos retiram o roteador da topologia
+        # agora, em vez de esperar a idade máxima. Uma originação ainda agendada não
+        # pode sair depois e desfazer o expurgo.
+        self.agendador_lsa.cancelar()
+        with self.lock:
+            self.seq += 1
+            expurgo = LSA(self.id, self.ip, self.seq, {}, idade=IDADE_EXPURGO)
+        info("%s encerrando; expurgando o próprio LSA (seq %d)", self.id, expurgo.seq)
+        if self.arquivo_instantaneo:
+            # A seq do expurgo vai no instantâneo: o LSA do próximo início já o supera.
+            self.gravar_instantaneo()
         try:
-            rotas_antes = subprocess.run(["ip", "route"], capture_output=True, text=True, check=False).stdout
-            log(f"{self.id} rotas antes: {rotas_antes}")
-            
-            for destino, (via, custo) in tabela.rotas.items():
-                try:
-                    if destino in self.lsdb.lsas and via in self.lsdb.lsas:
-                        destino_ip = self.lsdb.lsas[destino].ip
-                        via_ip = self.lsdb.lsas[via].ip
-                        
-                        rede_destino = '.'.join(destino_ip.split('.')[:3]) + '.0/24'
-                        
-                        log(f"{self.id} adicionando rota para {destino} ({rede_destino}) via {via} ({via_ip}) com custo {custo}")
-                        
-                        if not any(viz.ip == destino_ip for viz in self.vizinhos.values()):
-                            cmd = ["ip", "route", "replace", rede_destino, "via", via_ip] 
-                            result = subprocess.run(cmd, capture_output=True, text=True, check=False)
-                            if result.returncode != 0:
-                                log(f"{self.id} erro ao adicionar rota: {result.stderr}")
-                            else:
-                                log(f"{self.id} rota adicionada com sucesso")
-                    else:
-                        log(f"{self.id} não pode adicionar rota para {destino} via {via} - informações incompletas")
-                except Exception as e:
-                    log(f"{self.id} erro ao adicionar rota para {destino}: {e}")
-            
-            rotas_depois = subprocess.run(["ip", "route"], capture_output=True, text=True, check=False).stdout
-            log(f"{self.id} rotas depois: {rotas_depois}")
+            for area in self.lsdbs:
+                self.propagar_lsa(expurgo, area, None)
         except Exception as e:
-            log(f"{self.id} erro ao configurar rotas: {e}")
+            erro("%s erro ao expurgar o próprio LSA: %s", self.id, e)
+
+    def recalcular_rotas(self, alterados: Optional[Set[str]] = None):
+        inicio = time.perf_counter()
+        with self.lock:
+            recebido_em = self.mudanca_pendente_desde
+            self.mudanca_pendente_desde = None
+            # Um SPF por área, cada um sobre a LSDB daquela área.
+            for area, lsdb in self.lsdbs.items():
+                grafo = lsdb.get_topologia()
+                mudancas = lsdb.drenar_mudancas()
+                if registro.habilitado(DEBUG):
+                    debug("%s recalculando rotas da área %s com topologia: %s",
+                          self.id, area, {n: dict(enlaces) for n, enlaces in grafo.items()})
+                tabela = self.tabelas.get(area)
+                if tabela is None:
+                    self.tabelas[area] = TabelaRotas(grafo, self.id, self.max_caminhos)
+                elif alterados is None:
+                    tabela.recalcular(grafo)
+                else:
+                    tabela.atualizar(grafo, mudancas)
+                if registro.habilitado(DEBUG):
+                    debug("%s tabela de rotas da área %s calculada: %s", self.id, area, dict(self.tabelas[area].rotas))
+            desejadas, resumos = self.rotas_desejadas()
+            reoriginar = {area for area in self.lsdbs if resumos.get(area) != self.resumos.get(area)}
+            self.resumos = resumos
+        self.metricas.observar("spf_duracao_segundos", time.perf_counter() - inicio)
+        contadores = self.agendador_spf.contadores()
+        info("%s SPF executado (execuções: %d, coalescidas: %d, espera atual: %.2fs, refreshes sem SPF: %d)",
+             self.id, contadores['execucoes'] + 1, contadores['coalescidas'], contadores['espera_atual'],
+             self.lsdb.renovados)
+        if self.executor_rotas is not None:
+            # Instalação fora do caminho de recepção; um único worker mantém a ordem dos deltas.
+            self.executor_rotas.submit(self.aplicar_rotas, desejadas, recebido_em)
+        else:
+            self.aplicar_rotas(desejadas, recebido_em)
+        if reoriginar:
+            info("%s resumos mudaram; reoriginando LSA nas áreas %s (%s)", self.id, ", ".join(sorted(reoriginar)),
+                 ", ".join(f"{len(resumos.get(area, {}))} prefixos na {area}" for area in sorted(reoriginar)))
+            self.enviar_lsa(reoriginar)
+
+    def _oferecer(self, rotas: Dict[str, Tuple[int, Tuple[str, ...]]], prefixo: str, custo: int,
+                  vias: Tuple[str, ...]):
+        # Menor custo vence; no empate os primeiros saltos se somam (ECMP) e ficam os
+        # max_caminhos de menor nome, como em TabelaRotas._unir.
+        atual = rotas.get(prefixo)
+        if atual is None or custo < atual[0]:
+            rotas[prefixo] = (custo, vias)
+        elif custo == atual[0] and vias != atual[1]:
+            rotas[prefixo] = (custo, tuple(sorted(set(atual[1]) | set(vias)))[:self.max_caminhos])
+
+    def _rotas_intra(self, area: str) -> Dict[str, Tuple[int, Tuple[str, ...]]]:
+        # Cada rede anunciada na área, pelo roteador mais próximo que a anuncia: uma
+        # sub-rede compartilhada por vários roteadores é entregue pelo primeiro que a alcança.
+        lsdb = self.lsdbs[area]
+        rotas = {prefixo: (0, ()) for prefixo in self.prefixos_anunciados(area)}
+        for destino, (vias, custo) in self.tabelas[area].rotas.items():
+            lsa = lsdb.lsas.get(destino)
+            if lsa is None or not all(via in self.vizinhos for via in vias):
+                aviso("%s não pode adicionar rota para %s via %s - informações incompletas",
+                      self.id, destino, ", ".join(vias))
+                continue
+            for prefixo in lsa.prefixos or (prefixo_de(lsa.ip),):
+                self._oferecer(rotas, prefixo, custo, vias)
+        return rotas
+
+    def _rotas_inter(self, area: str) -> Dict[str, Tuple[int, Tuple[str, ...]]]:
+        # Resumos anunciados na área pelos roteadores de borda alcançáveis nela:
+        # custo até o ABR mais o custo anunciado, pelos mesmos primeiros saltos.
+        lsdb = self.lsdbs[area]
+        rotas: Dict[str, Tuple[int, Tuple[str, ...]]] = {}
+        for destino, (vias, custo) in self.tabelas[area].rotas.items():
+            lsa = lsdb.lsas.get(destino)
+            if lsa is None or not lsa.resumos or not all(via in self.vizinhos for via in vias):
+                continue
+            for prefixo, custo_resumo in lsa.resumos.items():
+                self._oferecer(rotas, prefixo, custo + custo_resumo, vias)
+        return rotas
+
+    def rotas_desejadas(self) -> Tuple[Dict[str, Saltos], Dict[str, Dict[str, int]]]:
+        # Retorna as rotas a instalar e, num roteador de borda, os resumos a anunciar em cada área.
+        # Como no OSPF, rota intra-área vence qualquer resumo e um ABR só usa os resumos
+        # vistos no backbone: as rotas entre áreas formam uma estrela em torno dele e não há laços.
+        intra = {area: self._rotas_intra(area) for area in self.lsdbs}
+        rotas: Dict[str, Tuple[int, Tuple[str, ...]]] = {}
+        for rotas_area in intra.values():
+            for prefixo, (custo, vias) in rotas_area.items():
+                self._oferecer(rotas, prefixo, custo, vias)
+
+        resumos: Dict[str, Dict[str, int]] = {}
+        if self.borda:
+            resumos[AREA_BACKBONE] = self._resumir_para(AREA_BACKBONE, intra, {})
+        inter: Dict[str, Tuple[int, Tuple[str, ...]]] = {}
+        for area in ([AREA_BACKBONE] if self.borda else self.lsdbs):
+            for prefixo, (custo, vias) in self._rotas_inter(area).items():
+                # Um ABR não aprende pelo backbone o resumo que ele mesmo faz das suas áreas.
+                if prefixo not in rotas and prefixo not in resumos.get(AREA_BACKBONE, ()):
+                    self._oferecer(inter, prefixo, custo, vias)
+        if self.borda:
+            for area in self.lsdbs:
+                if area != AREA_BACKBONE:
+                    resumos[area] = self._resumir_para(area, intra, inter)
+        rotas.update(inter)
+
+        # Redes das próprias interfaces já são conectadas no kernel.
+        desejadas = {prefixo: tuple(sorted(self.vizinhos[via].ip for via in vias))
+                     for prefixo, (_, vias) in rotas.items() if prefixo not in self.conectados}
+        return desejadas, {area: prefixos for area, prefixos in resumos.items() if prefixos}
+
+    def _resumir_para(self, area: str, intra: Dict[str, Dict[str, Tuple[int, Tuple[str, ...]]]],
+                      inter: Dict[str, Tuple[int, Tuple[str, ...]]]) -> Dict[str, int]:
+        # O que o ABR anuncia na área: o alcançável dentro das suas outras áreas e,
+        # fora do backbone, também as rotas entre áreas; nunca prefixos da própria área.
+        anunciar: Dict[str, int] = {}
+        for outra, rotas_area in intra.items():
+            if outra != area:
+                for prefixo, (custo, _) in rotas_area.items():
+                    anunciar[prefixo] = min(custo, anunciar.get(prefixo, custo))
+        if area != AREA_BACKBONE:
+            for prefixo, (custo, _) in inter.items():
+                anunciar.setdefault(prefixo, custo)
+        for prefixo in intra[area]:
+            anunciar.pop(prefixo, None)
+        return resumir(anunciar)
+
+    def aplicar_rotas(self, desejadas: Dict[str, Saltos], recebido_em: Optional[float] = None):
+        try:
+            self.rotas_calculadas = len(desejadas)
+            if self.agregar_fib:
+                desejadas = agregar_rotas(desejadas)
+            delta = self.fib.calcular_delta(desejadas)
+            if self.em_carencia and delta.remover:
+                # As rotas restauradas ficam até o fim da carência; encerrar_carencia as reconcilia.
+                delta.remover = {}
+            if delta.vazio():
+                return
+
+            for prefixo, saltos in delta.adicionar.items():
+                info("%s adicionando rota para %s via %s", self.id, prefixo, ", ".join(saltos))
+            for prefixo, saltos in delta.substituir.items():
+                info("%s substituindo rota para %s via %s", self.id, prefixo, ", ".join(saltos))
+            for prefixo, saltos in delta.remover.items():
+                info("%s removendo rota obsoleta para %s via %s", self.id, prefixo, ", ".join(saltos))
+
+            inicio = time.perf_counter()
+            falhas, mensagem_erro = self.backend.aplicar(delta)
+            self.metricas.observar("instalacao_rotas_duracao_segundos", time.perf_counter() - inicio)
+            self.fib.confirmar(delta, falhas)
+            self.metricas.incrementar("rotas_instaladas_total", len(delta) - len(falhas))
+            self.metricas.incrementar("rotas_falhas_total", len(falhas))
+            if recebido_em is not None:
+                self.metricas.observar("recepcao_ate_instalacao_segundos", self.relogio() - recebido_em)
+            if mensagem_erro:
+                erro("%s erro ao aplicar rotas (%s): %s", self.id, ", ".join(falhas) or "remoções", mensagem_erro)
+            else:
+                info("%s delta de rotas aplicado com sucesso (%s)", self.id, delta)
+        except Exception as e:
+            erro("%s erro ao configurar rotas: %s", self.id, e)
 
 if __name__ == "__main__":
-    log("Iniciando o roteador...")
+    info("Iniciando o roteador...")
     my_id = os.environ["my_name"]
     my_ip = os.environ["my_ip"]
-    links = os.environ["router_links"].split(",")
-
-    vizinhos = {}
-    for nome in links:
-        ip_env = os.environ.get(f"{nome}_ip")
-        if ip_env:
-            vizinhos[nome] = Vizinho(ip_env, 1)
-            log(f"Adicionado vizinho {nome} com IP {ip_env}")
-        else:
-            log(f"AVISO: IP para {nome} não encontrado nas variáveis de ambiente")
 
-    r = Router(my_id, my_ip, vizinhos)
+    area, areas_enlaces = areas_do_ambiente(os.environ)
+    r = Router(my_id, my_ip, vizinhos_do_ambiente(os.environ), area=area, areas_enlaces=areas_enlaces,
+               instantaneo=os.environ.get("instantaneo_arquivo", f"/tmp/{my_id}.lsdb") or None)
 
-    r.enviar_lsa()
-    
-    while True:
-        time.sleep(1)
+    if os.environ.get("runtime", "threads") == "asyncio":
+        # O encerramento vai para o loop: um handler de sinal comum roda na mesma
+        # thread dos callbacks e travaria no lock se o sinal chegasse no meio de um.
+        asyncio.run(executar_roteadores([r], PORTA))
+    else:
+        # O handler só marca o pedido; o encerramento (que toma o lock) roda na thread
+        # principal, fora do handler.
+        parar = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: parar.set())
+        signal.signal(signal.SIGINT, lambda signum, frame: parar.set())
+        r.iniciar()
+        while not parar.is_set():
+            time.sleep(0.2)
+        r.encerrar()
+    sys.exit(0)
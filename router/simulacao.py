@@ -0,0 +1,232 @@
+import heapq
+import random
+import ipaddress
+import itertools
+from collections import Counter, deque
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from agendador import Agendamento
+from areas import prefixo_de
+from fib import BackendMemoria, DeltaFIB
+from formato import MAGICO, TIPO_ACK, TIPO_DESCRICAO, TIPO_HELLO, TIPO_LSA, TIPO_PEDIDO
+from router import PORTA, Router, areas_do_ambiente, vizinhos_do_ambiente
+
+TIPOS_MENSAGEM = {TIPO_LSA: "lsa", TIPO_HELLO: "hello", TIPO_ACK: "ack", TIPO_DESCRICAO: "descricao",
+                  TIPO_PEDIDO: "pedido"}
+
+
+class RelogioVirtual:
+    # Simulação de eventos discretos: o tempo salta direto para o próximo evento,
+    # então um segundo simulado custa só o processamento do que acontece nele.
+    # Mesma interface (agendar/cancel) do Temporizador e do loop asyncio.
+    def __init__(self):
+        self.agora = 0.0
+        self.heap: List[Tuple[float, int, Agendamento]] = []
+        self.contador = itertools.count()
+        self.eventos = 0
+
+    def __call__(self) -> float:
+        return self.agora
+
+    def agendar(self, atraso: float, callback: Callable[[], None]) -> Agendamento:
+        agendamento = Agendamento(self.agora + atraso, callback)
+        heapq.heappush(self.heap, (agendamento.quando, next(self.contador), agendamento))
+        return agendamento
+
+    def executar_ate(self, limite: float, incluir_limite: bool = True):
+        heap = self.heap
+        while heap and (heap[0][0] < limite or (incluir_limite and heap[0][0] == limite)):
+            quando, _, agendamento = heapq.heappop(heap)
+            if agendamento.cancelado:
+                continue
+            self.agora = quando
+            self.eventos += 1
+            agendamento.callback()
+        self.agora = max(self.agora, limite)
+
+
+class Enlace:
+    def __init__(self, atraso: float, perda: float):
+        self.atraso = atraso
+        self.perda = perda
+
+
+class Rede:
+    # Entrega datagramas entre roteadores do mesmo processo. Cada sentido de um
+    # enlace tem atraso e perda próprios; destinos sem enlace são descartados,
+    # como numa sub-rede sem rota.
+    def __init__(self, relogio: RelogioVirtual, aleatorio: random.Random):
+        self.relogio = relogio
+        self.aleatorio = aleatorio
+        self.roteadores: Dict[str, Router] = {}
+        self.enlaces: Dict[Tuple[str, str], Enlace] = {}
+        self.enviadas: Counter = Counter()
+        self.perdidas: Counter = Counter()
+
+    def conectar(self, ip_a: str, ip_b: str, atraso: float, perda: float):
+        self.enlaces[(ip_a, ip_b)] = Enlace(atraso, perda)
+        self.enlaces[(ip_b, ip_a)] = Enlace(atraso, perda)
+
+    def configurar(self, ip_a: str, ip_b: str, atraso: Optional[float] = None, perda: Optional[float] = None):
+        for chave in ((ip_a, ip_b), (ip_b, ip_a)):
+            enlace = self.enlaces[chave]
+            if atraso is not None:
+                enlace.atraso = atraso
+            if perda is not None:
+                enlace.perda = perda
+
+    def transmitir(self, origem: str, dados: bytes, destino: Tuple[str, int]):
+        # JSON só carrega LSAs; o binário diz o tipo no cabeçalho.
+        tipo = dados[3] if dados[:2] == MAGICO else TIPO_LSA
+        self.enviadas[tipo] += 1
+        enlace = self.enlaces.get((origem, destino[0]))
+        if enlace is None or (enlace.perda and self.aleatorio.random() < enlace.perda):
+            self.perdidas[tipo] += 1
+            return
+        receptor = self.roteadores[destino[0]]
+        endereco = (origem, PORTA)
+        self.relogio.agendar(enlace.atraso, lambda: receptor.processar_datagrama(dados, endereco))
+
+
+class TransporteMemoria:
+    def __init__(self, rede: Rede, ip: str):
+        self.rede = rede
+        self.ip = ip
+
+    def sendto(self, dados: bytes, endereco: Tuple[str, int]):
+        # Cópia: quem envia pode passar um memoryview de um buffer reaproveitado.
+        self.rede.transmitir(self.ip, bytes(dados), endereco)
+
+
+class BackendSimulado(BackendMemoria):
+    nome = "simulado"
+
+    def __init__(self, relogio: RelogioVirtual, enderecos: Optional[List[str]] = None):
+        super().__init__(enderecos)
+        self.relogio = relogio
+        self.ultima_mudanca: Optional[float] = None
+
+    def aplicar(self, delta: DeltaFIB) -> Tuple[List[str], str]:
+        self.ultima_mudanca = self.relogio()
+        return super().aplicar(delta)
+
+
+def iniciar_roteador(roteador: Router):
+    # Equivalente a assincrono.iniciar_roteador, sem sockets, FIB real nem métricas HTTP.
+    roteador.iniciar_refresh()
+    roteador.iniciar_timers()
+
+
+class Simulacao:
+    def __init__(self, ambientes: Dict[str, Dict[str, str]], atraso: float = 0.001, perda: float = 0.0,
+                 espalhamento: float = 0.01, semente: int = 0):
+        # ambientes: as variáveis de ambiente de cada roteador, como gerador.ambiente_roteadores produz.
+        self.relogio = RelogioVirtual()
+        self.aleatorio = random.Random(semente)
+        self.rede = Rede(self.relogio, self.aleatorio)
+        self.espalhamento = espalhamento
+        self.roteadores: Dict[str, Router] = {}
+        for ambiente in ambientes.values():
+            roteador = self._criar_roteador(ambiente)
+            self.roteadores[roteador.id] = roteador
+            self.rede.roteadores[roteador.ip] = roteador
+        for roteador in self.roteadores.values():
+            for viz in roteador.vizinhos.values():
+                if (roteador.ip, viz.ip) not in self.rede.enlaces:
+                    self.rede.conectar(roteador.ip, viz.ip, atraso, perda)
+
+    def _criar_roteador(self, ambiente: Dict[str, str]) -> Router:
+        area, areas_enlaces = areas_do_ambiente(ambiente)
+        vizinhos = vizinhos_do_ambiente(ambiente)
+        # Como no docker-compose: o endereço na própria sub-rede e um em cada sub-rede vizinha.
+        enderecos = [f"{ambiente['my_ip']}/24"] + [prefixo_de(viz.ip) for viz in vizinhos.values()]
+        roteador = Router(ambiente["my_name"], ambiente["my_ip"], vizinhos,
+                          backend=BackendSimulado(self.relogio, enderecos), area=area, areas_enlaces=areas_enlaces)
+        roteador.relogio = self.relogio
+        roteador.agendar = self.relogio.agendar
+        roteador.transporte = TransporteMemoria(self.rede, roteador.ip)
+        roteador.porta_metricas = 0
+        return roteador
+
+    def iniciar(self):
+        # Os roteadores não sobem todos no mesmo instante, como os containers.
+        for roteador in self.roteadores.values():
+            self.relogio.agendar(self.aleatorio.uniform(0, self.espalhamento),
+                                 lambda roteador=roteador: iniciar_roteador(roteador))
+
+    def falhar_enlace(self, a: str, b: str, instante: float):
+        ip_a, ip_b = self.roteadores[a].ip, self.roteadores[b].ip
+        self.relogio.agendar(instante - self.relogio(), lambda: self.rede.configurar(ip_a, ip_b, perda=1.0))
+
+    def executar(self, duracao: float):
+        self.relogio.executar_ate(self.relogio() + duracao)
+
+    def executar_antes_de(self, instante: float):
+        # Os eventos do próprio instante (uma falha marcada para ele) ficam para depois:
+        # quem mede a convergência até ali vê a rede de antes deles.
+        self.relogio.executar_ate(instante, incluir_limite=False)
+
+    def _componentes(self) -> Dict[str, int]:
+        # Componentes conexos pelos enlaces que ainda entregam algo.
+        ip_para_id = {r.ip: r.id for r in self.roteadores.values()}
+        componente: Dict[str, int] = {}
+        for inicio in self.roteadores:
+            if inicio in componente:
+                continue
+            componente[inicio] = len(componente)
+            rotulo = componente[inicio]
+            fila = deque([inicio])
+            while fila:
+                atual = self.roteadores[fila.popleft()]
+                for viz in atual.vizinhos.values():
+                    enlace = self.rede.enlaces.get((atual.ip, viz.ip))
+                    vizinho = ip_para_id.get(viz.ip)
+                    if enlace is None or enlace.perda >= 1.0 or vizinho is None or vizinho in componente:
+                        continue
+                    componente[vizinho] = rotulo
+                    fila.append(vizinho)
+        return componente
+
+    def incompletos(self) -> List[str]:
+        # Roteadores cuja FIB ainda não cobre cada destino alcançável, com a /24 exata
+        # ou, com áreas, com um resumo que a contenha, ou que ainda têm uma /24 para um
+        # destino inalcançável (vizinhos diretos ficam de fora, como em Router.rotas_desejadas).
+        componente = self._componentes()
+        # Cada /24 como o inteiro dos seus 24 bits de rede: as rotas de um roteador viram
+        # o conjunto das /24 que cobrem, e a verificação fica em operações de conjunto.
+        redes = {nome: int(ipaddress.ip_address(r.ip)) >> 8 for nome, r in self.roteadores.items()}
+        redes_componente: Dict[int, Set[int]] = {}
+        for nome, rotulo in componente.items():
+            redes_componente.setdefault(rotulo, set()).add(redes[nome])
+        faltando = []
+        for roteador in self.roteadores.values():
+            cobertas: Set[int] = set()
+            instaladas = []
+            for rede in map(ipaddress.ip_network, roteador.backend.rotas):
+                if rede.prefixlen == 24:
+                    instaladas.append(int(rede.network_address) >> 8)
+                elif rede.prefixlen < 24:
+                    inicio = int(rede.network_address) >> 8
+                    cobertas.update(range(inicio, inicio + (1 << (24 - rede.prefixlen))))
+            cobertas.update(instaladas)
+            esperadas = redes_componente[componente[roteador.id]] - {
+                redes[nome] for nome in (roteador.id, *roteador.vizinhos) if nome in redes}
+            if not esperadas <= cobertas or not esperadas.issuperset(instaladas):
+                faltando.append(roteador.id)
+        return faltando
+
+    def ultima_mudanca(self) -> Optional[float]:
+        instantes = [r.backend.ultima_mudanca for r in self.roteadores.values() if r.backend.ultima_mudanca is not None]
+        return max(instantes) if instantes else None
+
+    def contadores(self) -> Dict[str, int]:
+        totais: Counter = Counter()
+        for roteador in self.roteadores.values():
+            totais.update(roteador.metricas.contadores)
+            totais["retransmissoes_total"] += roteador.retransmissoes
+            totais["spf_execucoes_total"] += roteador.agendador_spf.execucoes
+            totais["spf_coalescidas_total"] += roteador.agendador_spf.coalescidas
+        for tipo, nome in TIPOS_MENSAGEM.items():
+            totais[f"{nome}_enviadas"] = self.rede.enviadas[tipo]
+            totais[f"{nome}_perdidas"] = self.rede.perdidas[tipo]
+        return dict(totais)
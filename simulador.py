@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+import gc
+import os
+import sys
+import time
+import argparse
+from typing import Tuple
+
+os.environ.setdefault("log_nivel", "aviso")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "router"))
+
+from gerador import gerar_links, ambiente_roteadores, atribuir_areas
+from simulacao import Simulacao, TIPOS_MENSAGEM
+
+
+def ler_enlace(texto: str) -> Tuple[str, str, str]:
+    # "router1-router2=5,0.1" -> ("router1", "router2", "5,0.1")
+    enlace, _, parametros = texto.partition("=")
+    enlace, _, instante = enlace.partition("@")
+    a, _, b = enlace.partition("-")
+    if not a or not b:
+        raise argparse.ArgumentTypeError(f"enlace inválido: {texto}")
+    return a, b, parametros or instante
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulação em processo de uma rede de roteadores Link State')
+    parser.add_argument('-n', '--num-roteadores', type=int, default=1000,
+                        help='Número de roteadores (padrão: 1000)')
+    parser.add_argument('-t', '--tipo', type=str, choices=['linha', 'anel', 'estrela'], default='anel',
+                        help='Tipo de topologia, como no gerador.py (padrão: anel)')
+    parser.add_argument('-a', '--areas', type=int, default=1,
+                        help='Número de áreas, contando o backbone, como no gerador.py (padrão: 1)')
+    parser.add_argument('--atraso-ms', type=float, default=1.0,
+                        help='Atraso de cada enlace em ms (padrão: 1)')
+    parser.add_argument('--perda', type=float, default=0.0,
+                        help='Probabilidade de perda de cada datagrama (padrão: 0)')
+    parser.add_argument('--enlace', type=ler_enlace, action='append', default=[],
+                        help='Atraso e perda de um enlace específico: routerA-routerB=ATRASO_MS[,PERDA]')
+    parser.add_argument('--falha', type=ler_enlace, action='append', default=[],
+                        help='Derruba um enlace num instante simulado: routerA-routerB@SEGUNDOS')
+    parser.add_argument('-d', '--duracao', type=float, default=10.0,
+                        help='Tempo simulado em segundos (padrão: 10)')
+    parser.add_argument('--espalhamento-ms', type=float, default=10.0,
+                        help='Janela em que os roteadores sobem, em ms (padrão: 10)')
+    parser.add_argument('-s', '--semente', type=int, default=42,
+                        help='Semente do gerador aleatório (padrão: 42)')
+
+    args = parser.parse_args()
+
+    links = gerar_links(args.tipo, args.num_roteadores)
+    try:
+        areas = atribuir_areas(args.tipo, links, args.areas) if args.areas > 1 else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    inicio = time.perf_counter()
+    simulacao = Simulacao(ambiente_roteadores(links, areas=areas),
+                          atraso=args.atraso_ms / 1000, perda=args.perda,
+                          espalhamento=args.espalhamento_ms / 1000, semente=args.semente)
+    for a, b, parametros in args.enlace:
+        atraso, _, perda = parametros.partition(",")
+        simulacao.rede.configurar(simulacao.roteadores[a].ip, simulacao.roteadores[b].ip,
+                                  atraso=float(atraso) / 1000 if atraso else None,
+                                  perda=float(perda) if perda else None)
+    falhas = sorted((float(instante), a, b) for a, b, instante in args.falha)
+    for instante, a, b in falhas:
+        simulacao.falhar_enlace(a, b, instante)
+    criacao = time.perf_counter() - inicio
+
+    print(f"Topologia {args.tipo} com {args.num_roteadores} roteadores em {args.areas} área(s), atraso {args.atraso_ms:g} ms, "
+          f"perda {args.perda:.0%}, {args.duracao:g} s simulados")
+    print(f"  roteadores criados em {criacao:.2f}s")
+
+    # Milhões de LSAs e datagramas vivos e quase nenhum ciclo: com os limiares
+    # padrão a coleta varre o heap inteiro repetidas vezes sem liberar nada.
+    gc.set_threshold(100000, 50, 100)
+    inicio = time.perf_counter()
+    simulacao.iniciar()
+    # Até a primeira falha a simulação mede a convergência inicial; depois, a reconvergência.
+    marcos = [instante for instante, _, _ in falhas if instante < args.duracao] + [args.duracao]
+    anterior = 0.0
+    for marco in marcos:
+        simulacao.executar_antes_de(marco)
+        ultima = simulacao.ultima_mudanca()
+        incompletos = simulacao.incompletos()
+        rotulo = "convergência inicial" if anterior == 0.0 else f"reconvergência após falha em {anterior:g}s"
+        if incompletos:
+            print(f"  {rotulo}: não convergiu até {marco:g}s ({len(incompletos)} roteadores incompletos, "
+                  f"ex.: {', '.join(incompletos[:5])})")
+        elif ultima is None or ultima < anterior:
+            print(f"  {rotulo}: nenhuma rota mudou")
+        else:
+            print(f"  {rotulo}: {ultima - anterior:.3f}s simulados")
+        anterior = marco
+    execucao = time.perf_counter() - inicio
+
+    contadores = simulacao.contadores()
+    print(f"  execução: {execucao:.2f}s reais, {simulacao.relogio.eventos} eventos "
+          f"({simulacao.relogio.eventos / execucao:.0f} eventos/s)")
+    for nome in TIPOS_MENSAGEM.values():
+        print(f"  mensagens {nome}: {contadores[f'{nome}_enviadas']} enviadas, "
+              f"{contadores[f'{nome}_perdidas']} perdidas")
+    print(f"  LSAs recebidos: {contadores['lsas_recebidos_total']} "
+          f"({contadores['lsas_aceitos_total']} aceitos, {contadores['lsas_renovados_total']} renovados, "
+          f"{contadores['lsas_duplicados_total']} duplicados), "
+          f"retransmissões: {contadores['retransmissoes_total']}")
+    print(f"  SPF: {contadores['spf_execucoes_total']} execuções "
+          f"({contadores['spf_execucoes_total'] / len(simulacao.roteadores):.1f} por roteador, "
+          f"{contadores['spf_coalescidas_total']} pedidos coalescidos)")
+
+
+if __name__ == "__main__":
+    main()
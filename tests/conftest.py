@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Os módulos do roteador se importam pelo nome, como no contêiner (WORKDIR com o
+# conteúdo de router/); gerador.py e simulador.py ficam na raiz.
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, "router"))
+os.environ.setdefault("log_nivel", "erro")
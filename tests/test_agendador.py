@@ -0,0 +1,63 @@
+from agendador import RodaTemporal
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 100.0
+
+    def __call__(self) -> float:
+        return self.agora
+
+
+def test_vencimento_no_tick_certo():
+    relogio = Relogio()
+    roda = RodaTemporal(granularidade=1.0, tamanho=8, relogio=relogio)
+    roda.agendar("a", 2.0)
+    roda.agendar("b", 5.0)
+    roda.agendar("c", 0.1)
+    assert len(roda) == 3
+    relogio.agora = 100.9
+    assert roda.avancar() == []
+    relogio.agora = 101.0
+    # Um atraso menor que um tick ainda espera o próximo.
+    assert roda.avancar() == ["c"]
+    relogio.agora = 102.5
+    assert roda.avancar() == ["a"]
+    relogio.agora = 110.0
+    assert roda.avancar() == ["b"]
+    assert len(roda) == 0
+
+
+def test_atraso_maior_que_uma_volta():
+    relogio = Relogio()
+    roda = RodaTemporal(granularidade=1.0, tamanho=8, relogio=relogio)
+    roda.agendar("longo", 20.0)
+    # O slot do vencimento é visitado em voltas anteriores sem disparar.
+    for _ in range(19):
+        relogio.agora += 1
+        assert roda.avancar() == []
+    relogio.agora += 1
+    assert roda.avancar() == ["longo"]
+
+
+def test_salto_de_varias_voltas():
+    relogio = Relogio()
+    roda = RodaTemporal(granularidade=1.0, tamanho=8, relogio=relogio)
+    for i in range(30):
+        roda.agendar(i, float(i))
+    relogio.agora += 100
+    assert sorted(roda.avancar()) == list(range(30))
+
+
+def test_reagendar_e_cancelar():
+    relogio = Relogio()
+    roda = RodaTemporal(granularidade=0.5, tamanho=16, relogio=relogio)
+    roda.agendar("a", 1.0)
+    roda.agendar("b", 1.0)
+    roda.agendar("a", 3.0)
+    roda.cancelar("b")
+    roda.cancelar("inexistente")
+    relogio.agora += 2.0
+    assert roda.avancar() == []
+    relogio.agora += 1.0
+    assert roda.avancar() == ["a"]
@@ -0,0 +1,52 @@
+import ipaddress
+import random
+
+import pytest
+
+from fib import agregar_rotas
+
+
+def casador(tabela):
+    # Casamento pelo prefixo mais longo, como no kernel.
+    redes = sorted(((ipaddress.ip_network(prefixo), saltos) for prefixo, saltos in tabela.items()),
+                   key=lambda item: -item[0].prefixlen)
+
+    def casar(endereco):
+        return next((saltos for rede, saltos in redes if endereco in rede), None)
+    return casar
+
+
+@pytest.mark.parametrize("semente", range(4))
+def test_agregacao_preserva_o_destino_de_cada_endereco(semente):
+    aleatorio = random.Random(semente)
+    for _ in range(100):
+        desejadas = {}
+        for _ in range(aleatorio.randint(1, 40)):
+            tamanho = aleatorio.choice([22, 23, 24, 24, 24, 25, 26])
+            rede = ipaddress.ip_network((10 << 24 | aleatorio.randrange(0, 64) << 8, tamanho), strict=False)
+            desejadas[str(rede)] = aleatorio.choice([("a",), ("b",), ("a", "b")])
+        agregadas = agregar_rotas(desejadas)
+        assert len(agregadas) <= len(desejadas)
+        antes, depois = casador(desejadas), casador(agregadas)
+        for _ in range(200):
+            endereco = ipaddress.IPv4Address(10 << 24 | aleatorio.randrange(0, 64 << 8))
+            assert antes(endereco) == depois(endereco)
+
+
+def test_ponta_de_uma_linha():
+    # As /24 de 172.20.3.0 a 172.23.232.0, todas pelo mesmo vizinho.
+    desejadas = {f"172.{20 + i // 256}.{i % 256}.0/24": ("172.20.2.1",) for i in range(3, 1001)}
+    agregadas = agregar_rotas(desejadas)
+    assert len(agregadas) == 14
+    assert "172.21.0.0/16" in agregadas
+
+
+def test_bloco_so_cobre_rotas_por_outro_caminho_mais_especificas():
+    componentes = {f"10.0.{i}.0/24": ("a",) for i in range(4)}
+    # Uma /25 por outro caminho continua vencendo o bloco no prefixo mais longo.
+    assert agregar_rotas({**componentes, "10.0.2.0/25": ("b",)}) == \
+        {"10.0.0.0/22": ("a",), "10.0.2.0/25": ("b",)}
+    # Uma /23 por outro caminho perderia para as /24 e ganharia do bloco: nada é agregado.
+    desejadas = {**componentes, "10.0.2.0/23": ("b",)}
+    assert agregar_rotas(desejadas) == desejadas
+    assert agregar_rotas({}) == {}
@@ -0,0 +1,104 @@
+import random
+
+import pytest
+
+from formato import (MAX_DATAGRAMA, ErroFormato, Remontador, codificar_ack, codificar_binario,
+                     codificar_descricao, codificar_hello, codificar_json, codificar_sonda,
+                     decodificar_binario, decodificar_json)
+from lsa import LSA, Ack, Descricao, Hello, Vizinho, IDADE_EXPURGO
+
+
+def lsa_exemplo(vizinhos: int = 3, **extras) -> LSA:
+    return LSA("router1", "172.20.1.2", 42,
+               {f"router{i}": Vizinho(f"172.{20 + i // 256}.{i % 256}.2", i % 7 + 1) for i in range(2, vizinhos + 2)}, **extras)
+
+
+def decodificar_todos(datagramas, remontador=None, origem=("172.20.2.2", 5000)):
+    remontador = remontador or Remontador()
+    resultados = [decodificar_binario(d, origem, remontador) for d in datagramas]
+    assert all(r is None for r in resultados[:-1])
+    return resultados[-1]
+
+
+@pytest.mark.parametrize("extras", [
+    {},
+    {"idade": 120},
+    {"idade": IDADE_EXPURGO},
+    {"prefixos": ("172.20.1.0/24", "10.1.0.0/16")},
+    {"resumos": {"172.21.0.0/16": 7, "172.22.4.0/22": 3}},
+])
+def test_lsa_binario_ida_e_volta(extras):
+    lsa = lsa_exemplo(**extras)
+    datagramas = codificar_binario(lsa)
+    assert len(datagramas) == 1
+    decodificado, recebidos = decodificar_todos(datagramas)
+    assert decodificado.to_dict() == lsa.to_dict()
+    assert recebidos == datagramas
+
+
+def test_lsa_json_ida_e_volta_e_sonda():
+    lsa = lsa_exemplo(prefixos=("172.20.1.0/24",))
+    decodificado, fala_binario = decodificar_json(codificar_json(lsa))
+    assert decodificado.to_dict() == lsa.to_dict()
+    assert fala_binario
+    assert decodificar_json(codificar_json(lsa, anunciar_binario=False))[1] is False
+    # A sonda é um LSA válido para a versão original, mas não chega à LSDB dos novos.
+    assert decodificar_json(codificar_sonda("router1", "172.20.1.2")) == (None, True)
+
+
+def test_fragmentacao_e_remontagem_fora_de_ordem():
+    lsa = lsa_exemplo(vizinhos=400)
+    datagramas = codificar_binario(lsa)
+    assert len(datagramas) > 1
+    assert all(len(d) <= MAX_DATAGRAMA for d in datagramas)
+
+    embaralhados = list(datagramas)
+    random.Random(1).shuffle(embaralhados)
+    # Um fragmento repetido não completa a mensagem antes da hora.
+    decodificado, recebidos = decodificar_todos(embaralhados[:1] + embaralhados)
+    assert decodificado.to_dict() == lsa.to_dict()
+    assert recebidos == datagramas
+
+
+def test_remontagem_separa_origens_e_espera_o_fragmento_perdido():
+    datagramas = codificar_binario(lsa_exemplo(vizinhos=400))
+    remontador = Remontador()
+    # Os mesmos fragmentos vindos de outro vizinho não se misturam.
+    assert decodificar_binario(datagramas[0], ("172.20.3.2", 5000), remontador) is None
+    for datagrama in datagramas[1:]:
+        assert decodificar_binario(datagrama, ("172.20.2.2", 5000), remontador) is None
+    assert decodificar_binario(datagramas[0], ("172.20.2.2", 5000), remontador) is not None
+
+
+def test_datagrama_invalido():
+    datagrama = codificar_binario(lsa_exemplo())[0]
+    with pytest.raises(ErroFormato):
+        decodificar_binario(datagrama[:5], None, Remontador())
+    with pytest.raises(ErroFormato):
+        decodificar_binario(datagrama[:-10], None, Remontador())
+
+
+def test_hello_ack_descricao_ida_e_volta():
+    hello = Hello("router1", 200, 800, ["router2", "router3"], 123456, {"router2": (654321, 150)})
+    decodificado, _ = decodificar_todos([codificar_hello(hello)])
+    assert (decodificado.id, decodificado.vistos, decodificado.carimbo, decodificado.ecos) == \
+        ("router1", ["router2", "router3"], 123456, {"router2": (654321, 150)})
+
+    instancias = [(f"router{i}", i, i % 5 == 0) for i in range(150)]
+    acks = [decodificar_todos([d])[0] for d in codificar_ack(Ack("router1", instancias))]
+    assert [i for ack in acks for i in ack.instancias] == instancias
+
+    lotes = [decodificar_todos([d])[0] for d in codificar_descricao(Descricao("router1", 7, instancias))]
+    assert len(lotes) > 1
+    assert {(lote.troca, lote.total) for lote in lotes} == {(7, len(lotes))}
+    assert [i for lote in lotes for i in lote.instancias] == instancias
+
+
+def test_lsa_repetido_decodificado_uma_vez():
+    # Vindo de outro vizinho (outro remontador), o mesmo corpo devolve a mesma instância.
+    (datagrama,) = codificar_binario(lsa_exemplo())
+    primeiro, _ = decodificar_todos([datagrama])
+    repetido, _ = decodificar_todos([bytes(datagrama)], origem=("172.20.3.2", 5000))
+    assert repetido is primeiro
+    (outro,) = codificar_binario(lsa_exemplo(idade=1))
+    assert decodificar_todos([outro])[0] is not primeiro
@@ -0,0 +1,39 @@
+import ipaddress
+
+import pytest
+
+from gerador import gerar_docker_compose, gerar_links
+
+
+def enderecos(compose: str):
+    # (subrede, endereço) de cada ipv4_address, e o /24 declarado de cada subrede.
+    atribuidos, subredes = [], {}
+    rede = None
+    for linha in compose.splitlines():
+        texto = linha.strip()
+        if texto.startswith("subnet_") and texto.endswith(":"):
+            rede = texto[:-1]
+        elif texto.startswith("ipv4_address:"):
+            atribuidos.append((rede, texto.split()[1]))
+        elif texto.startswith("- subnet:"):
+            subredes[rede] = ipaddress.ip_network(texto.split()[2])
+    return atribuidos, subredes
+
+
+@pytest.mark.parametrize("tipo,n", [("linha", 300), ("anel", 600), ("estrela", 250)])
+def test_enderecos_validos_e_unicos_por_subrede(tipo, n):
+    atribuidos, subredes = enderecos(gerar_docker_compose(n, gerar_links(tipo, n)))
+    assert len(subredes) == n
+    vistos = set()
+    for rede, texto in atribuidos:
+        ip = ipaddress.ip_address(texto)
+        assert ip in subredes[rede]
+        assert ip not in (subredes[rede].network_address, subredes[rede].broadcast_address,
+                          subredes[rede].network_address + 1)
+        assert ip not in vistos
+        vistos.add(ip)
+
+
+def test_estrela_maior_que_a_subrede_e_recusada():
+    with pytest.raises(ValueError):
+        gerar_docker_compose(251, gerar_links("estrela", 251))
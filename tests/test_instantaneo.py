@@ -0,0 +1,74 @@
+import time
+
+import pytest
+
+from fib import BackendMemoria
+from formato import ErroFormato
+from instantaneo import Instantaneo, codificar_instantaneo, gravar_instantaneo, ler_instantaneo
+from lsa import LSA, Vizinho
+from router import Router
+
+
+def instantaneo_exemplo() -> Instantaneo:
+    r1 = LSA("r1", "172.20.1.2", 9, {"r2": Vizinho("172.20.2.2", 1)}, prefixos=("172.20.1.0/24",))
+    r2 = LSA("r2", "172.20.2.2", 4, {"r1": Vizinho("172.20.1.2", 1), "r3": Vizinho("172.20.3.2", 5)})
+    r3 = LSA("r3", "172.20.3.2", 2, {"r2": Vizinho("172.20.2.2", 5)}, resumos={"172.30.0.0/16": 3})
+    return Instantaneo(9, time.time(), {"0": [(r1, 0), (r2, 12)], "1": [(r3, 70)]},
+                       {"172.20.2.0/24": ("172.20.1.1",), "172.20.3.0/24": ("172.20.1.1", "172.20.4.1")})
+
+
+def como_tupla(instantaneo: Instantaneo):
+    return (instantaneo.seq, instantaneo.gravado_em, instantaneo.rotas,
+            {area: [(lsa.to_dict(), idade) for lsa, idade in lsas] for area, lsas in instantaneo.lsas.items()})
+
+
+def test_ida_e_volta(tmp_path):
+    caminho = str(tmp_path / "r1.lsdb")
+    original = instantaneo_exemplo()
+    tamanho = gravar_instantaneo(caminho, original)
+    lido, tamanho_lido = ler_instantaneo(caminho)
+    assert tamanho_lido == tamanho
+    assert como_tupla(lido) == como_tupla(original)
+    # A gravação é atômica: não sobra o temporário.
+    assert [p.name for p in tmp_path.iterdir()] == ["r1.lsdb"]
+
+
+def test_instantaneo_truncado_ou_corrompido(tmp_path):
+    dados = codificar_instantaneo(instantaneo_exemplo())
+    caminho = tmp_path / "r1.lsdb"
+    for tamanho in range(len(dados)):
+        caminho.write_bytes(dados[:tamanho])
+        with pytest.raises(ErroFormato):
+            ler_instantaneo(str(caminho))
+    caminho.write_bytes(b"XXXX" + dados[4:])
+    with pytest.raises(ErroFormato):
+        ler_instantaneo(str(caminho))
+    caminho.write_bytes(dados[:4] + bytes([99]) + dados[5:])
+    with pytest.raises(ErroFormato):
+        ler_instantaneo(str(caminho))
+
+
+def roteador(caminho: str) -> Router:
+    return Router("r1", "172.20.1.2", {"r2": Vizinho("172.20.2.2", 1)},
+                  backend=BackendMemoria(["172.20.1.2/24"]), instantaneo=caminho)
+
+
+def test_roteador_restaura_instantaneo(tmp_path):
+    caminho = str(tmp_path / "r1.lsdb")
+    gravar_instantaneo(caminho, instantaneo_exemplo())
+    r = roteador(caminho)
+    assert r.seq == 9
+    assert r.em_carencia
+    assert sorted(r.lsdbs["0"].lsas) == ["r1", "r2"]
+    # Área que o roteador não tem fica de fora.
+    assert "1" not in r.lsdbs
+
+
+def test_roteador_ignora_instantaneo_corrompido(tmp_path):
+    caminho = tmp_path / "r1.lsdb"
+    caminho.write_bytes(codificar_instantaneo(instantaneo_exemplo())[:-3])
+    r, frio = roteador(str(caminho)), roteador(None)
+    assert not r.em_carencia
+    assert r.seq == frio.seq
+    assert sorted(r.lsdbs["0"].lsas) == sorted(frio.lsdbs["0"].lsas)
+    assert not r.fib.instaladas
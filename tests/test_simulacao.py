@@ -0,0 +1,25 @@
+from gerador import ambiente_roteadores, gerar_links
+from simulacao import Simulacao
+
+
+def test_enlaces_que_sobem_juntos_saem_num_unico_lsa():
+    # Os dois enlaces de cada roteador do anel sobem dentro de lsa_atraso_ms: cada
+    # roteador aceita uma única instância de cada origem na convergência inicial.
+    n = 30
+    simulacao = Simulacao(ambiente_roteadores(gerar_links("anel", n)))
+    simulacao.iniciar()
+    simulacao.executar(2)
+    assert simulacao.incompletos() == []
+    assert simulacao.contadores()["lsas_aceitos_total"] == n * (n - 1)
+    assert all(r.agendador_lsa.coalescidas for r in simulacao.roteadores.values())
+
+
+def test_queda_de_enlace_ainda_origina_lsa():
+    simulacao = Simulacao(ambiente_roteadores(gerar_links("anel", 30)))
+    simulacao.falhar_enlace("router5", "router6", 1.0)
+    simulacao.iniciar()
+    simulacao.executar(4)
+    assert simulacao.incompletos() == []
+    r5 = simulacao.roteadores["router5"]
+    assert "router6" not in r5.lsdb.lsas["router5"].vizinhos
+    assert "router6" not in simulacao.roteadores["router20"].lsdb.lsas["router5"].vizinhos
@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from lsa import LSA, Vizinho, IDADE_EXPURGO
+from router import LSDB, TabelaRotas
+
+
+def lsa_aleatorio(aleatorio: random.Random, nome: str, nomes, seq: int) -> LSA:
+    # Enlaces para nós que às vezes não anunciam nada (x1, x2): só entram no grafo
+    # os anunciados pelos dois lados. Pesos pequenos geram muitos empates (ECMP).
+    vizinhos = {}
+    for outro in aleatorio.sample(nomes + ["x1", "x2"], aleatorio.randint(0, 4)):
+        if outro != nome:
+            vizinhos[outro] = Vizinho("10.0.0.1", aleatorio.randint(1, 3))
+    return LSA(nome, "10.0.0.1", seq, vizinhos)
+
+
+@pytest.mark.parametrize("max_caminhos", [1, 4])
+@pytest.mark.parametrize("semente", range(5))
+def test_incremental_igual_ao_completo(semente, max_caminhos):
+    aleatorio = random.Random(semente)
+    for _ in range(40):
+        nomes = [f"r{i}" for i in range(aleatorio.randint(2, 25))]
+        lsdb = LSDB()
+        seq = 1
+        for nome in nomes:
+            if nome == "r0" or aleatorio.random() < 0.8:
+                lsdb.atualizar_lsa(lsa_aleatorio(aleatorio, nome, nomes, seq))
+        lsdb.drenar_mudancas()
+        tabela = TabelaRotas(lsdb.get_topologia(), "r0", max_caminhos)
+        for _ in range(30):
+            seq += 1
+            for nome in aleatorio.sample(nomes[1:], aleatorio.randint(1, min(2, len(nomes) - 1))):
+                if aleatorio.random() < 0.15:
+                    lsdb.atualizar_lsa(LSA(nome, "10.0.0.1", seq, {}, idade=IDADE_EXPURGO))
+                else:
+                    lsdb.atualizar_lsa(lsa_aleatorio(aleatorio, nome, nomes, seq))
+            grafo = lsdb.get_topologia()
+            tabela.atualizar(grafo, lsdb.drenar_mudancas())
+            assert tabela.rotas == TabelaRotas(grafo, "r0", max_caminhos).rotas
+
+
+def test_ecmp_une_os_primeiros_saltos_de_mesmo_custo():
+    # Quadrado a-b-d-c-a com pesos iguais: d é alcançado por b e por c.
+    enlaces = {"a": ["b", "c"], "b": ["a", "d"], "c": ["a", "d"], "d": ["b", "c"]}
+    lsdb = LSDB()
+    for nome, vizinhos in enlaces.items():
+        lsdb.atualizar_lsa(LSA(nome, "10.0.0.1", 1, {v: Vizinho("10.0.0.1", 1) for v in vizinhos}))
+    assert TabelaRotas(lsdb.get_topologia(), "a", 4).rotas["d"] == (("b", "c"), 2)
+    assert TabelaRotas(lsdb.get_topologia(), "a", 1).rotas["d"] == (("b",), 2)
+
+
+def test_recalcular_reaproveita_os_vetores():
+    aleatorio = random.Random(7)
+    nomes = [f"r{i}" for i in range(30)]
+    lsdb = LSDB()
+    for nome in nomes[:20]:
+        lsdb.atualizar_lsa(lsa_aleatorio(aleatorio, nome, nomes, 1))
+    lsdb.drenar_mudancas()
+    tabela = TabelaRotas(lsdb.get_topologia(), "r0", 4)
+    vetores = (tabela._dist, tabela._prev, tabela._saltos)
+    for seq in range(2, 12):
+        # Nós novos fazem o grafo (e o CSR) crescer no meio da sequência.
+        for nome in aleatorio.sample(nomes, 5):
+            lsdb.atualizar_lsa(lsa_aleatorio(aleatorio, nome, nomes, seq))
+        grafo = lsdb.get_topologia()
+        mudancas = lsdb.drenar_mudancas()
+        # SPF completo e incremental se alternam sobre os mesmos vetores, como no roteador.
+        if seq % 2:
+            tabela.atualizar(grafo, mudancas)
+        else:
+            tabela.recalcular(grafo)
+        assert tabela.rotas == TabelaRotas(grafo, "r0", 4).rotas
+        assert all(atual is anterior for atual, anterior in zip((tabela._dist, tabela._prev, tabela._saltos), vetores))
@@ -0,0 +1,73 @@
+import pytest
+
+from formato import MAGICO, TIPO_DESCRICAO, TIPO_PEDIDO
+from gerador import ambiente_roteadores, gerar_links
+from simulacao import Simulacao
+
+
+def rede_com_perdas(perder):
+    # Numa linha de 100 roteadores, router100 fica isolado até os outros convergirem;
+    # quando o enlace volta, router99 descreve 99 LSAs em dois lotes. perder: quantos
+    # datagramas de cada (origem, destino, tipo) se perdem.
+    simulacao = Simulacao(ambiente_roteadores(gerar_links("linha", 100)))
+    rede = simulacao.rede
+    transmitir = rede.transmitir
+
+    def transmitir_com_perdas(origem, dados, destino):
+        chave = (origem, destino[0], dados[3] if dados[:2] == MAGICO else None)
+        if perder.get(chave):
+            perder[chave] -= 1
+            rede.perdidas[chave[2]] += 1
+            return
+        transmitir(origem, dados, destino)
+
+    rede.transmitir = transmitir_com_perdas
+    ip99, ip100 = simulacao.roteadores["router99"].ip, simulacao.roteadores["router100"].ip
+    rede.configurar(ip99, ip100, perda=1.0)
+    simulacao.iniciar()
+    simulacao.executar(3)
+    return simulacao, ip99, ip100
+
+
+# O primeiro lote da descrição de router99 e o primeiro pedido de router100; ou só o
+# pedido, e aí a descrição é confirmada e router100 tem de repetir o que pediu.
+@pytest.mark.parametrize("tipos_perdidos", [(TIPO_DESCRICAO, TIPO_PEDIDO), (TIPO_PEDIDO,)])
+def test_troca_recupera_lotes_perdidos(tipos_perdidos):
+    perder = {}
+    simulacao, ip99, ip100 = rede_com_perdas(perder)
+    r99, r100 = simulacao.roteadores["router99"], simulacao.roteadores["router100"]
+    assert len(r100.lsdb.lsas) == 1
+    sincronizados = []
+    for r in (r99, r100):
+        r.sincronizar = sincronizados.append
+    confirmadas = r99.metricas.contadores["trocas_confirmadas_total"]
+
+    origens = {TIPO_DESCRICAO: (ip99, ip100), TIPO_PEDIDO: (ip100, ip99)}
+    perder.update({origens[tipo] + (tipo,): 1 for tipo in tipos_perdidos})
+    simulacao.rede.configurar(ip99, ip100, perda=0.0)
+    simulacao.executar(5)
+
+    assert not any(perder.values())
+    assert simulacao.incompletos() == []
+    assert {k: l.seq for k, l in r100.lsdb.lsas.items()} == {k: l.seq for k, l in r99.lsdb.lsas.items()}
+    assert len(r100.lsdb.lsas) == 100
+    # Os LSAs vieram pela troca de descrições, sem recorrer à LSDB inteira.
+    assert sincronizados == []
+    assert r100.metricas.contadores["lsas_pedidos_total"] >= 98
+    assert r99.metricas.contadores["trocas_confirmadas_total"] == confirmadas + 1
+    assert r100.metricas.contadores["trocas_confirmadas_total"] == 1
+
+
+def test_vizinho_que_nao_descreve_recebe_a_lsdb_inteira():
+    perder = {}
+    simulacao, ip99, ip100 = rede_com_perdas(perder)
+    r99, r100 = simulacao.roteadores["router99"], simulacao.roteadores["router100"]
+    # Uma versão anterior, que ignora descrições e pedidos.
+    r100.receber_descricao = lambda *args: None
+    r100.receber_pedido = lambda *args: None
+    confirmadas = r99.metricas.contadores["trocas_confirmadas_total"]
+    simulacao.rede.configurar(ip99, ip100, perda=0.0)
+    simulacao.executar(20)
+    assert simulacao.incompletos() == []
+    assert len(r100.lsdb.lsas) == 100
+    assert r99.metricas.contadores["trocas_confirmadas_total"] == confirmadas
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import ipaddress
+import subprocess
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Mapping, Set, Tuple
+
+import numpy as np
+
+os.environ.setdefault("log_nivel", "aviso")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "router"))
+
+from areas import prefixo_de
+from gerador import gerar_links, ambiente_roteadores, ler_capacidade
+from fib import Saltos, ler_rotas_ip
+from lsa import LSA
+from router import LSDB, vizinhos_do_ambiente
+
+# Rotas de cada roteador: prefixo -> próximos saltos (IPs em ordem).
+Tabelas = Dict[str, Dict[str, Saltos]]
+
+
+class Topologia:
+    def __init__(self, ips: Dict[str, str], grafo: Mapping[str, Mapping[str, int]],
+                 prefixos: Dict[str, Set[str]]):
+        self.ips = ips
+        # Enlaces dirigidos com o peso anunciado pela ponta de origem, só os bidirecionais.
+        self.grafo = grafo
+        # Prefixo -> roteadores que o anunciam; as redes que o próprio roteador anuncia
+        # são conectadas, sem rota instalada.
+        self.prefixos = prefixos
+
+    @classmethod
+    def do_gerador(cls, ambientes: Dict[str, Dict[str, str]]) -> 'Topologia':
+        # Como o gerador.py liga os contêineres: cada roteador está na própria /24 e na de cada vizinho.
+        vizinhos = {nome: vizinhos_do_ambiente(ambiente) for nome, ambiente in ambientes.items()}
+        grafo = {nome: {v: viz.peso for v, viz in proprios.items() if nome in vizinhos.get(v, {})}
+                 for nome, proprios in vizinhos.items()}
+        prefixos: Dict[str, Set[str]] = {}
+        for nome, ambiente in ambientes.items():
+            prefixos.setdefault(prefixo_de(ambiente["my_ip"]), set()).update({nome} | set(grafo[nome]))
+        return cls({nome: ambiente["my_ip"] for nome, ambiente in ambientes.items()}, grafo, prefixos)
+
+    @classmethod
+    def da_lsdb(cls, lsas: List[Dict]) -> 'Topologia':
+        # A própria LSDB do roteador monta o grafo, com a mesma verificação bidirecional.
+        # Um roteador de borda exporta uma LSDB por área, com um LSA próprio em cada uma,
+        # e só enxerga as outras áreas por resumos: o oráculo, que modela uma área só,
+        # daria veredictos errados. A LSDB de um roteador interno cobre a área dele.
+        areas = sorted({dados["area"] for dados in lsas if "area" in dados})
+        if len(areas) > 1:
+            raise ValueError(f"LSDB de um roteador de borda (áreas {', '.join(areas)}); o oráculo verifica "
+                             f"uma área por vez: use a LSDB de um roteador interno de cada área")
+        lsdb = LSDB()
+        for dados in lsas:
+            lsdb.atualizar_lsa(LSA.from_dict(dados))
+        prefixos: Dict[str, Set[str]] = {}
+        for id, lsa in lsdb.lsas.items():
+            for prefixo in lsa.prefixos or (prefixo_de(lsa.ip),):
+                prefixos.setdefault(prefixo, set()).add(id)
+        return cls({id: lsa.ip for id, lsa in lsdb.lsas.items()}, lsdb.get_topologia(), prefixos)
+
+
+def todos_os_pares(custos: np.ndarray) -> np.ndarray:
+    # Floyd-Warshall com cada passo k como uma operação sobre a matriz inteira.
+    dist = custos.copy()
+    for k in range(len(dist)):
+        np.minimum(dist, dist[:, k, None] + dist[k], out=dist)
+    return dist
+
+
+def intervalo(prefixo: str) -> Tuple[int, int]:
+    rede = ipaddress.ip_network(prefixo)
+    return int(rede.network_address), rede.prefixlen
+
+
+class Oraculo:
+    def __init__(self, topologia: Topologia, max_caminhos: int = 4):
+        self.topologia = topologia
+        self.max_caminhos = max(1, max_caminhos)
+        self.nomes = sorted(topologia.ips)
+        indice = self.indice = {nome: i for i, nome in enumerate(self.nomes)}
+        n = len(self.nomes)
+
+        # Pares (prefixo, roteador que o anuncia), agrupados por prefixo.
+        self.prefixos = sorted(topologia.prefixos)
+        pares = [(p, indice[nome]) for p, prefixo in enumerate(self.prefixos)
+                 for nome in sorted(topologia.prefixos[prefixo]) if nome in indice]
+        self.pares_prefixo = np.array([p for p, _ in pares], dtype=np.int64)
+        self.pares_roteador = np.array([r for _, r in pares], dtype=np.int64)
+        redes = [intervalo(prefixo) for prefixo in self.prefixos]
+        self.redes = np.array([rede for rede, _ in redes], dtype=np.int64)
+        self.mascaras = np.array([(0xFFFFFFFF << (32 - tamanho)) & 0xFFFFFFFF for _, tamanho in redes], dtype=np.int64)
+
+        # Arestas em ordem de origem e, dentro dela, de nome do vizinho: os saltos de
+        # cada destino saem já na ordem em que o SPF os limita a max_caminhos.
+        arestas = sorted((indice[u], v, peso) for u, enlaces in topologia.grafo.items() if u in indice
+                         for v, peso in enlaces.items() if v in indice)
+        self.origens = np.array([u for u, _, _ in arestas], dtype=np.int64)
+        self.vizinhos = np.array([indice[v] for _, v, _ in arestas], dtype=np.int64)
+        pesos = np.array([peso for _, _, peso in arestas], dtype=np.float64)
+        self.inicio = np.searchsorted(self.origens, np.arange(n + 1))
+
+        custos = np.full((n, n), np.inf)
+        custos[self.origens, self.vizinhos] = pesos
+        np.fill_diagonal(custos, 0)
+        self.dist = todos_os_pares(custos)
+        # otimo[e, d]: a aresta e está em algum caminho mínimo de sua origem até d.
+        alcancavel = np.isfinite(self.dist[self.origens])
+        self.otimo = alcancavel & (pesos[:, None] + self.dist[self.vizinhos] == self.dist[self.origens])
+
+    def otimos(self, nome: str) -> Tuple[Dict[str, Tuple[str, ...]], Set[str]]:
+        # Prefixo -> todos os primeiros saltos de custo mínimo até o anunciante mais
+        # próximo (com empate, a união deles), em ordem de nome; e os prefixos que o
+        # próprio roteador anuncia.
+        s = self.indice[nome]
+        ini, fim = self.inicio[s], self.inicio[s + 1]
+        distancias = self.dist[s, self.pares_roteador]
+        minimo = np.full(len(self.prefixos), np.inf)
+        np.minimum.at(minimo, self.pares_prefixo, distancias)
+        locais = {self.prefixos[p] for p in np.nonzero(minimo == 0)[0]}
+        # A rede do próprio endereço é conectada mesmo quando o roteador a anuncia em
+        # outra área, fora da LSDB verificada (um roteador de borda).
+        endereco = int(ipaddress.ip_address(self.topologia.ips[nome]))
+        locais |= {self.prefixos[p] for p in np.nonzero(endereco & self.mascaras == self.redes)[0]}
+        melhores = (distancias == minimo[self.pares_prefixo]) & np.isfinite(distancias) & (distancias > 0)
+        prefixos = self.pares_prefixo[melhores]
+        if not len(prefixos) or ini == fim:
+            return {}, locais
+        grupos = np.flatnonzero(np.r_[True, prefixos[1:] != prefixos[:-1]])
+        saidas = np.logical_or.reduceat(self.otimo[ini:fim][:, self.pares_roteador[melhores]], grupos, axis=1)
+        saltos = {}
+        for grupo, coluna in zip(prefixos[grupos], saidas.T):
+            vias = tuple(self.nomes[self.vizinhos[ini + aresta]] for aresta in np.nonzero(coluna)[0])
+            if vias and self.prefixos[grupo] not in locais:
+                saltos[self.prefixos[grupo]] = vias
+        return saltos, locais
+
+    def comparar(self, nome: str, instaladas: Dict[str, Saltos]) -> Dict[str, List[str]]:
+        # Cada prefixo esperado é procurado por maior prefixo casado, como o kernel faz:
+        # uma rota agregada que o cobre com os saltos certos conta como correta. Só rotas
+        # com gateway entram; redes conectadas e a rota padrão do Docker ficam de fora.
+        ips = self.topologia.ips
+        rotas = {}
+        for prefixo, saltos in instaladas.items():
+            rede, tamanho = intervalo(prefixo)
+            if saltos and tamanho > 0:
+                rotas[(rede, tamanho)] = (prefixo, saltos)
+        tamanhos = sorted({tamanho for _, tamanho in rotas}, reverse=True)
+
+        def casar(prefixo: str):
+            rede, tamanho = intervalo(prefixo)
+            for candidato in tamanhos:
+                if candidato <= tamanho:
+                    rota = rotas.get((rede & (0xFFFFFFFF << (32 - candidato)) & 0xFFFFFFFF, candidato))
+                    if rota is not None:
+                        return rota
+            return None
+
+        resultado: Dict[str, List[str]] = {"corretas": [], "faltando": [], "sobrando": [],
+                                           "nao_otimas": [], "ecmp": []}
+        otimos, locais = self.otimos(nome)
+        for prefixo, vias in otimos.items():
+            esperadas = tuple(sorted(ips[via] for via in vias[:self.max_caminhos]))
+            rota = casar(prefixo)
+            if rota is None:
+                resultado["faltando"].append(f"{prefixo} via {', '.join(esperadas)}")
+                continue
+            coberto, instalada = rota
+            descricao = prefixo if coberto == prefixo else f"{prefixo} (em {coberto})"
+            if tuple(sorted(instalada)) == esperadas:
+                resultado["corretas"].append(prefixo)
+            elif set(instalada) <= {ips[via] for via in vias}:
+                resultado["ecmp"].append(f"{descricao} via {', '.join(instalada)}, "
+                                         f"esperado {', '.join(esperadas)}")
+            else:
+                resultado["nao_otimas"].append(f"{descricao} via {', '.join(instalada)}, "
+                                               f"esperado {', '.join(esperadas)}")
+        # Prefixo inalcançável que ainda casa com alguma rota; os do próprio roteador são
+        # entregues pela rota conectada, mais específica que qualquer agregado.
+        sobrando = set()
+        for prefixo in self.prefixos:
+            if prefixo not in otimos and prefixo not in locais:
+                rota = casar(prefixo)
+                if rota is not None:
+                    sobrando.add(rota)
+        resultado["sobrando"] = [f"{prefixo} via {', '.join(saltos)}" for prefixo, saltos in sorted(sobrando)]
+        return resultado
+
+
+def ler_json(origem: str):
+    if origem.startswith(("http://", "https://")):
+        with urllib.request.urlopen(origem, timeout=10) as resposta:
+            return json.load(resposta)
+    with open(origem) as f:
+        return json.load(f)
+
+
+def tabelas_docker(nomes: List[str], paralelos: int) -> Tabelas:
+    # Um "ip route" por roteador (O(N) docker exec), em paralelo.
+    saida = subprocess.run(["docker", "ps", "--format", "{{.Names}}"],
+                           capture_output=True, text=True, check=True).stdout
+    containers = {}
+    for container in saida.split():
+        # router1, linkstate-simulator_router1_1 (compose v1) ou linkstate-simulator-router1-1 (v2).
+        encontrado = re.search(r"(?:^|[_-])(router\d+)(?:[_-]\d+)?$", container)
+        if encontrado:
+            containers[encontrado.group(1)] = container
+
+    def coletar(nome: str) -> Tuple[str, Dict[str, Saltos]]:
+        resultado = subprocess.run(["docker", "exec", containers[nome], "ip", "-4", "route", "show", "table", "main"],
+                                   capture_output=True, text=True, check=False)
+        return nome, ler_rotas_ip(resultado.stdout)
+
+    with ThreadPoolExecutor(max_workers=paralelos) as executor:
+        return dict(executor.map(coletar, [nome for nome in nomes if nome in containers]))
+
+
+def tabelas_diretorio(diretorio: str, nomes: List[str]) -> Tabelas:
+    # <diretorio>/<roteador>.txt com a saída de "ip route" de cada roteador.
+    tabelas = {}
+    for nome in nomes:
+        caminho = os.path.join(diretorio, f"{nome}.txt")
+        if os.path.exists(caminho):
+            with open(caminho) as f:
+                tabelas[nome] = ler_rotas_ip(f.read())
+    return tabelas
+
+
+def simular(ambientes: Dict[str, Dict[str, str]], duracao: float) -> Tuple[Tabelas, List[Dict]]:
+    from simulacao import Simulacao
+
+    simulacao = Simulacao(ambientes)
+    simulacao.iniciar()
+    simulacao.executar(duracao)
+    roteadores = simulacao.roteadores
+    # A LSDB do primeiro roteador faz o papel de uma LSDB coletada: os custos medidos
+    # por RTT na simulação não são os do gerador.
+    lsdb = roteadores[min(roteadores)].exportar_lsdb()
+    return {nome: r.backend.listar_rotas() for nome, r in roteadores.items()}, lsdb
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara as tabelas de rotas dos roteadores com um oráculo de caminhos mínimos')
+    parser.add_argument('-n', '--num-roteadores', type=int, default=3,
+                        help='Número de roteadores, como no gerador.py (padrão: 3)')
+    parser.add_argument('-t', '--tipo', type=str, choices=['linha', 'anel', 'estrela'], default='linha',
+                        help='Tipo de topologia, como no gerador.py (padrão: linha)')
+    parser.add_argument('-c', '--capacidade', type=float, default=None,
+                        help='Capacidade em Mbps de todos os enlaces, como no gerador.py')
+    parser.add_argument('--capacidade-enlace', type=ler_capacidade, action='append', default=[],
+                        help='Capacidade de um enlace específico: routerA-routerB=MBPS')
+    parser.add_argument('--lsdb', type=str, default=None,
+                        help='Topologia de uma LSDB coletada (arquivo JSON ou URL http://<ip>:9100/lsdb) '
+                             'em vez da gerada')
+    parser.add_argument('--tabelas', type=str, default=None,
+                        help='Diretório com a saída de "ip route" de cada roteador (<roteador>.txt)')
+    parser.add_argument('--simulacao', type=float, default=None, metavar='SEGUNDOS',
+                        help='Roda a topologia no simulador em processo pelo tempo dado e verifica as FIBs dele')
+    parser.add_argument('-m', '--max-caminhos', type=int, default=int(os.environ.get("ecmp_max_caminhos", 4)),
+                        help='ecmp_max_caminhos dos roteadores (padrão: 4)')
+    parser.add_argument('-p', '--paralelos', type=int, default=16,
+                        help='docker exec simultâneos na coleta (padrão: 16)')
+    parser.add_argument('-v', '--detalhes', type=int, default=10,
+                        help='Divergências listadas por categoria (padrão: 10)')
+
+    args = parser.parse_args()
+
+    capacidades = {(a, b): mbps for a, b, mbps in args.capacidade_enlace}
+    ambientes = ambiente_roteadores(gerar_links(args.tipo, args.num_roteadores), capacidades, args.capacidade)
+
+    inicio = time.perf_counter()
+    lsdb = ler_json(args.lsdb) if args.lsdb else None
+    if args.simulacao is not None:
+        tabelas, lsdb = simular(ambientes, args.simulacao)
+        origem_tabelas = f"simulação de {args.simulacao:g}s"
+    elif args.tabelas:
+        tabelas = tabelas_diretorio(args.tabelas, list(ambientes))
+        origem_tabelas = args.tabelas
+    else:
+        tabelas = tabelas_docker(list(ambientes), args.paralelos)
+        origem_tabelas = "docker"
+    coleta = time.perf_counter() - inicio
+
+    try:
+        topologia = Topologia.da_lsdb(lsdb) if lsdb is not None else Topologia.do_gerador(ambientes)
+    except ValueError as e:
+        parser.error(str(e))
+    inicio = time.perf_counter()
+    oraculo = Oraculo(topologia, args.max_caminhos)
+    calculo = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    totais = {"corretas": 0, "faltando": 0, "sobrando": 0, "nao_otimas": 0, "ecmp": 0}
+    exemplos: Dict[str, List[str]] = {categoria: [] for categoria in totais}
+    sem_tabela = [nome for nome in oraculo.nomes if nome not in tabelas]
+    for nome in oraculo.nomes:
+        if nome not in tabelas:
+            continue
+        for categoria, rotas in oraculo.comparar(nome, tabelas[nome]).items():
+            totais[categoria] += len(rotas)
+            if categoria != "corretas":
+                exemplos[categoria].extend(f"{nome}: {rota}" for rota in rotas[:args.detalhes - len(exemplos[categoria])])
+    comparacao = time.perf_counter() - inicio
+
+    print(f"Topologia {'da LSDB' if lsdb is not None else args.tipo} com {len(oraculo.nomes)} roteadores, "
+          f"{len(oraculo.origens)} enlaces dirigidos; tabelas de {origem_tabelas}")
+    print(f"  coleta: {coleta:.2f}s, oráculo (todos os pares): {calculo:.2f}s, comparação: {comparacao:.2f}s")
+    print(f"  rotas corretas: {totais['corretas']}")
+    descricoes = {
+        "faltando": "rotas faltando",
+        "sobrando": "rotas sobrando",
+        "nao_otimas": "rotas por caminhos não mínimos",
+        "ecmp": "rotas mínimas com outros saltos ECMP",
+    }
+    for categoria, descricao in descricoes.items():
+        print(f"  {descricao}: {totais[categoria]}")
+        for exemplo in exemplos[categoria]:
+            print(f"    {exemplo}")
+    if sem_tabela:
+        print(f"  roteadores sem tabela: {len(sem_tabela)} (ex.: {', '.join(sem_tabela[:5])})")
+
+    if sem_tabela or any(totais[categoria] for categoria in descricoes):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()